@@ -0,0 +1,39 @@
+"""add generation jobs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'generation_jobs',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('kind', sa.String(30), nullable=False),
+        sa.Column('node_id', sa.UUID(), nullable=False),
+        sa.Column('params', sa.JSON(), nullable=False),
+        sa.Column('status', sa.Enum('queued', 'running', 'succeeded', 'failed', name='jobstatusenum'), nullable=False),
+        sa.Column('problem_id', sa.UUID(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.ForeignKeyConstraint(['node_id'], ['roadmap_nodes.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['problem_id'], ['roadmap_problems.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('generation_jobs')
+    op.execute('DROP TYPE IF EXISTS jobstatusenum')
@@ -0,0 +1,31 @@
+"""add generation job owner and heartbeat
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('generation_jobs', sa.Column('owner', sa.String(100), nullable=True))
+    op.add_column('generation_jobs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+    # A generated problem is a duplicate only of one on the same node
+    op.drop_constraint('roadmap_problems_description_hash_key', 'roadmap_problems', type_='unique')
+    op.create_unique_constraint('uq_roadmap_problems_node_description_hash', 'roadmap_problems',
+                                ['node_id', 'description_hash'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_roadmap_problems_node_description_hash', 'roadmap_problems', type_='unique')
+    op.create_unique_constraint('roadmap_problems_description_hash_key', 'roadmap_problems', ['description_hash'])
+    op.drop_column('generation_jobs', 'heartbeat_at')
+    op.drop_column('generation_jobs', 'owner')
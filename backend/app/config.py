@@ -5,12 +5,85 @@ from functools import lru_cache
 class Settings(BaseSettings):
     database_url: str = "postgresql://postgres:postgres@db:5432/practice_db"
     openai_api_key: str = ""
+    # Any OpenAI-compatible server, e.g. a llama.cpp llama-server; empty uses the OpenAI API
+    openai_base_url: str = ""
 
     python_worker_url: str = "http://python-worker:5000"
     javascript_worker_url: str = "http://javascript-worker:5000"
     cpp_worker_url: str = "http://cpp-worker:5000"
     react_worker_url: str = "http://react-worker:5000"
 
+    # Worker URLs above accept a comma-separated list of replicas
+    worker_health_interval_seconds: float = 5.0
+    worker_failure_threshold: int = 3
+    worker_circuit_cooldown_seconds: float = 30.0
+    # Send a duplicate run to a second replica if the first has not answered by then; 0 (the default) disables.
+    # Set it near the p95 run time, so only the slowest few percent of runs are hedged
+    worker_hedge_delay_ms: int = 0
+    # Hedges allowed per request, so a slow pool is not sent twice the load; bursts of up to 10 are allowed
+    worker_hedge_budget_ratio: float = 0.05
+
+    # Results of identical runs are reused for this long; 0 entries disables the cache
+    result_cache_max_entries: int = 1024
+    result_cache_ttl_seconds: float = 600.0
+
+    # Reference solution runs per benchmark calibration; the median CPU time is kept
+    benchmark_calibration_runs: int = 3
+
+    # Requests issuing more DB queries than their route's budget are logged; 0 disables
+    query_budget_default: int = 30
+    # Per-route budgets keyed by route template, e.g. {"/api/roadmap/languages/{language_id}/roadmap": 10}
+    query_budgets: dict[str, int] = {}
+    # One statement running this many times in a request is logged as a likely N+1; 0 disables
+    query_repeat_threshold: int = 10
+
+    # Profile requests sending X-Profile: 1, plus this fraction of all requests; off adds no middleware
+    profiling_enabled: bool = False
+    profile_sample_rate: float = 0.0
+    profile_buffer_size: int = 50
+    # Required in X-Admin-Token by /api/admin; empty disables those endpoints
+    admin_token: str = ""
+
+    # LLM generations go to llm_provider ("openai", "local" or "fake") and llm_model, except kinds
+    # listed in llm_routes, e.g. {"exercise": "gpt-4o-mini", "module_test": "local:/models/qwen.gguf"}
+    llm_provider: str = "openai"
+    llm_model: str = "gpt-4"
+    llm_routes: dict[str, str] = {}
+    # The local provider runs GGUF models in-process with llama-cpp-python; 0 threads lets it choose
+    llm_local_threads: int = 0
+    llm_local_context_tokens: int = 8192
+    # Delay before the fake provider answers, to stand in for a real model in benchmarks
+    llm_fake_latency_ms: float = 0.0
+
+    # Problem generations run as background jobs, this many calling the model at once; generate
+    # requests are refused while this many jobs are queued or running
+    generation_max_concurrency: int = 4
+    generation_max_pending: int = 100
+    # A process refreshes its jobs' heartbeats this often; jobs whose heartbeat is older than
+    # generation_job_stale_seconds were left by a process that died and are taken over
+    generation_job_heartbeat_seconds: float = 15.0
+    generation_job_stale_seconds: float = 60.0
+
+    # Token budgets for the variable sections of generation prompts; existing problems beyond theirs
+    # are listed by title only, then counted
+    prompt_keywords_budget_tokens: int = 150
+    prompt_existing_problems_budget_tokens: int = 800
+    # Output cut off at max_tokens is continued this many times before the partial JSON is repaired
+    llm_max_continuations: int = 2
+
+    # Concurrent identical LLM generations share one call. With llm_cache_dir set, results are also
+    # stored there by prompt hash and replayed for llm_cache_ttl_seconds (0: forever), e.g. in tests
+    llm_cache_dir: str = ""
+    llm_cache_ttl_seconds: float = 86400.0
+
+    # Trace requests with W3C trace context; off adds no middleware. Incoming traceparent decides
+    # sampling, otherwise this fraction of requests is traced
+    tracing_enabled: bool = False
+    trace_sample_rate: float = 1.0
+    # Finished spans are appended here as JSON lines and/or posted as OTLP/HTTP JSON to the collector
+    trace_file: str = ""
+    trace_collector_url: str = ""
+
     class Config:
         env_file = ".env"
 
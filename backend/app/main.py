@@ -1,12 +1,35 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.routers import languages, topics, exercises, roadmap
+from app.config import get_settings
+from app.database import engine
+from app.metrics import MetricsMiddleware, instrument_engine, register_pool_collector, render_metrics
+from app.profiling import ProfilingMiddleware
+from app.tracing import TracingMiddleware, trace_engine
+from app.routers import languages, topics, exercises, roadmap, jobs, admin
+from app.services.generation_jobs import JOB_RUNNER
+from app.services.result_cache import RESULT_CACHE
+from app.services.worker_pool import pool_status, start_health_checks, stop_health_checks
+
+settings = get_settings()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_health_checks()
+    JOB_RUNNER.start()
+    yield
+    await JOB_RUNNER.shutdown()
+    await stop_health_checks()
+
 
 app = FastAPI(
     title="Code Practice Platform API",
     description="API for generating and running coding exercises",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -17,12 +40,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added before MetricsMiddleware so it runs inside it, with the request's stats in place
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so the request span covers everything else the app does
+if settings.tracing_enabled:
+    app.add_middleware(TracingMiddleware)
+
+instrument_engine(engine)
+if settings.tracing_enabled:
+    trace_engine(engine)
+register_pool_collector(engine)
+
 app.include_router(languages.router, prefix="/api/languages", tags=["languages"])
 app.include_router(topics.router, prefix="/api/topics", tags=["topics"])
 app.include_router(exercises.router, prefix="/api/exercises", tags=["exercises"])
 app.include_router(roadmap.router, prefix="/api/roadmap", tags=["roadmap"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {"status": "healthy", "workers": pool_status(), "result_cache": RESULT_CACHE.stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -0,0 +1,326 @@
+"""Prometheus metrics for the API, served at /metrics.
+
+Request latency and per-request DB query counts come from MetricsMiddleware
+and SQLAlchemy cursor events; worker and LLM call durations are observed
+where those calls are made; connection pool gauges are read at scrape time.
+Requests over their route's query budget, or repeating one statement like
+an N+1 loop, are logged as warnings.
+"""
+import logging
+import re
+import time
+from collections import Counter as StatementCounter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from app.config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, by route template",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served",
+    ["method"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Database queries issued while serving one HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+DB_QUERIES = Counter(
+    "db_queries_total",
+    "Database queries issued, by the route that issued them",
+    ["route"],
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Time spent executing a single database query",
+    ["statement"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+WORKER_REQUEST_DURATION = Histogram(
+    "worker_request_duration_seconds",
+    "Time for a worker replica to answer a run",
+    ["language", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0),
+)
+LLM_GENERATION_DURATION = Histogram(
+    "llm_generation_duration_seconds",
+    "Time for the LLM to generate an exercise or problem",
+    ["kind"],
+    buckets=(1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens",
+    "Locally counted tokens of generation prompts, in total and per budgeted section",
+    ["kind", "section"],
+    buckets=(50, 100, 250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000),
+)
+LLM_PROMPT_ITEMS_DROPPED = Counter(
+    "llm_prompt_items_dropped_total",
+    "Keywords or existing problems left out of generation prompts to stay within their section budget",
+    ["kind", "section"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens the LLM provider reported for generations",
+    ["kind", "provider", "model", "type"],
+)
+LLM_OUTPUT_RECOVERIES = Counter(
+    "llm_output_recoveries_total",
+    "Generations cut off at max_tokens that were saved by continuing them or repairing the partial JSON",
+    ["kind", "method"],
+)
+GENERATION_JOBS = Counter(
+    "generation_jobs_total",
+    "Background generation jobs by how they finished",
+    ["kind", "status"],
+)
+GENERATION_JOBS_PENDING = Gauge(
+    "generation_jobs_pending",
+    "Background generation jobs queued or running in this process",
+)
+LLM_GENERATION_CACHE_LOOKUPS = Counter(
+    "llm_generation_cache_lookups_total",
+    "LLM generations by whether they were replayed from the cache, shared with an identical one in flight or run",
+    ["kind", "outcome"],
+)
+
+# Label for requests that matched no route, so unknown paths cannot blow up cardinality
+UNMATCHED_ROUTE = "unmatched"
+STATEMENT_TYPES = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+
+def route_template(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+class QueryLog:
+    """Queries seen so far: how many, how long they took and how often each statement ran"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.statements: StatementCounter[str] = StatementCounter()
+
+    def record(self, statement: str, elapsed: float = 0.0):
+        self.count += 1
+        self.time += elapsed
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements that ran at least threshold times, the usual sign of a query in a loop"""
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+class RequestStats:
+    """What one request has done so far, shared with the threads serving it"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.method = scope["method"]
+        self.queries = QueryLog()
+        self.worker_time = 0.0
+
+    @property
+    def route(self) -> str:
+        """Template of the matched route; routing fills it in on the shared scope"""
+        return route_template(self.scope)
+
+
+_current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def current_request() -> RequestStats | None:
+    return _current_request.get()
+
+
+class MetricsMiddleware:
+    """Time each HTTP request and count the DB queries it issues.
+
+    Plain ASGI rather than BaseHTTPMiddleware so streamed responses are
+    timed to their last byte. The stats object travels in a context
+    variable, which Starlette copies into the threads running sync
+    endpoints and dependencies.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = _current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(stats.method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_progress.dec()
+            REQUEST_DURATION.labels(stats.method, stats.route, str(status)).observe(time.perf_counter() - started)
+            REQUEST_DB_QUERIES.labels(stats.method, stats.route).observe(stats.queries.count)
+            check_query_budget(stats)
+            _current_request.reset(token)
+
+
+def summarize_statement(statement: str) -> str:
+    """One-line statement with column lists elided, so the FROM and WHERE stay readable"""
+    statement = " ".join(statement.split())
+    return re.sub(r"SELECT (?:(?!\bFROM\b).)*? FROM", "SELECT ... FROM", statement)[:300]
+
+
+def query_budget(route: str) -> int:
+    return settings.query_budgets.get(route, settings.query_budget_default)
+
+
+def check_query_budget(stats: RequestStats):
+    """Warn about a request over its route's query budget or running one statement in a loop"""
+    budget = query_budget(stats.route)
+    if budget > 0 and stats.queries.count > budget:
+        logger.warning(
+            "%s %s issued %d DB queries, over its budget of %d",
+            stats.method, stats.route, stats.queries.count, budget
+        )
+    if settings.query_repeat_threshold > 0:
+        for statement, n in stats.queries.repeated(settings.query_repeat_threshold):
+            logger.warning(
+                "%s %s ran the same statement %d times, likely an N+1 query: %s",
+                stats.method, stats.route, n, summarize_statement(statement)
+            )
+
+
+def observe_worker_call(language: str, outcome: str, elapsed: float):
+    WORKER_REQUEST_DURATION.labels(language, outcome).observe(elapsed)
+    stats = current_request()
+    if stats is not None:
+        stats.worker_time += elapsed
+
+
+def statement_type(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in STATEMENT_TYPES else "OTHER"
+
+
+def instrument_engine(engine: Engine):
+    """Count and time every query the engine runs, attributing it to the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_DURATION.labels(statement_type(statement)).observe(elapsed)
+        stats = current_request()
+        if stats is None:
+            DB_QUERIES.labels("none").inc()
+            return
+        DB_QUERIES.labels(stats.route).inc()
+        stats.queries.record(statement, elapsed)
+
+
+@contextmanager
+def count_queries(engine: Engine):
+    """Log every query the engine runs inside the block, from any thread.
+
+    For asserting a route's query count against a seeded database:
+
+        with count_queries(engine) as queries:
+            client.get(f"/api/roadmap/languages/{language_id}/roadmap")
+        assert queries.count <= query_budget(route), queries.statements
+    """
+    queries = QueryLog()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        queries.record(statement)
+
+    event.listen(engine, "after_cursor_execute", record)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, "after_cursor_execute", record)
+
+
+class PoolCollector:
+    """Gauges read at scrape time: DB connection pool, worker replicas and the result cache"""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+
+    def collect(self):
+        # Imported here: the services record their own metrics from this module
+        from app.services.result_cache import RESULT_CACHE
+        from app.services.worker_pool import WORKER_POOLS
+
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            connections = GaugeMetricFamily("db_pool_connections", "Open DB pool connections", labels=["state"])
+            connections.add_metric(["in_use"], pool.checkedout())
+            connections.add_metric(["idle"], pool.checkedin())
+            yield connections
+            yield GaugeMetricFamily("db_pool_size", "Connections the DB pool keeps open", value=pool.size())
+            # QueuePool counts overflow from -size while below its size
+            yield GaugeMetricFamily(
+                "db_pool_overflow", "Connections open beyond the pool size", value=max(0, pool.overflow())
+            )
+
+        outstanding = GaugeMetricFamily(
+            "worker_outstanding_requests", "Runs in flight per worker replica", labels=["language", "url"]
+        )
+        healthy = GaugeMetricFamily(
+            "worker_healthy", "1 if the replica passed its last health check", labels=["language", "url"]
+        )
+        circuit_open = GaugeMetricFamily(
+            "worker_circuit_open", "1 while the replica's circuit breaker is open", labels=["language", "url"]
+        )
+        for language, worker_pool in WORKER_POOLS.items():
+            for endpoint in worker_pool.endpoints:
+                labels = [language, endpoint.url]
+                outstanding.add_metric(labels, endpoint.outstanding)
+                healthy.add_metric(labels, int(endpoint.healthy))
+                circuit_open.add_metric(labels, int(endpoint.circuit_open))
+        yield outstanding
+        yield healthy
+        yield circuit_open
+
+        stats = RESULT_CACHE.stats()
+        yield GaugeMetricFamily("result_cache_entries", "Run results held in the cache", value=stats["entries"])
+        lookups = CounterMetricFamily("result_cache_lookups", "Result cache lookups by outcome", labels=["outcome"])
+        for outcome in ("hits", "coalesced", "misses"):
+            lookups.add_metric([outcome], stats[outcome])
+        yield lookups
+
+
+def register_pool_collector(engine: Engine):
+    REGISTRY.register(PoolCollector(engine))
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -4,5 +4,7 @@ from app.models.topic import Topic
 from app.models.exercise import Exercise
 from app.models.roadmap_node import RoadmapNode
 from app.models.roadmap_problem import RoadmapProblem, DifficultyEnum, StatusEnum
+from app.models.generation_job import GenerationJob, JobStatusEnum
 
-__all__ = ["Base", "Language", "Topic", "Exercise", "RoadmapNode", "RoadmapProblem", "DifficultyEnum", "StatusEnum"]
+__all__ = ["Base", "Language", "Topic", "Exercise", "RoadmapNode", "RoadmapProblem", "DifficultyEnum", "StatusEnum",
+           "GenerationJob", "JobStatusEnum"]
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, DateTime
+from sqlalchemy import Column, DateTime, JSON
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
+from sqlalchemy.sql.functions import FunctionElement
 import uuid
 
 Base = declarative_base()
@@ -12,3 +14,40 @@ class BaseModel(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class VisibleTestCases(FunctionElement):
+    """SQL for a test case config column with its hidden cases removed, so they never leave the database.
+
+    Compiled for PostgreSQL and SQLite; other databases get the column
+    unchanged and rely on the schemas' serialization filter.
+    """
+    type = JSON()
+    inherit_cache = True
+    name = "visible_test_cases"
+
+
+@compiles(VisibleTestCases)
+def compile_visible_test_cases(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(VisibleTestCases, "postgresql")
+def compile_visible_test_cases_postgresql(element, compiler, **kw):
+    config = f"CAST({compiler.process(element.clauses, **kw)} AS JSONB)"
+    visible = (
+        f"SELECT jsonb_agg(t.value ORDER BY t.ordinality) "
+        f"FROM jsonb_array_elements({config} -> 'test_cases') WITH ORDINALITY AS t(value, ordinality) "
+        f"WHERE NOT COALESCE((t.value ->> 'hidden')::boolean, false)"
+    )
+    return f"jsonb_set({config}, '{{test_cases}}', COALESCE(({visible}), '[]'::jsonb))"
+
+
+@compiles(VisibleTestCases, "sqlite")
+def compile_visible_test_cases_sqlite(element, compiler, **kw):
+    config = compiler.process(element.clauses, **kw)
+    visible = (
+        f"SELECT json_group_array(json(value)) FROM json_each({config}, '$.test_cases') "
+        f"WHERE NOT COALESCE(json_extract(value, '$.hidden'), 0)"
+    )
+    return f"json_set({config}, '$.test_cases', json(({visible})))"
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, Text, Enum, ForeignKey, JSON, DateTime
+from sqlalchemy.dialects.postgresql import UUID
+import enum
+
+from app.models.base import BaseModel
+
+
+class JobStatusEnum(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class GenerationJob(BaseModel):
+    """A problem generation running in the background; polled by clients until it finishes"""
+    __tablename__ = "generation_jobs"
+
+    kind = Column(String(30), nullable=False)  # "roadmap_problem" or "module_test"
+    node_id = Column(UUID(as_uuid=True), ForeignKey("roadmap_nodes.id", ondelete="CASCADE"), nullable=False)
+    params = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum(JobStatusEnum), nullable=False, default=JobStatusEnum.queued)
+    problem_id = Column(UUID(as_uuid=True), ForeignKey("roadmap_problems.id", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # The process running the job, which refreshes heartbeat_at while it does; see GenerationJobRunner
+    owner = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text, Enum, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, Enum, ForeignKey, JSON, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
@@ -27,6 +27,8 @@ class LevelEnum(str, enum.Enum):
 
 class RoadmapProblem(BaseModel):
     __tablename__ = "roadmap_problems"
+    # The same problem may be generated for two nodes; it is a duplicate only within one
+    __table_args__ = (UniqueConstraint("node_id", "description_hash", name="uq_roadmap_problems_node_description_hash"),)
 
     node_id = Column(UUID(as_uuid=True), ForeignKey("roadmap_nodes.id", ondelete="CASCADE"), nullable=False)
     difficulty = Column(Enum(DifficultyEnum), nullable=False, default=DifficultyEnum.easy)
@@ -38,7 +40,7 @@ class RoadmapProblem(BaseModel):
     solution_code = Column(Text, nullable=False)
     test_cases = Column(JSON, nullable=False)
     hints = Column(JSON, nullable=True)
-    description_hash = Column(String(64), nullable=False, unique=True)
+    description_hash = Column(String(64), nullable=False)
     condensed_description = Column(Text, nullable=False)
 
     node = relationship("RoadmapNode", back_populates="problems")
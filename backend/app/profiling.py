@@ -0,0 +1,154 @@
+"""Opt-in request profiling.
+
+With profiling_enabled, a request is profiled when it sends X-Profile: 1 or
+is picked at profile_sample_rate. Endpoints are async, so their DB queries
+and response serialization run on the event loop thread, which cProfile
+follows for the whole request. Other requests interleaved on the loop while
+this one awaits show up in its profile too. One request is profiled at a
+time; the last profile_buffer_size profiles are kept for download through
+/api/admin/profiles.
+"""
+import cProfile
+import copy
+import io
+import marshal
+import pstats
+import random
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any
+
+from app.config import get_settings
+from app.metrics import current_request, route_template
+
+settings = get_settings()
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Functions whose cumulative time counts as response serialization
+SERIALIZATION_FUNCTIONS = {
+    ("routing.py", "serialize_response"),
+    ("responses.py", "render"),
+}
+
+
+class Profile:
+    """One profiled request: where its time went plus the raw cProfile stats"""
+
+    def __init__(self, profile_id: str, method: str, path: str, route: str, status: int, duration: float,
+                 stats: pstats.Stats, db_time: float, db_queries: int, worker_time: float):
+        self.id = profile_id
+        self.created_at = datetime.now(timezone.utc)
+        self.method = method
+        self.path = path
+        self.route = route
+        self.status = status
+        self.stats = stats
+        self.duration_ms = round(duration * 1000, 1)
+        self.db_ms = round(db_time * 1000, 1)
+        self.db_queries = db_queries
+        self.worker_ms = round(worker_time * 1000, 1)
+        self.serialization_ms = round(serialization_time(stats) * 1000, 1)
+
+    def summary(self) -> dict[str, Any]:
+        other_ms = self.duration_ms - self.db_ms - self.worker_ms - self.serialization_ms
+        return {
+            "id": self.id,
+            "created_at": self.created_at.isoformat(),
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "db_ms": self.db_ms,
+            "db_queries": self.db_queries,
+            "worker_ms": self.worker_ms,
+            "serialization_ms": self.serialization_ms,
+            "other_ms": round(max(0.0, other_ms), 1),
+        }
+
+    def dump(self) -> bytes:
+        """The stats in the .prof format pstats, snakeviz and friends load"""
+        return marshal.dumps(self.stats.stats)
+
+    def text(self, limit: int = 50) -> str:
+        out = io.StringIO()
+        stats = copy.copy(self.stats)
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def serialization_time(stats: pstats.Stats) -> float:
+    total = 0.0
+    for (filename, _, function), (_, _, _, cumulative, _) in stats.stats.items():
+        if (filename.rsplit("/", 1)[-1], function) in SERIALIZATION_FUNCTIONS:
+            total += cumulative
+    return total
+
+
+PROFILES: deque[Profile] = deque(maxlen=max(1, settings.profile_buffer_size))
+
+
+def find_profile(profile_id: str) -> Profile | None:
+    return next((profile for profile in PROFILES if profile.id == profile_id), None)
+
+
+def wants_profile(scope: dict) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.strip() in (b"1", b"true")
+    return settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate
+
+
+class ProfilingMiddleware:
+    """Profile the requests that ask for it; installed only when profiling is enabled.
+
+    Sits inside MetricsMiddleware so the request's DB and worker time are
+    already being tallied. The profile id is returned in X-Profile-Id.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.active or not wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        self.active = True
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - started
+            self.active = False
+            stats = current_request()
+            PROFILES.append(Profile(
+                profile_id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                route=route_template(scope),
+                status=status,
+                duration=duration,
+                stats=pstats.Stats(profiler),
+                db_time=stats.queries.time if stats else 0.0,
+                db_queries=stats.queries.count if stats else 0,
+                worker_time=stats.worker_time if stats else 0.0,
+            ))
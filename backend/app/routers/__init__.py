@@ -1,3 +1,3 @@
-from app.routers import languages, topics, exercises, roadmap
+from app.routers import languages, topics, exercises, roadmap, admin
 
-__all__ = ["languages", "topics", "exercises", "roadmap"]
+__all__ = ["languages", "topics", "exercises", "roadmap", "admin"]
@@ -0,0 +1,41 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse, Response
+
+from app.config import get_settings
+from app.profiling import PROFILES, find_profile
+
+settings = get_settings()
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """Summaries of the buffered request profiles, newest first"""
+    return [profile.summary() for profile in reversed(PROFILES)]
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "prof"):
+    """A profile as a .prof file for pstats/snakeviz, or format=text for the top functions by cumulative time"""
+    profile = find_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if format == "text":
+        return PlainTextResponse(profile.text())
+    return Response(
+        content=profile.dump(),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{profile.id}.prof"'}
+    )
@@ -3,21 +3,38 @@ from sqlalchemy.orm import Session
 from uuid import UUID
 
 from app.database import get_db
+from app.models.base import VisibleTestCases
 from app.models.topic import Topic
 from app.models.exercise import Exercise
 from app.schemas.exercise import (
-    ExerciseSchema,
+    ExercisePublicSchema,
+    ExerciseSolutionSchema,
     ExerciseGenerateRequest,
     ExerciseSubmitRequest,
     ExerciseSubmitResponse,
+    ExecutionModeEnum,
 )
 from app.services.ai_generator import generate_exercise
+from app.services.benchmarks import ensure_calibrated
 from app.services.code_runner import run_code
 
 router = APIRouter()
 
+# Columns of the client-facing view; solution_code is only loaded for grading and the
+# explicit solution endpoint, and hidden tests are dropped in SQL.
+PUBLIC_EXERCISE_COLUMNS = (
+    Exercise.id,
+    Exercise.topic_id,
+    Exercise.title,
+    Exercise.description,
+    Exercise.template_code,
+    VisibleTestCases(Exercise.test_cases).label("test_cases"),
+    Exercise.hints,
+    Exercise.created_at,
+)
+
 
-@router.post("/generate", response_model=ExerciseSchema)
+@router.post("/generate", response_model=ExercisePublicSchema)
 async def generate_new_exercise(
     request: ExerciseGenerateRequest,
     db: Session = Depends(get_db)
@@ -32,6 +49,15 @@ async def generate_new_exercise(
         difficulty=topic.difficulty
     )
 
+    # Identical requests share one generation, so the exercise may already be saved
+    existing = db.query(Exercise).filter(
+        Exercise.topic_id == topic.id,
+        Exercise.title == exercise_data["title"],
+        Exercise.description == exercise_data["description"],
+    ).first()
+    if existing:
+        return existing
+
     exercise = Exercise(
         topic_id=topic.id,
         title=exercise_data["title"],
@@ -49,9 +75,25 @@ async def generate_new_exercise(
     return exercise
 
 
-@router.get("/{exercise_id}", response_model=ExerciseSchema)
+@router.get("/{exercise_id}", response_model=ExercisePublicSchema)
 async def get_exercise(exercise_id: UUID, db: Session = Depends(get_db)):
-    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    exercise = (
+        db.query(*PUBLIC_EXERCISE_COLUMNS)
+        .filter(Exercise.id == exercise_id)
+        .first()
+    )
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+    return exercise
+
+
+@router.get("/{exercise_id}/solution", response_model=ExerciseSolutionSchema)
+async def get_exercise_solution(exercise_id: UUID, db: Session = Depends(get_db)):
+    exercise = (
+        db.query(Exercise.id, Exercise.solution_code)
+        .filter(Exercise.id == exercise_id)
+        .first()
+    )
     if not exercise:
         raise HTTPException(status_code=404, detail="Exercise not found")
     return exercise
@@ -68,6 +110,7 @@ async def submit_exercise(
         raise HTTPException(status_code=404, detail="Exercise not found")
 
     language_slug = exercise.topic.language.slug
+    await ensure_calibrated(db, exercise, language_slug)
 
     result = await run_code(
         language=language_slug,
@@ -76,3 +119,26 @@ async def submit_exercise(
     )
 
     return result
+
+
+@router.post("/{exercise_id}/run", response_model=ExerciseSubmitResponse)
+async def run_exercise(
+    exercise_id: UUID,
+    request: ExerciseSubmitRequest,
+    db: Session = Depends(get_db)
+):
+    exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+    if not exercise:
+        raise HTTPException(status_code=404, detail="Exercise not found")
+
+    language_slug = exercise.topic.language.slug
+    await ensure_calibrated(db, exercise, language_slug)
+
+    result = await run_code(
+        language=language_slug,
+        code=request.code,
+        test_cases=exercise.test_cases,
+        mode=ExecutionModeEnum.visible_only
+    )
+
+    return result
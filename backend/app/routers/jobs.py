@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from uuid import UUID
+
+from app.database import get_db
+from app.models.generation_job import GenerationJob
+from app.schemas.roadmap import GenerationJobSchema
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=GenerationJobSchema)
+async def get_job(job_id: UUID, db: Session = Depends(get_db)):
+    """Status of a background generation; problem_id points at the result once it has succeeded."""
+    job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
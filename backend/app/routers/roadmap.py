@@ -1,30 +1,83 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, load_only
+from sqlalchemy import case, func
 from uuid import UUID
 from typing import List
+from datetime import datetime, timezone
 import json
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
+from app.models.base import VisibleTestCases
 from app.models.language import Language
 from app.models.roadmap_node import RoadmapNode
-from app.models.roadmap_problem import RoadmapProblem, DifficultyEnum as DBDifficultyEnum, StatusEnum as DBStatusEnum, LevelEnum as DBLevelEnum
+from app.models.generation_job import GenerationJob, JobStatusEnum as DBJobStatusEnum
+from app.models.roadmap_problem import RoadmapProblem, DifficultyEnum as DBDifficultyEnum, StatusEnum as DBStatusEnum
 from app.schemas.roadmap import (
     RoadmapNodeSchema,
     RoadmapNodeWithProgress,
-    RoadmapProblemSchema,
+    RoadmapProblemPublic,
     RoadmapProblemSummary,
+    ProblemSolutionResponse,
     GenerateProblemRequest,
+    GenerationJobSchema,
     SubmitCodeRequest,
     SubmitCodeResponse,
     NodeProgressResponse,
     ModuleCompletionStatus,
 )
-from app.services.roadmap_generator import generate_roadmap_problem
-from app.services.code_runner import run_code
+from app.services.generation_jobs import JOB_RUNNER
+from app.schemas.exercise import ExecutionModeEnum
+from app.services.benchmarks import ensure_calibrated
+from app.services.code_runner import run_code, stream_code
 
 router = APIRouter()
 
+# Columns of the client-facing problem view; solution_code and the dedup
+# metadata are only loaded server-side, and hidden tests are dropped in SQL.
+PUBLIC_PROBLEM_COLUMNS = (
+    RoadmapProblem.id,
+    RoadmapProblem.node_id,
+    RoadmapProblem.difficulty,
+    RoadmapProblem.level,
+    RoadmapProblem.status,
+    RoadmapProblem.title,
+    RoadmapProblem.description,
+    RoadmapProblem.template_code,
+    VisibleTestCases(RoadmapProblem.test_cases).label("test_cases"),
+    RoadmapProblem.hints,
+    RoadmapProblem.created_at,
+)
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format a single server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def update_problem_status(problem: RoadmapProblem, passed: bool) -> None:
+    """Mark a problem solved on a passing run, or attempted on its first failing one."""
+    if passed:
+        problem.status = DBStatusEnum.solved
+    elif problem.status == DBStatusEnum.unsolved:
+        problem.status = DBStatusEnum.attempted
+
+
+def start_generation_job(db: Session, kind: str, node_id: UUID, params: dict) -> GenerationJob:
+    """Record a generation job and hand it to the runner; the request does not wait for the model."""
+    if JOB_RUNNER.full:
+        raise HTTPException(status_code=503, detail="Too many problems are being generated, try again shortly")
+
+    job = GenerationJob(
+        kind=kind, node_id=node_id, params=params, status=DBJobStatusEnum.queued,
+        owner=JOB_RUNNER.owner, heartbeat_at=datetime.now(timezone.utc),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    JOB_RUNNER.submit(job.id)
+    return job
+
 
 def parse_theory(theory):
     """Parse theory field if it's a JSON string, otherwise return as-is."""
@@ -38,6 +91,23 @@ def parse_theory(theory):
     return theory
 
 
+def problem_counts(db: Session, language_id: UUID) -> dict[tuple[UUID, DBDifficultyEnum], tuple[int, int]]:
+    """(problems, solved problems) per node and difficulty across a language's roadmap, in one query"""
+    rows = (
+        db.query(
+            RoadmapProblem.node_id,
+            RoadmapProblem.difficulty,
+            func.count(RoadmapProblem.id),
+            func.sum(case((RoadmapProblem.status == DBStatusEnum.solved, 1), else_=0)),
+        )
+        .join(RoadmapNode, RoadmapNode.id == RoadmapProblem.node_id)
+        .filter(RoadmapNode.language_id == language_id)
+        .group_by(RoadmapProblem.node_id, RoadmapProblem.difficulty)
+        .all()
+    )
+    return {(node_id, difficulty): (total, solved or 0) for node_id, difficulty, total, solved in rows}
+
+
 @router.get("/languages/{language_id}/roadmap", response_model=List[RoadmapNodeWithProgress])
 async def get_language_roadmap(language_id: UUID, db: Session = Depends(get_db)):
     """Get all roadmap nodes for a language with progress information."""
@@ -46,18 +116,13 @@ async def get_language_roadmap(language_id: UUID, db: Session = Depends(get_db))
         raise HTTPException(status_code=404, detail="Language not found")
 
     nodes = db.query(RoadmapNode).filter(RoadmapNode.language_id == language_id).all()
+    counts = problem_counts(db, language_id)
 
     result = []
     for node in nodes:
-        # Get problem counts by difficulty and status
-        problems = db.query(RoadmapProblem).filter(RoadmapProblem.node_id == node.id).all()
-
-        easy_count = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.easy)
-        medium_count = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.medium)
-        hard_count = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.hard)
-        easy_solved = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.easy and p.status == DBStatusEnum.solved)
-        medium_solved = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.medium and p.status == DBStatusEnum.solved)
-        hard_solved = sum(1 for p in problems if p.difficulty == DBDifficultyEnum.hard and p.status == DBStatusEnum.solved)
+        easy_count, easy_solved = counts.get((node.id, DBDifficultyEnum.easy), (0, 0))
+        medium_count, medium_solved = counts.get((node.id, DBDifficultyEnum.medium), (0, 0))
+        hard_count, hard_solved = counts.get((node.id, DBDifficultyEnum.hard), (0, 0))
 
         node_data = RoadmapNodeWithProgress(
             id=node.id,
@@ -103,57 +168,34 @@ async def get_node_problems(node_id: UUID, db: Session = Depends(get_db)):
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    problems = db.query(RoadmapProblem).filter(RoadmapProblem.node_id == node_id).order_by(RoadmapProblem.created_at.desc()).all()
+    problems = (
+        db.query(RoadmapProblem)
+        .options(load_only(
+            RoadmapProblem.id,
+            RoadmapProblem.title,
+            RoadmapProblem.difficulty,
+            RoadmapProblem.level,
+            RoadmapProblem.status,
+            RoadmapProblem.created_at,
+        ))
+        .filter(RoadmapProblem.node_id == node_id)
+        .order_by(RoadmapProblem.created_at.desc())
+        .all()
+    )
     return problems
 
 
-@router.post("/nodes/{node_id}/generate", response_model=RoadmapProblemSchema)
+@router.post("/nodes/{node_id}/generate", response_model=GenerationJobSchema, status_code=202)
 async def generate_problem(node_id: UUID, request: GenerateProblemRequest, db: Session = Depends(get_db)):
-    """Generate a new problem for a roadmap node."""
+    """Start generating a new problem for a roadmap node; poll the returned job at /api/jobs/{id}."""
     node = db.query(RoadmapNode).filter(RoadmapNode.id == node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
 
-    # Get existing problems to pass to the generator for deduplication
-    existing_problems = db.query(RoadmapProblem.title, RoadmapProblem.condensed_description).filter(
-        RoadmapProblem.node_id == node_id
-    ).all()
-    existing_problems = [
-        {"title": p.title, "condensed_description": p.condensed_description}
-        for p in existing_problems
-    ]
-
-    try:
-        problem_data = await generate_roadmap_problem(
-            concept_name=node.name,
-            keywords=node.concept_keywords or [],
-            difficulty=request.difficulty.value,
-            level=request.level.value,
-            existing_problems=existing_problems,
-        )
-
-        problem = RoadmapProblem(
-            node_id=node_id,
-            difficulty=DBDifficultyEnum(request.difficulty.value),
-            level=DBLevelEnum(request.level.value),
-            status=DBStatusEnum.unsolved,
-            title=problem_data["title"],
-            description=problem_data["description"],
-            template_code=problem_data["template_code"],
-            solution_code=problem_data["solution_code"],
-            test_cases=problem_data["test_cases"],
-            hints=problem_data.get("hints"),
-            description_hash=problem_data["description_hash"],
-            condensed_description=problem_data["condensed_description"],
-        )
-
-        db.add(problem)
-        db.commit()
-        db.refresh(problem)
-        return problem
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate problem: {str(e)}")
+    return start_generation_job(db, "roadmap_problem", node_id, {
+        "difficulty": request.difficulty.value,
+        "level": request.level.value,
+    })
 
 
 @router.delete("/problems/{problem_id}")
@@ -168,10 +210,27 @@ async def delete_problem(problem_id: UUID, db: Session = Depends(get_db)):
     return {"status": "deleted"}
 
 
-@router.get("/problems/{problem_id}", response_model=RoadmapProblemSchema)
+@router.get("/problems/{problem_id}", response_model=RoadmapProblemPublic)
 async def get_problem(problem_id: UUID, db: Session = Depends(get_db)):
-    """Get a single problem by ID."""
-    problem = db.query(RoadmapProblem).filter(RoadmapProblem.id == problem_id).first()
+    """Get a single problem by ID (client view, without solution or hidden tests)."""
+    problem = (
+        db.query(*PUBLIC_PROBLEM_COLUMNS)
+        .filter(RoadmapProblem.id == problem_id)
+        .first()
+    )
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+    return problem
+
+
+@router.get("/problems/{problem_id}/solution", response_model=ProblemSolutionResponse)
+async def get_problem_solution(problem_id: UUID, db: Session = Depends(get_db)):
+    """Get the reference solution for a problem on explicit request."""
+    problem = (
+        db.query(RoadmapProblem.id, RoadmapProblem.solution_code)
+        .filter(RoadmapProblem.id == problem_id)
+        .first()
+    )
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
     return problem
@@ -187,29 +246,104 @@ async def submit_problem(problem_id: UUID, request: SubmitCodeRequest, db: Sessi
     # Get the language from the node
     node = problem.node
     language_slug = node.language.slug
+    await ensure_calibrated(db, problem, language_slug)
 
     result = await run_code(
         language=language_slug,
         code=request.code,
         test_cases=problem.test_cases,
+        mode=ExecutionModeEnum.fail_fast if request.fail_fast else ExecutionModeEnum.full,
     )
 
     # Update problem status based on result
-    if result.passed:
-        problem.status = DBStatusEnum.solved
-    elif problem.status == DBStatusEnum.unsolved:
-        problem.status = DBStatusEnum.attempted
-
+    update_problem_status(problem, result.passed)
     db.commit()
 
     return SubmitCodeResponse(
         passed=result.passed,
-        results=[{"name": r.name, "passed": r.passed, "expected": r.expected, "actual": r.actual, "error": r.error} for r in result.results],
+        results=result.results,
+        compile_error=result.compile_error,
+        compile_error_details=result.compile_error_details,
+        runtime_error=result.runtime_error,
+        perf=result.perf,
+    )
+
+
+@router.post("/problems/{problem_id}/run", response_model=SubmitCodeResponse)
+async def run_problem(problem_id: UUID, request: SubmitCodeRequest, db: Session = Depends(get_db)):
+    """Run code against the visible test cases only, without grading the problem."""
+    problem = db.query(RoadmapProblem).filter(RoadmapProblem.id == problem_id).first()
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    language_slug = problem.node.language.slug
+    await ensure_calibrated(db, problem, language_slug)
+
+    result = await run_code(
+        language=language_slug,
+        code=request.code,
+        test_cases=problem.test_cases,
+        mode=ExecutionModeEnum.visible_only,
+    )
+
+    return SubmitCodeResponse(
+        passed=result.passed,
+        results=result.results,
         compile_error=result.compile_error,
+        compile_error_details=result.compile_error_details,
         runtime_error=result.runtime_error,
+        perf=result.perf,
     )
 
 
+@router.post("/problems/{problem_id}/submit/stream")
+async def submit_problem_stream(problem_id: UUID, request: SubmitCodeRequest, db: Session = Depends(get_db)):
+    """Submit code for a roadmap problem, streaming each test result as a server-sent event.
+
+    Emits one `result` event per finished test and a final `done` event with the
+    overall outcome. The problem status is updated once the run completes.
+    """
+    problem = db.query(RoadmapProblem).filter(RoadmapProblem.id == problem_id).first()
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    language_slug = problem.node.language.slug
+    await ensure_calibrated(db, problem, language_slug)
+    test_cases = problem.test_cases
+
+    async def event_stream():
+        async for event in stream_code(
+            language=language_slug,
+            code=request.code,
+            test_cases=test_cases,
+            mode=ExecutionModeEnum.fail_fast if request.fail_fast else ExecutionModeEnum.full,
+        ):
+            if event["event"] == "result":
+                yield sse_event("result", event["result"].model_dump())
+                continue
+
+            response = event["response"]
+
+            # The request-scoped session is closed once streaming starts
+            with SessionLocal() as status_db:
+                streamed_problem = status_db.get(RoadmapProblem, problem_id)
+                if streamed_problem:
+                    update_problem_status(streamed_problem, response.passed)
+                    status_db.commit()
+
+            yield sse_event("done", {
+                "passed": response.passed,
+                "compile_error": response.compile_error,
+                "compile_error_details": (
+                    response.compile_error_details.model_dump() if response.compile_error_details else None
+                ),
+                "runtime_error": response.runtime_error,
+                "perf": response.perf.model_dump() if response.perf else None,
+            })
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.get("/nodes/{node_id}/progress", response_model=NodeProgressResponse)
 async def get_node_progress(node_id: UUID, db: Session = Depends(get_db)):
     """Get solved counts by difficulty for a node."""
@@ -247,37 +381,26 @@ async def get_module_completion(language_id: UUID, db: Session = Depends(get_db)
         .all()
     )
 
+    # Concept node ids of each module, by topic
+    concept_ids: dict[str | None, list[UUID]] = {}
+    for node_id, topic in db.query(RoadmapNode.id, RoadmapNode.topic).filter(
+        RoadmapNode.language_id == language_id,
+        RoadmapNode.node_type == "concept"
+    ):
+        concept_ids.setdefault(topic, []).append(node_id)
+
+    counts = problem_counts(db, language_id)
+    # Nodes with at least one problem solved
+    solved_nodes = {node_id for (node_id, _), (_, solved) in counts.items() if solved}
+
     result = []
     for module_node in module_nodes:
-        # Get all problems for this module test node
-        problems = db.query(RoadmapProblem).filter(RoadmapProblem.node_id == module_node.id).all()
-
         # Count hard problems solved
-        hard_solved = sum(
-            1 for p in problems
-            if p.difficulty == DBDifficultyEnum.hard and p.status == DBStatusEnum.solved
-        )
-
-        # Get all concept nodes in this module
-        concept_nodes = (
-            db.query(RoadmapNode)
-            .filter(
-                RoadmapNode.language_id == language_id,
-                RoadmapNode.topic == module_node.topic,
-                RoadmapNode.node_type == "concept"
-            )
-            .all()
-        )
+        _, hard_solved = counts.get((module_node.id, DBDifficultyEnum.hard), (0, 0))
 
         # Count completed concept nodes (at least one problem solved)
-        nodes_complete = 0
-        for node in concept_nodes:
-            node_problems = db.query(RoadmapProblem).filter(
-                RoadmapProblem.node_id == node.id,
-                RoadmapProblem.status == DBStatusEnum.solved
-            ).count()
-            if node_problems > 0:
-                nodes_complete += 1
+        concept_nodes = concept_ids.get(module_node.topic, [])
+        nodes_complete = sum(1 for node_id in concept_nodes if node_id in solved_nodes)
 
         result.append(
             ModuleCompletionStatus(
@@ -293,9 +416,9 @@ async def get_module_completion(language_id: UUID, db: Session = Depends(get_db)
     return result
 
 
-@router.post("/nodes/{node_id}/generate-module-test", response_model=RoadmapProblemSchema)
+@router.post("/nodes/{node_id}/generate-module-test", response_model=GenerationJobSchema, status_code=202)
 async def generate_module_test(node_id: UUID, db: Session = Depends(get_db)):
-    """Generate a comprehensive module test problem combining all module concepts."""
+    """Start generating a module test problem combining all module concepts; poll the returned job."""
     node = db.query(RoadmapNode).filter(RoadmapNode.id == node_id).first()
     if not node:
         raise HTTPException(status_code=404, detail="Node not found")
@@ -303,59 +426,4 @@ async def generate_module_test(node_id: UUID, db: Session = Depends(get_db)):
     if node.node_type != "module_test":
         raise HTTPException(status_code=400, detail="This endpoint is only for module test nodes")
 
-    # Get all concept nodes in this module
-    concept_nodes = (
-        db.query(RoadmapNode)
-        .filter(
-            RoadmapNode.language_id == node.language_id,
-            RoadmapNode.topic == node.topic,
-            RoadmapNode.node_type == "concept"
-        )
-        .all()
-    )
-
-    # Collect all keywords from concept nodes
-    all_keywords = []
-    for concept_node in concept_nodes:
-        if concept_node.concept_keywords:
-            all_keywords.extend(concept_node.concept_keywords)
-
-    # Get existing problems for deduplication
-    existing_problems = db.query(RoadmapProblem.title, RoadmapProblem.condensed_description).filter(
-        RoadmapProblem.node_id == node_id
-    ).all()
-    existing_problems = [
-        {"title": p.title, "condensed_description": p.condensed_description}
-        for p in existing_problems
-    ]
-
-    try:
-        from app.services.roadmap_generator import generate_module_test_problem
-
-        problem_data = await generate_module_test_problem(
-            module_name=node.topic or "module",
-            keywords=all_keywords,
-            existing_problems=existing_problems,
-        )
-
-        problem = RoadmapProblem(
-            node_id=node_id,
-            difficulty=DBDifficultyEnum.hard,
-            status=DBStatusEnum.unsolved,
-            title=problem_data["title"],
-            description=problem_data["description"],
-            template_code=problem_data["template_code"],
-            solution_code=problem_data["solution_code"],
-            test_cases=problem_data["test_cases"],
-            hints=problem_data.get("hints"),
-            description_hash=problem_data["description_hash"],
-            condensed_description=problem_data["condensed_description"],
-        )
-
-        db.add(problem)
-        db.commit()
-        db.refresh(problem)
-        return problem
-
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate module test: {str(e)}")
+    return start_generation_job(db, "module_test", node_id, {})
@@ -2,10 +2,22 @@ from app.schemas.language import LanguageSchema, LanguageListSchema
 from app.schemas.topic import TopicSchema, TopicListSchema, TopicDetailSchema
 from app.schemas.exercise import (
     ExerciseSchema,
+    ExercisePublicSchema,
+    ExerciseSolutionSchema,
     ExerciseGenerateRequest,
     ExerciseSubmitRequest,
     ExerciseSubmitResponse,
     TestCaseResult,
+    TestResources,
+    PerfSummary,
+    BenchmarkResult,
+    OutputDiff,
+    TestKindEnum,
+    InputGenerator,
+    CheckerTypeEnum,
+    OutputChecker,
+    CompileErrorDetails,
+    ExecutionModeEnum,
 )
 
 __all__ = [
@@ -15,8 +27,20 @@ __all__ = [
     "TopicListSchema",
     "TopicDetailSchema",
     "ExerciseSchema",
+    "ExercisePublicSchema",
+    "ExerciseSolutionSchema",
     "ExerciseGenerateRequest",
     "ExerciseSubmitRequest",
     "ExerciseSubmitResponse",
     "TestCaseResult",
+    "TestResources",
+    "PerfSummary",
+    "BenchmarkResult",
+    "OutputDiff",
+    "TestKindEnum",
+    "InputGenerator",
+    "CheckerTypeEnum",
+    "OutputChecker",
+    "CompileErrorDetails",
+    "ExecutionModeEnum",
 ]
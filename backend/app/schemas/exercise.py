@@ -1,20 +1,84 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from uuid import UUID
 from datetime import datetime
 from typing import List, Any
+from enum import Enum
+
+
+class ExecutionModeEnum(str, Enum):
+    full = "full"  # every test case
+    fail_fast = "fail_fast"  # stop at the first failing test
+    visible_only = "visible_only"  # skip hidden tests, for interactive runs
+
+
+class TestKindEnum(str, Enum):
+    correctness = "correctness"  # graded on output only
+    benchmark = "benchmark"  # also graded on CPU time against the reference solution
+
+
+class InputGenerator(BaseModel):
+    """Deterministic test input: the worker runs generate(random.Random(seed), **params) from script"""
+    script: str
+    seed: int = 0
+    params: dict[str, Any] = {}
+
+
+class CheckerTypeEnum(str, Enum):
+    exact = "exact"  # stripped output equals the expected output
+    tokens = "tokens"  # same whitespace-separated tokens
+    float = "float"  # tokens, with numbers equal within abs_tol/rel_tol
+    json = "json"  # same JSON or Python literal structure, numbers within tolerance
+    unordered = "unordered"  # same list elements or lines, in any order
+    custom = "custom"  # script defines check(input, output, expected) -> bool | (bool, message)
+
+
+class OutputChecker(BaseModel):
+    """How the worker decides whether a test's output is correct"""
+    type: CheckerTypeEnum = CheckerTypeEnum.exact
+    abs_tol: float = 1e-6
+    rel_tol: float = 1e-6
+    script: str | None = None
 
 
 class TestCase(BaseModel):
     name: str
-    input: str
-    expected_output: str
+    input: str = ""
+    expected_output: str = ""
     hidden: bool = False
+    # Large inputs are generated by the worker instead of stored
+    generator: InputGenerator | None = None
+    # SHA-256 of the stripped expected output; recorded from the reference solution for generated tests
+    expected_hash: str | None = None
+    kind: TestKindEnum = TestKindEnum.correctness
+    # Benchmark only: reference solution CPU time, filled in by calibration
+    reference_ms: float | None = None
+    # Benchmark only: overrides TestCasesConfig.time_factor
+    time_factor: float | None = None
+    # Overrides TestCasesConfig.checker
+    checker: OutputChecker | None = None
 
 
 class TestCasesConfig(BaseModel):
     test_cases: List[TestCase]
     entry_point: str | None = None
     timeout_ms: int = 5000
+    # A benchmark test's budget is reference_ms * time_factor
+    time_factor: float = 3.0
+    # Checker for tests that do not set their own; exact when unset
+    checker: OutputChecker | None = None
+    # Worker build the reference timings were measured on
+    calibrated_version: str | None = None
+    calibration_error: str | None = None
+
+
+def visible_test_cases(test_cases: Any) -> Any:
+    """Return a copy of a test case config with hidden cases removed."""
+    if not isinstance(test_cases, dict):
+        return test_cases
+    return {
+        **test_cases,
+        "test_cases": [t for t in test_cases.get("test_cases", []) if not t.get("hidden")],
+    }
 
 
 class ExerciseSchema(BaseModel):
@@ -32,6 +96,36 @@ class ExerciseSchema(BaseModel):
         from_attributes = True
 
 
+class ExercisePublicSchema(BaseModel):
+    """Client-facing exercise view: no solution and no hidden test cases."""
+    id: UUID
+    topic_id: UUID
+    title: str
+    description: str
+    template_code: str
+    test_cases: TestCasesConfig | dict[str, Any]
+    hints: List[str] | None
+    created_at: datetime
+
+    # The public queries already drop hidden tests in SQL (VisibleTestCases);
+    # this also covers views built from a full row, such as a new exercise
+    @field_validator('test_cases', mode='before')
+    @classmethod
+    def strip_hidden_tests(cls, v):
+        return visible_test_cases(v)
+
+    class Config:
+        from_attributes = True
+
+
+class ExerciseSolutionSchema(BaseModel):
+    id: UUID
+    solution_code: str
+
+    class Config:
+        from_attributes = True
+
+
 class ExerciseGenerateRequest(BaseModel):
     topic_id: UUID
 
@@ -40,16 +134,68 @@ class ExerciseSubmitRequest(BaseModel):
     code: str
 
 
+class TestResources(BaseModel):
+    """What a single test's sandbox used, as measured by the worker"""
+    wall_time_ms: float
+    cpu_time_ms: float
+    max_rss_kb: int | None = None
+    termination: str  # ok, runtime_error, time_limit, memory_limit, output_limit, wrong_output or signal
+    signal: str | None = None
+
+
+class BenchmarkResult(BaseModel):
+    reference_ms: float
+    budget_ms: float
+    cpu_time_ms: float
+    ratio: float  # cpu_time_ms / reference_ms
+    within_budget: bool
+
+
+class OutputDiff(BaseModel):
+    """Where the output first differs from the expected output, with whitespace at either end ignored"""
+    offset: int  # byte offset into the stripped output
+    line: int
+    column: int
+    expected: str  # the expected line around the difference, clipped
+    actual: str
+
+
 class TestCaseResult(BaseModel):
     name: str
     passed: bool
     expected: str | None = None
     actual: str | None = None
     error: str | None = None
+    resources: TestResources | None = None
+    benchmark: BenchmarkResult | None = None
+    output_hash: str | None = None
+    diff: OutputDiff | None = None
+
+
+class PerfSummary(BaseModel):
+    """Resource usage aggregated over the tests of one run"""
+    tests_measured: int
+    total_wall_time_ms: float
+    max_wall_time_ms: float
+    total_cpu_time_ms: float
+    max_cpu_time_ms: float
+    # Largest max_rss_kb reported; None when no test reported one
+    peak_rss_kb: int | None = None
+    terminations: dict[str, int]
+
+
+class CompileErrorDetails(BaseModel):
+    type: str
+    message: str
+    line: int | None = None
+    column: int | None = None
+    text: str | None = None
 
 
 class ExerciseSubmitResponse(BaseModel):
     passed: bool
     results: List[TestCaseResult]
     compile_error: str | None = None
+    compile_error_details: CompileErrorDetails | None = None
     runtime_error: str | None = None
+    perf: PerfSummary | None = None
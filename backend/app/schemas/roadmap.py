@@ -5,6 +5,8 @@ from typing import List, Any
 from enum import Enum
 import json
 
+from app.schemas.exercise import CompileErrorDetails, PerfSummary, TestCaseResult, visible_test_cases
+
 
 class DifficultyEnum(str, Enum):
     easy = "easy"
@@ -25,6 +27,13 @@ class StatusEnum(str, Enum):
     solved = "solved"
 
 
+class JobStatusEnum(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
 class NodeTypeEnum(str, Enum):
     concept = "concept"
     module_test = "module_test"
@@ -133,6 +142,39 @@ class RoadmapProblemSchema(RoadmapProblemBase):
         from_attributes = True
 
 
+class RoadmapProblemPublic(BaseModel):
+    """Client-facing problem view: no solution, no hidden tests, no dedup metadata."""
+    id: UUID
+    node_id: UUID
+    difficulty: DifficultyEnum
+    level: LevelEnum
+    status: StatusEnum
+    title: str
+    description: str
+    template_code: str
+    test_cases: dict[str, Any]
+    hints: List[str] | None = None
+    created_at: datetime
+
+    # The public queries already drop hidden tests in SQL (VisibleTestCases);
+    # this also covers views built from a full row, such as a new exercise
+    @field_validator('test_cases', mode='before')
+    @classmethod
+    def strip_hidden_tests(cls, v):
+        return visible_test_cases(v)
+
+    class Config:
+        from_attributes = True
+
+
+class ProblemSolutionResponse(BaseModel):
+    id: UUID
+    solution_code: str
+
+    class Config:
+        from_attributes = True
+
+
 class RoadmapProblemSummary(BaseModel):
     id: UUID
     title: str
@@ -151,15 +193,34 @@ class GenerateProblemRequest(BaseModel):
     level: LevelEnum = LevelEnum.beginner
 
 
+class GenerationJobSchema(BaseModel):
+    """A background generation; problem_id is set once it has succeeded, error once it has failed"""
+    id: UUID
+    kind: str
+    node_id: UUID
+    status: JobStatusEnum
+    problem_id: UUID | None = None
+    error: str | None = None
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
 class SubmitCodeRequest(BaseModel):
     code: str
+    fail_fast: bool = False
 
 
 class SubmitCodeResponse(BaseModel):
     passed: bool
-    results: List[dict[str, Any]]
+    results: List[TestCaseResult]
     compile_error: str | None = None
+    compile_error_details: CompileErrorDetails | None = None
     runtime_error: str | None = None
+    perf: PerfSummary | None = None
 
 
 class NodeProgressResponse(BaseModel):
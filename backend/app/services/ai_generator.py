@@ -1,16 +1,15 @@
-import json
-from openai import AsyncOpenAI
-
-from app.config import get_settings
-
-settings = get_settings()
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+from app.services.generation_cache import GENERATION_CACHE
+from app.services.llm import completion_request
+from app.services.llm_output import complete_generation
+from app.services.prompt_budget import PromptBuilder
 
 
 SYSTEM_PROMPT = """You are a coding instructor who creates practice exercises.
 You generate exercises in a specific JSON format.
 Always respond with valid JSON only, no markdown formatting."""
 
+REQUIRED_FIELDS = ["title", "description", "template_code", "solution_code", "test_cases"]
+
 USER_PROMPT_TEMPLATE = """Generate a practice exercise for:
 Language: {language}
 Topic: {topic}
@@ -61,29 +60,12 @@ async def generate_exercise(language: str, topic: str, difficulty: str) -> dict:
         difficulty=difficulty
     )
 
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt}
-        ],
+    completion = completion_request(
+        "exercise",
+        messages=PromptBuilder("exercise").messages(SYSTEM_PROMPT, prompt),
         temperature=0.7,
         max_tokens=2000
     )
-
-    content = response.choices[0].message.content
-
-    # Clean up potential markdown formatting
-    if content.startswith("```"):
-        lines = content.split("\n")
-        content = "\n".join(lines[1:-1])
-
-    exercise_data = json.loads(content)
-
-    # Validate required fields
-    required_fields = ["title", "description", "template_code", "solution_code", "test_cases"]
-    for field in required_fields:
-        if field not in exercise_data:
-            raise ValueError(f"Missing required field: {field}")
-
-    return exercise_data
+    return await GENERATION_CACHE.get_or_generate(
+        "exercise", completion, lambda: complete_generation("exercise", completion, REQUIRED_FIELDS)
+    )
@@ -0,0 +1,150 @@
+import logging
+import statistics
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.services.code_runner import build_worker_payload, execute_on_worker
+from app.services.result_cache import TIMEOUT_ERROR
+from app.services.single_flight import SingleFlight
+from app.services.worker_pool import UNKNOWN_VERSION, WORKER_POOLS
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Keyed by (table, id) of the record being calibrated
+_calibrations = SingleFlight()
+
+
+class CalibrationUnavailable(Exception):
+    """No lasting verdict on the reference solution: the worker was unreachable or erroring, or the reference
+    timed out, which depends on load as much as on the code"""
+
+
+def is_benchmark(test: dict[str, Any]) -> bool:
+    return test.get("kind") == "benchmark"
+
+
+def needs_expected_hash(test: dict[str, Any]) -> bool:
+    """A generated test whose expected output has not been recorded yet"""
+    return bool(test.get("generator")) and not test.get("expected_hash") and not test.get("expected_output")
+
+
+def reference_tests(test_cases: dict[str, Any]) -> list[dict[str, Any]]:
+    """Tests that need data from the reference solution: benchmark timings or expected output hashes"""
+    return [
+        test for test in test_cases.get("test_cases", [])
+        if is_benchmark(test) or needs_expected_hash(test)
+    ]
+
+
+def needs_calibration(test_cases: dict[str, Any], worker_version: str) -> bool:
+    """Calibrate when never done, when a generated test lacks its expected hash,
+    or when benchmarks were timed on another worker build"""
+    if not isinstance(test_cases, dict) or not reference_tests(test_cases):
+        return False
+    calibrated_version = test_cases.get("calibrated_version")
+    if calibrated_version is None:
+        return True
+    if any(needs_expected_hash(test) for test in test_cases["test_cases"]) and not test_cases.get("calibration_error"):
+        return True
+    return worker_version != UNKNOWN_VERSION and calibrated_version != worker_version
+
+
+async def calibrate(language: str, solution_code: str, test_cases: dict[str, Any]) -> dict[str, Any]:
+    """Run the reference solution on the tests that need it and record what they need.
+
+    Benchmark tests get reference_ms, the median CPU time over
+    benchmark_calibration_runs runs. Generated tests without an expected
+    output get expected_hash, the hash of the reference output, which must
+    be the same on every run. If the reference fails, is not deterministic
+    or the worker reports no resource usage, the error is recorded and
+    the affected tests keep whatever they had. Raises CalibrationUnavailable
+    when the worker did not run every test or the reference timed out, so
+    nothing is recorded and a later request tries again.
+    """
+    pool = WORKER_POOLS[language]
+    tests = [
+        {k: v for k, v in test.items() if k != "reference_ms"}
+        for test in reference_tests(test_cases)
+    ]
+    payload = build_worker_payload(solution_code, {**test_cases, "test_cases": tests})
+
+    samples: list[list[float]] = [[] for _ in tests]
+    hashes: list[str | None] = [None for _ in tests]
+    error = None
+    for _ in range(max(1, settings.benchmark_calibration_runs)):
+        # Straight to the worker: a cached result would just repeat the first run
+        response = await execute_on_worker(pool, payload)
+        if response.compile_error:
+            error = response.compile_error
+            break
+        if response.runtime_error or len(response.results) != len(tests):
+            raise CalibrationUnavailable(response.runtime_error or "The worker did not run every test")
+        timed_out = next((result for result in response.results if result.error == TIMEOUT_ERROR), None)
+        if timed_out is not None:
+            raise CalibrationUnavailable(f"Reference solution timed out on {timed_out.name}")
+
+        for i, (test, result) in enumerate(zip(tests, response.results)):
+            # Generated tests with no recorded output cannot pass yet; they only need to run cleanly
+            ok = result.error is None if needs_expected_hash(test) else result.passed
+            if not ok:
+                error = f"Reference solution failed {result.name}: {result.error or result.actual}"
+            elif needs_expected_hash(test):
+                if hashes[i] is not None and hashes[i] != result.output_hash:
+                    error = f"Reference output for {result.name} differs between runs"
+                hashes[i] = result.output_hash
+            if is_benchmark(test):
+                if result.resources is None:
+                    error = f"The {language} worker does not report resource usage"
+                else:
+                    samples[i].append(result.resources.cpu_time_ms)
+        if error:
+            break
+
+    measured = iter(zip(samples, hashes))
+    updated = []
+    for test in test_cases.get("test_cases", []):
+        if is_benchmark(test) or needs_expected_hash(test):
+            sample, output_hash = next(measured)
+            if not error:
+                test = dict(test)
+                if is_benchmark(test):
+                    test["reference_ms"] = round(statistics.median(sample), 1)
+                if needs_expected_hash(test):
+                    test["expected_hash"] = output_hash
+        updated.append(test)
+
+    return {
+        **test_cases,
+        "test_cases": updated,
+        "calibrated_version": pool.version,
+        "calibration_error": error,
+    }
+
+
+async def ensure_calibrated(db: Session, record: Any, language: str):
+    """Calibrate an exercise's or problem's tests against its reference solution if needed.
+
+    record is an Exercise or RoadmapProblem; the results are saved on its
+    test_cases so later submissions reuse them. Concurrent requests for the
+    same record wait for one calibration instead of each running their own.
+    When the worker is unavailable nothing is saved, so the next request
+    tries again.
+    """
+    pool = WORKER_POOLS.get(language)
+    if not pool or not needs_calibration(record.test_cases, pool.version):
+        return
+
+    async def calibrate_and_save():
+        try:
+            record.test_cases = await calibrate(language, record.solution_code, record.test_cases)
+            db.commit()
+        except CalibrationUnavailable as e:
+            logger.warning("Calibration of %s %s postponed: %s", record.__tablename__, record.id, e)
+
+    _, shared = await _calibrations.do((record.__tablename__, record.id), calibrate_and_save)
+    if shared:
+        # Saved by the request that ran it
+        db.refresh(record)
@@ -1,39 +1,204 @@
+import asyncio
+import json
+import time
 import httpx
-from typing import Any
+from contextlib import aclosing
+from typing import Any, AsyncIterator
 
 from app.config import get_settings
-from app.schemas.exercise import ExerciseSubmitResponse, TestCaseResult
+from app.metrics import observe_worker_call
+from app.schemas.exercise import ExecutionModeEnum, ExerciseSubmitResponse, PerfSummary, TestCaseResult
+from app.services.result_cache import RESULT_CACHE, result_cache_key
+from app.services.worker_pool import WORKER_POOLS, WorkerEndpoint, WorkerPool
+from app.tracing import CLIENT, open_span, start_span, trace_headers
 
 settings = get_settings()
 
-WORKER_URLS = {
-    "python": settings.python_worker_url,
-    "javascript": settings.javascript_worker_url,
-    "cpp": settings.cpp_worker_url,
-    "react": settings.react_worker_url,
-}
+# Workers that implement the NDJSON /execute/stream endpoint
+STREAMING_LANGUAGES = {"python", "cpp"}
+# runtime_error of a stream the worker broke off or that does not match the tests sent
+INCOMPLETE_STREAM_ERROR = "Worker error: the result stream ended before the run finished"
+EXTRA_RESULTS_ERROR = "Worker error: more results than tests were run"
 
 
-async def run_code(language: str, code: str, test_cases: dict[str, Any]) -> ExerciseSubmitResponse:
-    worker_url = WORKER_URLS.get(language)
-    if not worker_url:
-        return ExerciseSubmitResponse(
-            passed=False,
-            results=[],
-            runtime_error=f"Unknown language: {language}"
-        )
+def with_budget(test: dict[str, Any], time_factor: float) -> dict[str, Any]:
+    """Attach budget_ms to a calibrated benchmark test so the worker grades its speed"""
+    if test.get("kind") != "benchmark" or not test.get("reference_ms"):
+        return test
+    budget_ms = test["reference_ms"] * (test.get("time_factor") or time_factor)
+    return {**test, "budget_ms": round(budget_ms, 1)}
+
+
+def with_checker(test: dict[str, Any], checker: dict[str, Any] | None) -> dict[str, Any]:
+    """Give a test the config-wide checker unless it has its own"""
+    if not checker or test.get("checker"):
+        return test
+    return {**test, "checker": checker}
+
+
+def build_worker_payload(
+    code: str, test_cases: dict[str, Any], mode: ExecutionModeEnum = ExecutionModeEnum.full
+) -> dict[str, Any]:
+    time_factor = test_cases.get("time_factor", 3.0)
+    checker = test_cases.get("checker")
+    return {
+        "code": code,
+        "test_cases": [
+            with_budget(with_checker(test, checker), time_factor) for test in test_cases.get("test_cases", [])
+        ],
+        "entry_point": test_cases.get("entry_point"),
+        "timeout_ms": test_cases.get("timeout_ms", 5000),
+        "mode": mode.value,
+    }
+
+
+def to_test_case_result(r: dict[str, Any]) -> TestCaseResult:
+    return TestCaseResult(
+        name=r.get("name", ""),
+        passed=r.get("passed", False),
+        expected=r.get("expected"),
+        actual=r.get("actual"),
+        error=r.get("error"),
+        resources=r.get("resources"),
+        benchmark=r.get("benchmark"),
+        output_hash=r.get("output_hash"),
+        diff=r.get("diff")
+    )
+
+
+def tests_run(payload: dict[str, Any]) -> list[dict[str, Any]]:
+    """The payload's tests the worker runs, in the order it reports their results"""
+    if payload["mode"] == ExecutionModeEnum.visible_only.value:
+        return [test for test in payload["test_cases"] if not test.get("hidden")]
+    return payload["test_cases"]
+
+
+def redact_hidden(result: TestCaseResult, test: dict[str, Any]) -> TestCaseResult:
+    """A hidden test's result shows only whether it passed and what it used, never its data"""
+    if not test.get("hidden"):
+        return result
+    return TestCaseResult(name=result.name, passed=result.passed, resources=result.resources)
+
+
+def redact_response(response: ExerciseSubmitResponse, payload: dict[str, Any]) -> ExerciseSubmitResponse:
+    results = [redact_hidden(result, test) for result, test in zip(response.results, tests_run(payload))]
+    return response.model_copy(update={"results": results})
 
+
+def summarize_perf(results: list[TestCaseResult]) -> PerfSummary | None:
+    """Aggregate per-test resource usage; None when the worker reports none"""
+    measured = [r.resources for r in results if r.resources]
+    if not measured:
+        return None
+
+    terminations: dict[str, int] = {}
+    for resources in measured:
+        terminations[resources.termination] = terminations.get(resources.termination, 0) + 1
+
+    return PerfSummary(
+        tests_measured=len(measured),
+        total_wall_time_ms=round(sum(r.wall_time_ms for r in measured), 1),
+        max_wall_time_ms=max(r.wall_time_ms for r in measured),
+        total_cpu_time_ms=round(sum(r.cpu_time_ms for r in measured), 1),
+        max_cpu_time_ms=max(r.cpu_time_ms for r in measured),
+        peak_rss_kb=max((r.max_rss_kb for r in measured if r.max_rss_kb is not None), default=None),
+        terminations=terminations,
+    )
+
+
+class WorkerUnavailable(Exception):
+    """Every replica of a worker failed to produce a response"""
+
+
+async def post_to_endpoint(
+    client: httpx.AsyncClient, pool: WorkerPool, endpoint: WorkerEndpoint, payload: dict[str, Any]
+) -> httpx.Response:
+    started = time.perf_counter()
+    span_attributes = {"worker.language": pool.language, "worker.url": endpoint.url}
+    async with pool.lease(endpoint):
+        with start_span("worker POST /execute", CLIENT, **span_attributes) as span:
+            try:
+                response = await client.post(f"{endpoint.url}/execute", json=payload, headers=trace_headers())
+            except httpx.TransportError as e:
+                endpoint.record_failure()
+                outcome = "timeout" if isinstance(e, httpx.TimeoutException) else "unreachable"
+                observe_worker_call(pool.language, outcome, time.perf_counter() - started)
+                raise
+            span.set(**{"http.status_code": response.status_code})
+
+    # 5xx means the replica is broken or draining; 4xx is about the request itself
+    if response.status_code >= 500:
+        endpoint.record_failure()
+    else:
+        endpoint.record_success()
+    outcome = "error" if response.status_code >= 500 else "ok"
+    observe_worker_call(pool.language, outcome, time.perf_counter() - started)
+    return response
+
+
+async def hedged_post(client: httpx.AsyncClient, pool: WorkerPool, payload: dict[str, Any]) -> httpx.Response:
+    """POST /execute to the least loaded replica, hedging and failing over to the others.
+
+    Runs have no side effects on the worker, so if hedging is enabled and the
+    first replica has not answered after worker_hedge_delay_ms, the same run
+    is sent to the next replica (budget permitting) and whichever finishes
+    first wins. A transport error or 5xx fails over immediately. Each replica
+    is tried at most once per run.
+    """
+    pool.record_request()
+    hedge_delay = settings.worker_hedge_delay_ms / 1000 or None
+    tried: set[str] = set()
+    pending: set[asyncio.Task] = set()
+    last_response = None
+    last_error = None
+
+    def launch() -> bool:
+        endpoint = pool.pick(exclude=tried)
+        if endpoint is None:
+            return False
+        tried.add(endpoint.url)
+        pending.add(asyncio.create_task(post_to_endpoint(client, pool, endpoint, payload)))
+        return True
+
+    launch()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Hedge once; after that just wait for whichever replica answers
+                hedge_delay = None
+                if len(tried) < len(pool.endpoints) and pool.take_hedge():
+                    launch()
+                continue
+
+            for task in done:
+                pending.discard(task)
+                try:
+                    response = task.result()
+                except httpx.HTTPError as e:
+                    last_error = e
+                    continue
+                if response.status_code < 500:
+                    return response
+                last_response = response
+
+            if not pending:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if last_response is not None:
+        return last_response
+    if isinstance(last_error, httpx.TimeoutException):
+        raise last_error
+    raise WorkerUnavailable(f"No {pool.language} worker available: {last_error}")
+
+
+async def execute_on_worker(pool: WorkerPool, payload: dict[str, Any]) -> ExerciseSubmitResponse:
     try:
         async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{worker_url}/execute",
-                json={
-                    "code": code,
-                    "test_cases": test_cases.get("test_cases", []),
-                    "entry_point": test_cases.get("entry_point"),
-                    "timeout_ms": test_cases.get("timeout_ms", 5000)
-                }
-            )
+            response = await hedged_post(client, pool, payload)
 
             if response.status_code != 200:
                 return ExerciseSubmitResponse(
@@ -44,16 +209,7 @@ async def run_code(language: str, code: str, test_cases: dict[str, Any]) -> Exer
 
             data = response.json()
 
-            results = [
-                TestCaseResult(
-                    name=r.get("name", ""),
-                    passed=r.get("passed", False),
-                    expected=r.get("expected"),
-                    actual=r.get("actual"),
-                    error=r.get("error")
-                )
-                for r in data.get("results", [])
-            ]
+            results = [to_test_case_result(r) for r in data.get("results", [])]
 
             all_passed = all(r.passed for r in results) and len(results) > 0
 
@@ -61,7 +217,9 @@ async def run_code(language: str, code: str, test_cases: dict[str, Any]) -> Exer
                 passed=all_passed,
                 results=results,
                 compile_error=data.get("compile_error"),
-                runtime_error=data.get("runtime_error")
+                compile_error_details=data.get("compile_error_details"),
+                runtime_error=data.get("runtime_error"),
+                perf=summarize_perf(results)
             )
 
     except httpx.TimeoutException:
@@ -76,3 +234,183 @@ async def run_code(language: str, code: str, test_cases: dict[str, Any]) -> Exer
             results=[],
             runtime_error=str(e)
         )
+
+
+async def run_code(
+    language: str,
+    code: str,
+    test_cases: dict[str, Any],
+    mode: ExecutionModeEnum = ExecutionModeEnum.full,
+) -> ExerciseSubmitResponse:
+    pool = WORKER_POOLS.get(language)
+    if not pool or not pool.endpoints:
+        return ExerciseSubmitResponse(
+            passed=False,
+            results=[],
+            runtime_error=f"Unknown language: {language}"
+        )
+
+    payload = build_worker_payload(code, test_cases, mode)
+    with start_span("run_code", **{"worker.language": language, "tests": len(payload["test_cases"])}):
+        worker_version = pool.version
+        response = await RESULT_CACHE.get_or_run(
+            result_cache_key(language, worker_version, payload),
+            worker_version,
+            lambda: execute_on_worker(pool, payload)
+        )
+    return redact_response(response, payload)
+
+
+async def stream_code(
+    language: str,
+    code: str,
+    test_cases: dict[str, Any],
+    mode: ExecutionModeEnum = ExecutionModeEnum.full,
+) -> AsyncIterator[dict[str, Any]]:
+    """Relay per-test results from the worker as they complete.
+
+    Yields {"event": "result", "result": TestCaseResult} for each finished test,
+    then a final {"event": "done", "response": ExerciseSubmitResponse} carrying
+    every result plus compile/runtime errors. Workers without a streaming
+    endpoint are run through run_code and replayed, as are cached results
+    and runs coalesced with an identical one already in flight. Hidden
+    tests' results are redacted, as in run_code.
+    """
+    if language not in STREAMING_LANGUAGES:
+        response = await run_code(language, code, test_cases, mode)
+        for result in response.results:
+            yield {"event": "result", "result": result}
+        yield {"event": "done", "response": response}
+        return
+
+    pool = WORKER_POOLS[language]
+    payload = build_worker_payload(code, test_cases, mode)
+    worker_version = pool.version
+    key = result_cache_key(language, worker_version, payload)
+
+    cached = await RESULT_CACHE.lookup(key)
+    if cached is not None:
+        cached = redact_response(cached, payload)
+        for result in cached.results:
+            yield {"event": "result", "result": result}
+        yield {"event": "done", "response": cached}
+        return
+
+    # The cache keeps the full results; only what is sent on is redacted
+    tests = iter(tests_run(payload))
+    with RESULT_CACHE.running(key, worker_version) as publish:
+        async with aclosing(stream_from_worker(pool, payload)) as events:
+            async for event in events:
+                if event["event"] == "result":
+                    test = next(tests, None)
+                    if test is None:
+                        # Results no longer line up with tests, so none can be redacted or cached safely
+                        yield {"event": "done", "response": ExerciseSubmitResponse(
+                            passed=False, results=[], runtime_error=EXTRA_RESULTS_ERROR
+                        )}
+                        return
+                    yield {"event": "result", "result": redact_hidden(event["result"], test)}
+                else:
+                    response = event["response"]
+                    publish(response)
+                    yield {"event": "done", "response": redact_response(response, payload)}
+
+
+async def stream_from_worker(pool: WorkerPool, payload: dict[str, Any]) -> AsyncIterator[dict[str, Any]]:
+    """Stream a run from the first replica that accepts it.
+
+    Streams are not hedged, since results are forwarded as they arrive, but a
+    replica that fails before sending anything is skipped for the next one.
+    """
+    results: list[TestCaseResult] = []
+    compile_error = None
+    compile_error_details = None
+    runtime_error = None
+    tried: set[str] = set()
+
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            while (endpoint := pool.pick(exclude=tried)) is not None:
+                tried.add(endpoint.url)
+                started = time.perf_counter()
+                outcome = "unreachable"
+                span = open_span(
+                    "worker POST /execute/stream", CLIENT,
+                    **{"worker.language": pool.language, "worker.url": endpoint.url}
+                )
+                async with pool.lease(endpoint):
+                    try:
+                        async with client.stream(
+                            "POST", f"{endpoint.url}/execute/stream", json=payload, headers=trace_headers(span)
+                        ) as response:
+                            span.set(**{"http.status_code": response.status_code})
+                            if response.status_code != 200:
+                                body = await response.aread()
+                                runtime_error = f"Worker error: {body.decode(errors='replace')}"
+                                if response.status_code >= 500:
+                                    outcome = "error"
+                                    endpoint.record_failure()
+                                    continue
+                                outcome = "ok"
+                                break
+
+                            runtime_error = INCOMPLETE_STREAM_ERROR
+                            async for line in response.aiter_lines():
+                                if not line.strip():
+                                    continue
+                                event = json.loads(line)
+                                if event.get("event") == "result":
+                                    result = to_test_case_result(event.get("result", {}))
+                                    results.append(result)
+                                    yield {"event": "result", "result": result}
+                                elif event.get("event") == "done":
+                                    compile_error = event.get("compile_error")
+                                    compile_error_details = event.get("compile_error_details")
+                                    runtime_error = event.get("runtime_error")
+                                    outcome = "ok"
+                            # Judged only once the whole body is in: a replica can fail part way through
+                            if outcome != "ok":
+                                outcome = "error"
+                                endpoint.record_failure()
+                            else:
+                                endpoint.record_success()
+                            break
+                    except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                        # Nothing was sent to the client yet, so another replica can take the run
+                        endpoint.record_failure()
+                        runtime_error = f"No {pool.language} worker available: {e}"
+                    except httpx.TimeoutException:
+                        outcome = "timeout"
+                        raise
+                    except (httpx.TransportError, ValueError) as e:
+                        # The replica broke the stream off or sent something unreadable
+                        outcome = "error"
+                        endpoint.record_failure()
+                        runtime_error = f"{INCOMPLETE_STREAM_ERROR}: {e}"
+                        if results:
+                            # Results already went to the client, so the run cannot move to another replica
+                            break
+                    except (GeneratorExit, asyncio.CancelledError):
+                        # The client went away; the replica did nothing wrong
+                        outcome = "cancelled"
+                        raise
+                    finally:
+                        observe_worker_call(pool.language, outcome, time.perf_counter() - started)
+                        span.end(None if outcome == "ok" else outcome)
+
+    except httpx.TimeoutException:
+        runtime_error = "Code execution timed out"
+    except Exception as e:
+        runtime_error = str(e)
+
+    yield {
+        "event": "done",
+        "response": ExerciseSubmitResponse(
+            passed=all(r.passed for r in results) and len(results) > 0,
+            results=results,
+            compile_error=compile_error,
+            compile_error_details=compile_error_details,
+            runtime_error=runtime_error,
+            perf=summarize_perf(results)
+        ),
+    }
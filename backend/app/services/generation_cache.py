@@ -0,0 +1,99 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+from app.config import get_settings
+from app.metrics import LLM_GENERATION_CACHE_LOOKUPS
+from app.services.single_flight import SingleFlight
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+def generation_cache_key(completion: dict[str, Any]) -> str:
+    """Hash the whole completion request: model, messages and sampling parameters"""
+    material = json.dumps(completion, sort_keys=True, default=str)
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class GenerationCache:
+    """Share LLM generations between identical prompts.
+
+    While a generation for a prompt is running, identical requests await it
+    instead of calling the model again, so a class opening the same node at
+    once pays for one call. With a directory set, finished generations are
+    also stored there as JSON keyed by prompt hash and replayed for
+    ttl_seconds (0 keeps them for good), which lets tests run against
+    recorded responses without an API key.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: float):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._in_flight = SingleFlight()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> dict[str, Any] | None:
+        if not self.directory:
+            return None
+        try:
+            with open(self.path(key)) as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable generation cache entry %s: %s", key, e)
+            return None
+        if self.ttl_seconds > 0 and time.time() >= entry["created_at"] + self.ttl_seconds:
+            return None
+        return entry["result"]
+
+    def store(self, key: str, kind: str, completion: dict[str, Any], result: dict[str, Any]):
+        if not self.directory:
+            return
+        entry = {"kind": kind, "created_at": time.time(), "request": completion, "result": result}
+        temp_path = f"{self.path(key)}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, "w") as f:
+                json.dump(entry, f, indent=2)
+            # Readers only ever see a complete entry
+            os.replace(temp_path, self.path(key))
+        except OSError as e:
+            logger.warning("Could not store generation cache entry %s: %s", key, e)
+
+    async def get_or_generate(
+        self, kind: str, completion: dict[str, Any], generate: Callable[[], Awaitable[dict[str, Any]]]
+    ) -> dict[str, Any]:
+        """Return the stored or in-flight result for this completion request, or generate it.
+
+        A failed generation fails every caller waiting on it and is not stored; a
+        cancelled one is taken over by one of them.
+        """
+        key = generation_cache_key(completion)
+
+        stored = self.load(key)
+        if stored is not None:
+            LLM_GENERATION_CACHE_LOOKUPS.labels(kind, "hit").inc()
+            return stored
+
+        async def generate_and_store():
+            LLM_GENERATION_CACHE_LOOKUPS.labels(kind, "miss").inc()
+            result = await generate()
+            self.store(key, kind, completion, result)
+            return result
+
+        result, shared = await self._in_flight.do(key, generate_and_store)
+        if shared:
+            LLM_GENERATION_CACHE_LOOKUPS.labels(kind, "coalesced").inc()
+        # Each caller gets its own copy, since routers may adjust the data before saving it
+        return copy.deepcopy(result)
+
+
+GENERATION_CACHE = GenerationCache(settings.llm_cache_dir, settings.llm_cache_ttl_seconds)
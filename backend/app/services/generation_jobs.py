@@ -0,0 +1,283 @@
+"""Problem generation as background jobs.
+
+A generate request records a GenerationJob and returns it at once; the job
+runs here, in the backend process, and clients poll GET /api/jobs/{id}. At
+most generation_max_concurrency jobs talk to the model at a time. While one
+does, it holds no database connection: the session used to read the node
+and existing problems is closed before the LLM call and a new one saves the
+result. Each job is owned by the process running it, which keeps its
+heartbeat fresh; jobs whose owner stopped heartbeating are taken over.
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from uuid import UUID, uuid4
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.metrics import GENERATION_JOBS, GENERATION_JOBS_PENDING
+from app.models.generation_job import GenerationJob, JobStatusEnum
+from app.models.roadmap_node import RoadmapNode
+from app.models.roadmap_problem import RoadmapProblem, DifficultyEnum, LevelEnum, StatusEnum
+from app.services.prompt_budget import interleave
+from app.services.roadmap_generator import generate_module_test_problem, generate_roadmap_problem
+from app.tracing import start_span
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_ERROR = "The server shut down before the job finished"
+
+
+def existing_problems_for(db: Session, node_id: UUID) -> list[dict]:
+    """Problems already on the node, passed to the generator for deduplication"""
+    existing_problems = db.query(RoadmapProblem.title, RoadmapProblem.condensed_description).filter(
+        RoadmapProblem.node_id == node_id
+    ).all()
+    return [
+        {"title": p.title, "condensed_description": p.condensed_description}
+        for p in existing_problems
+    ]
+
+
+def roadmap_problem_args(db: Session, job: GenerationJob) -> dict:
+    node = db.get(RoadmapNode, job.node_id)
+    return {
+        "concept_name": node.name,
+        "keywords": node.concept_keywords or [],
+        "difficulty": job.params["difficulty"],
+        "level": job.params["level"],
+        "existing_problems": existing_problems_for(db, job.node_id),
+    }
+
+
+def module_test_args(db: Session, job: GenerationJob) -> dict:
+    node = db.get(RoadmapNode, job.node_id)
+    # Get all concept nodes in this module
+    concept_nodes = (
+        db.query(RoadmapNode)
+        .filter(
+            RoadmapNode.language_id == node.language_id,
+            RoadmapNode.topic == node.topic,
+            RoadmapNode.node_type == "concept"
+        )
+        .all()
+    )
+    return {
+        "module_name": node.topic or "module",
+        # Taking turns between concept nodes, so a trimmed prompt still covers each concept
+        "keywords": interleave(concept_node.concept_keywords or [] for concept_node in concept_nodes),
+        "existing_problems": existing_problems_for(db, job.node_id),
+    }
+
+
+# Per job kind: what to read for the prompt and the generator to call with it
+GENERATORS = {
+    "roadmap_problem": (roadmap_problem_args, generate_roadmap_problem),
+    "module_test": (module_test_args, generate_module_test_problem),
+}
+
+
+def save_generated_problem(db: Session, problem: RoadmapProblem) -> RoadmapProblem:
+    """Insert a generated problem, or return the node's stored one with the same description_hash.
+
+    Identical generate requests share one LLM result (and the response cache
+    replays old ones), so the same problem can arrive more than once.
+    """
+    same_problem = (
+        db.query(RoadmapProblem)
+        .filter(RoadmapProblem.node_id == problem.node_id, RoadmapProblem.description_hash == problem.description_hash)
+    )
+    existing = same_problem.first()
+    if existing:
+        return existing
+
+    db.add(problem)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent job sharing the generation inserted it first
+        db.rollback()
+        return same_problem.one()
+    db.refresh(problem)
+    return problem
+
+
+def build_problem(job: GenerationJob, problem_data: dict) -> RoadmapProblem:
+    if job.kind == "module_test":
+        difficulty, level = DifficultyEnum.hard, LevelEnum.beginner
+    else:
+        difficulty, level = DifficultyEnum(job.params["difficulty"]), LevelEnum(job.params["level"])
+    return RoadmapProblem(
+        node_id=job.node_id,
+        difficulty=difficulty,
+        level=level,
+        status=StatusEnum.unsolved,
+        title=problem_data["title"],
+        description=problem_data["description"],
+        template_code=problem_data["template_code"],
+        solution_code=problem_data["solution_code"],
+        test_cases=problem_data["test_cases"],
+        hints=problem_data.get("hints"),
+        description_hash=problem_data["description_hash"],
+        condensed_description=problem_data["condensed_description"],
+    )
+
+
+def finish_job(job_id: UUID, owner: str, status: JobStatusEnum, problem_id: UUID | None = None,
+               error: str | None = None):
+    with SessionLocal() as db:
+        job = db.get(GenerationJob, job_id)
+        if job is None or job.owner != owner:
+            # The node, and its jobs with it, was deleted meanwhile, or another process took the job over
+            return
+        job.status = status
+        job.problem_id = problem_id
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        GENERATION_JOBS.labels(job.kind, status.value).inc()
+
+
+class GenerationJobRunner:
+    """Runs generation jobs as tasks of the backend's event loop, a bounded number at a time.
+
+    Jobs it accepts or takes over are stamped with owner, and their
+    heartbeat_at is refreshed every heartbeat_seconds while they are
+    unfinished. A job still queued or running whose heartbeat is older than
+    stale_seconds belongs to a process that is gone; any runner may claim it.
+    """
+
+    def __init__(self, max_concurrency: int, max_pending: int, heartbeat_seconds: float, stale_seconds: float):
+        self.max_pending = max_pending
+        self.heartbeat_seconds = heartbeat_seconds
+        self.stale_seconds = stale_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._heartbeat: asyncio.Task | None = None
+
+    @property
+    def full(self) -> bool:
+        return len(self._tasks) >= self.max_pending
+
+    def submit(self, job_id: UUID):
+        task = asyncio.create_task(self.run(job_id))
+        self._tasks.add(task)
+        GENERATION_JOBS_PENDING.set(len(self._tasks))
+
+        def done(task: asyncio.Task):
+            self._tasks.discard(task)
+            GENERATION_JOBS_PENDING.set(len(self._tasks))
+
+        task.add_done_callback(done)
+
+    async def run(self, job_id: UUID):
+        try:
+            async with self._semaphore:
+                with start_span("generation job", **{"job.id": str(job_id)}) as span:
+                    with SessionLocal() as db:
+                        job = db.get(GenerationJob, job_id)
+                        if job is None or job.owner != self.owner:
+                            return
+                        span.set(**{"job.kind": job.kind})
+                        read_args, generate = GENERATORS[job.kind]
+                        job.status = JobStatusEnum.running
+                        job.started_at = datetime.now(timezone.utc)
+                        args = read_args(db, job)
+                        db.commit()
+
+                    # No connection is held while the model works, which takes seconds
+                    problem_data = await generate(**args)
+
+                    with SessionLocal() as db:
+                        job = db.get(GenerationJob, job_id)
+                        if job is None:
+                            return
+                        problem_id = save_generated_problem(db, build_problem(job, problem_data)).id
+            finish_job(job_id, self.owner, JobStatusEnum.succeeded, problem_id=problem_id)
+        except asyncio.CancelledError:
+            finish_job(job_id, self.owner, JobStatusEnum.failed, error=SHUTDOWN_ERROR)
+            raise
+        except Exception as e:
+            logger.exception("Generation job %s failed", job_id)
+            finish_job(job_id, self.owner, JobStatusEnum.failed, error=f"Failed to generate problem: {e}")
+
+    def start(self):
+        """Take over abandoned jobs, then keep heartbeating this process's jobs and looking for more"""
+        self.resume()
+        self._heartbeat = asyncio.create_task(self.keep_alive())
+
+    async def keep_alive(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            try:
+                self.heartbeat()
+                self.resume()
+            except Exception:
+                logger.exception("Generation job heartbeat failed")
+
+    def heartbeat(self):
+        """Show the jobs this process owns are still being worked on"""
+        with SessionLocal() as db:
+            db.query(GenerationJob).filter(
+                GenerationJob.owner == self.owner,
+                GenerationJob.status.in_([JobStatusEnum.queued, JobStatusEnum.running]),
+            ).update({GenerationJob.heartbeat_at: datetime.now(timezone.utc)}, synchronize_session=False)
+            db.commit()
+
+    def resume(self):
+        """Claim and re-run jobs whose owner stopped heartbeating, while there is room for them.
+
+        Jobs live in the process that accepted them, so after a crash or a kill
+        they would stay unfinished forever. Each claim is a conditional update
+        on the stale heartbeat, so when several processes look at once only
+        one of them gets a job. Jobs left over when the runner is full stay
+        stale for a later look, here or in another process.
+        """
+        now = datetime.now(timezone.utc)
+        stale = (GenerationJob.heartbeat_at.is_(None)) | (
+            GenerationJob.heartbeat_at < now - timedelta(seconds=self.stale_seconds)
+        )
+        unfinished = GenerationJob.status.in_([JobStatusEnum.queued, JobStatusEnum.running])
+        claimed = 0
+        with SessionLocal() as db:
+            job_ids = [
+                job_id for (job_id,) in db.query(GenerationJob.id)
+                .filter(unfinished, stale)
+                .order_by(GenerationJob.created_at)
+            ]
+            for job_id in job_ids:
+                if self.full:
+                    break
+                won = db.query(GenerationJob).filter(GenerationJob.id == job_id, unfinished, stale).update(
+                    {GenerationJob.owner: self.owner, GenerationJob.heartbeat_at: now}, synchronize_session=False
+                )
+                db.commit()
+                if won:
+                    self.submit(job_id)
+                    claimed += 1
+        if claimed:
+            logger.info("Took over %d generation jobs left unfinished", claimed)
+
+    async def shutdown(self):
+        """Cancel the jobs still queued or running; they are recorded as failed"""
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+JOB_RUNNER = GenerationJobRunner(
+    settings.generation_max_concurrency,
+    settings.generation_max_pending,
+    settings.generation_job_heartbeat_seconds,
+    settings.generation_job_stale_seconds,
+)
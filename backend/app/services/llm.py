@@ -0,0 +1,230 @@
+"""LLM providers behind one chat completion call.
+
+Every generation kind ("exercise", "roadmap_problem", "module_test") is routed
+to a provider and model: llm_provider/llm_model by default, overridden per
+kind in llm_routes, so a cheap fast model can take the kinds that do not need
+the large one. Providers:
+
+- openai: the OpenAI API, or any OpenAI-compatible server (llama.cpp's
+  llama-server, vLLM, Ollama) via openai_base_url
+- local: in-process CPU inference with llama-cpp-python; the model is the
+  path of a GGUF file
+- fake: deterministic canned JSON derived from the prompt, for tests and
+  benchmarks without an API key
+"""
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any
+
+from openai import AsyncOpenAI
+
+from app.config import get_settings
+from app.metrics import LLM_GENERATION_DURATION, LLM_TOKENS
+from app.tracing import CLIENT, start_span
+
+settings = get_settings()
+
+OPENAI_API_URL = "https://api.openai.com/v1"
+
+
+class LLMResponse:
+    """Text of the first choice plus what the provider reports about the call"""
+
+    def __init__(self, content: str, model: str, prompt_tokens: int | None, completion_tokens: int | None,
+                 finish_reason: str | None):
+        self.content = content
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.finish_reason = finish_reason
+
+
+class OpenAIProvider:
+    name = "openai"
+
+    def __init__(self, api_key: str, base_url: str):
+        self.api_key = api_key
+        self.base_url = base_url
+        self._client = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Created on first use so importing the app needs no API key
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url or OPENAI_API_URL)
+        return self._client
+
+    async def complete(self, model: str, messages: list[dict], temperature: float, max_tokens: int) -> LLMResponse:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        choice = response.choices[0]
+        usage = response.usage
+        return LLMResponse(
+            choice.message.content,
+            response.model or model,
+            usage.prompt_tokens if usage else None,
+            usage.completion_tokens if usage else None,
+            choice.finish_reason,
+        )
+
+
+class LlamaCppProvider:
+    """Runs GGUF models on the CPU in a worker thread, loading each model on first use"""
+
+    name = "local"
+
+    def __init__(self, threads: int, context_tokens: int):
+        self.threads = threads
+        self.context_tokens = context_tokens
+        self._models: dict[str, Any] = {}
+        # A llama.cpp context serves one generation at a time
+        self._lock = threading.Lock()
+
+    def load(self, model_path: str):
+        if model_path not in self._models:
+            try:
+                from llama_cpp import Llama
+            except ImportError as e:
+                raise RuntimeError("The local LLM provider needs llama-cpp-python installed") from e
+            self._models[model_path] = Llama(
+                model_path=model_path,
+                n_ctx=self.context_tokens,
+                n_threads=self.threads or None,
+                verbose=False,
+            )
+        return self._models[model_path]
+
+    def generate(self, model_path: str, messages: list[dict], temperature: float, max_tokens: int) -> dict:
+        with self._lock:
+            return self.load(model_path).create_chat_completion(
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+
+    async def complete(self, model: str, messages: list[dict], temperature: float, max_tokens: int) -> LLMResponse:
+        response = await asyncio.to_thread(self.generate, model, messages, temperature, max_tokens)
+        choice = response["choices"][0]
+        usage = response.get("usage") or {}
+        return LLMResponse(
+            choice["message"]["content"],
+            model,
+            usage.get("prompt_tokens"),
+            usage.get("completion_tokens"),
+            choice.get("finish_reason"),
+        )
+
+
+FAKE_SOLUTION_CODE = "def solve(text):\n    return text.upper()\n"
+FAKE_TEST_CASES = {
+    "test_cases": [
+        {"name": f"case_{i}", "input": word, "expected_output": word.upper(), "hidden": i >= 2}
+        for i, word in enumerate(["hello", "Mixed Case", "already UPPER", ""])
+    ],
+    "entry_point": "solve",
+    "timeout_ms": 5000,
+}
+
+
+class FakeProvider:
+    """Answers every prompt with a valid, runnable problem derived from the prompt.
+
+    The same prompt always gets the same answer and different prompts get
+    different titles and condensed descriptions, so deduplication behaves as
+    it would with a real model. Like a real model it stops at max_tokens, and
+    asked to continue a cut-off answer it sends the rest.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+
+    def answer(self, messages: list[dict]) -> str:
+        digest = hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).hexdigest()[:12]
+        return json.dumps({
+            "title": f"Shout the text ({digest})",
+            "description": "Write a function `solve(text)` that returns the text in upper case.",
+            "template_code": "def solve(text):\n    # TODO: return the text in upper case\n    pass\n",
+            "solution_code": FAKE_SOLUTION_CODE,
+            "test_cases": FAKE_TEST_CASES,
+            "hints": ["Strings have a method for this", "Return the result rather than printing it"],
+            "condensed_description": f"Return the input string upper-cased; variant {digest}",
+        })
+
+    async def complete(self, model: str, messages: list[dict], temperature: float, max_tokens: int) -> LLMResponse:
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000)
+        written = ""
+        if len(messages) > 2 and messages[-2]["role"] == "assistant":
+            messages, written = messages[:-2], messages[-2]["content"]
+        content = self.answer(messages)[len(written):]
+        finish_reason = "stop"
+        # Roughly four characters per token, like English text through a BPE tokenizer
+        if len(content) > max_tokens * 4:
+            content, finish_reason = content[:max_tokens * 4], "length"
+        prompt_tokens = len(json.dumps(messages)) // 4
+        return LLMResponse(content, model, prompt_tokens, len(content) // 4, finish_reason)
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider(settings.openai_api_key, settings.openai_base_url),
+    "local": LlamaCppProvider(settings.llm_local_threads, settings.llm_local_context_tokens),
+    "fake": FakeProvider(settings.llm_fake_latency_ms),
+}
+
+
+def parse_route(value: str) -> tuple[str, str]:
+    """(provider, model) from "provider:model", or the default provider for a bare model name"""
+    provider, separator, model = value.partition(":")
+    # Only a known provider counts as a prefix; model names like "llama3:8b" contain colons too
+    if separator and provider in PROVIDERS:
+        return provider, model
+    return settings.llm_provider, value
+
+
+def route(kind: str) -> tuple[str, str]:
+    """Provider and model generating this kind of content"""
+    if kind in settings.llm_routes:
+        return parse_route(settings.llm_routes[kind])
+    return settings.llm_provider, settings.llm_model
+
+
+def completion_request(kind: str, messages: list[dict], temperature: float, max_tokens: int) -> dict[str, Any]:
+    """Everything that determines a generation, routed for kind; also what the generation cache keys on"""
+    provider, model = route(kind)
+    return {
+        "provider": provider,
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+
+
+async def complete(kind: str, completion: dict[str, Any]) -> LLMResponse:
+    """Run a completion request on its provider, timing it and counting its tokens"""
+    provider = PROVIDERS[completion["provider"]]
+    model = completion["model"]
+    with LLM_GENERATION_DURATION.labels(kind).time(), start_span(
+        "llm chat.completions", CLIENT, **{"llm.kind": kind, "llm.provider": provider.name, "llm.model": model}
+    ) as span:
+        response = await provider.complete(
+            model, completion["messages"], completion["temperature"], completion["max_tokens"]
+        )
+        span.set(**{"llm.finish_reason": response.finish_reason or ""})
+        if response.prompt_tokens is not None:
+            span.set(**{"llm.prompt_tokens": response.prompt_tokens,
+                        "llm.completion_tokens": response.completion_tokens})
+
+    if response.prompt_tokens is not None:
+        LLM_TOKENS.labels(kind, provider.name, model, "prompt").inc(response.prompt_tokens)
+    if response.completion_tokens is not None:
+        LLM_TOKENS.labels(kind, provider.name, model, "completion").inc(response.completion_tokens)
+    return response
@@ -0,0 +1,181 @@
+"""Turning raw model output into a validated generation.
+
+Models wrap JSON in markdown fences, add prose around it and get cut off at
+max_tokens. The scanner below finds the first complete JSON object wherever
+it is in the text; when the output ends inside the object, the model is asked
+to continue from where it stopped (a few hundred tokens instead of a whole new
+generation), and only when that is exhausted is the cut-off object closed at
+its last complete member.
+"""
+import logging
+from json import JSONDecodeError, JSONDecoder
+from typing import Any
+
+from pydantic import ValidationError
+
+from app.config import get_settings
+from app.metrics import LLM_OUTPUT_RECOVERIES
+from app.schemas.exercise import TestCasesConfig
+from app.services.llm import complete
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+CONTINUE_PROMPT = (
+    "Your response was cut off. Continue the JSON exactly where it stopped, without repeating "
+    "anything already written and without any commentary or markdown."
+)
+CLOSERS = {"{": "}", "[": "]"}
+decoder = JSONDecoder()
+
+
+class TruncatedJSON:
+    """An object that was still open when the text ended, with what is needed to close it.
+
+    cut is the end of the last complete member and closers the brackets still
+    open there, so text[start:cut] + closers is valid JSON.
+    """
+
+    def __init__(self, start: int, cut: int, closers: str):
+        self.start = start
+        self.cut = cut
+        self.closers = closers
+
+    def repair(self, text: str) -> dict | None:
+        try:
+            value = decoder.decode(text[self.start:self.cut] + self.closers)
+        except JSONDecodeError:
+            return None
+        return value if isinstance(value, dict) else None
+
+
+def scan_object(text: str, start: int) -> int | TruncatedJSON | None:
+    """End of the JSON object opening at text[start], or where to repair it if text ends first.
+
+    None if the brackets do not match, so it is not JSON.
+    """
+    stack = []
+    in_string = escaped = False
+    cut, cut_closers = start + 1, "}"
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in CLOSERS:
+            in_array = bool(stack) and stack[-1] == "]"
+            stack.append(CLOSERS[char])
+            # An empty container is a safe place to stop, except as an array element,
+            # where dropping the partial element is better than keeping an empty one
+            if not in_array:
+                cut, cut_closers = i + 1, "".join(reversed(stack))
+        elif char in "}]":
+            if not stack or stack.pop() != char:
+                return None
+            if not stack:
+                return i + 1
+        elif char == ",":
+            # Everything before a separator is a complete member
+            cut, cut_closers = i, "".join(reversed(stack))
+    return TruncatedJSON(start, cut, cut_closers)
+
+
+def extract_json_object(text: str) -> dict | TruncatedJSON:
+    """The first complete JSON object in text, skipping fences and prose around it.
+
+    If the text ends inside an object, returns its TruncatedJSON instead.
+    Raises ValueError when there is no object at all.
+    """
+    start = text.find("{")
+    while start != -1:
+        end = scan_object(text, start)
+        if isinstance(end, TruncatedJSON):
+            return end
+        value = None
+        if end is not None:
+            try:
+                value = decoder.decode(text[start:end])
+            except JSONDecodeError:
+                # Braces in prose, e.g. "{like this}"; try the next one
+                pass
+        if isinstance(value, dict):
+            return value
+        start = text.find("{", start + 1)
+    raise ValueError("No JSON object in the model output")
+
+
+def strip_fence(text: str) -> str:
+    """Drop a markdown fence the model opened a continuation with"""
+    stripped = text.lstrip()
+    if stripped.startswith("```"):
+        return stripped.split("\n", 1)[1] if "\n" in stripped else ""
+    return text
+
+
+def is_complete_generation(text: str, required_fields: list[str]) -> bool:
+    try:
+        extracted = extract_json_object(text)
+    except ValueError:
+        return False
+    return isinstance(extracted, dict) and all(field in extracted for field in required_fields)
+
+
+def validate_generation(data: dict, required_fields: list[str]):
+    """Raise ValueError unless the generation has every field and usable test cases"""
+    for field in required_fields:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+    try:
+        TestCasesConfig.model_validate(data["test_cases"])
+    except ValidationError as e:
+        raise ValueError(f"Invalid test_cases: {e}") from e
+
+
+async def complete_generation(kind: str, completion: dict[str, Any], required_fields: list[str]) -> dict:
+    """Run a completion and parse its output into a validated generation.
+
+    Output cut off at max_tokens is continued up to llm_max_continuations
+    times; if it is still incomplete, the object is closed at its last complete
+    member and kept if it still validates.
+    """
+    response = await complete(kind, completion)
+    content = response.content
+    continuations = 0
+    while True:
+        extracted = extract_json_object(content)
+        if isinstance(extracted, dict):
+            validate_generation(extracted, required_fields)
+            if continuations:
+                LLM_OUTPUT_RECOVERIES.labels(kind, "continued").inc()
+            return extracted
+        if continuations >= settings.llm_max_continuations:
+            break
+
+        continuations += 1
+        logger.info("Continuing %s generation cut off after %d characters", kind, len(content))
+        response = await complete(kind, {
+            **completion,
+            "messages": completion["messages"] + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": CONTINUE_PROMPT},
+            ],
+        })
+        more = strip_fence(response.content)
+        if is_complete_generation(more, required_fields):
+            # The model started over instead of continuing
+            content = more
+        else:
+            content += more
+
+    repaired = extracted.repair(content)
+    if repaired is None:
+        raise ValueError("Model output was cut off and could not be repaired")
+    validate_generation(repaired, required_fields)
+    LLM_OUTPUT_RECOVERIES.labels(kind, "repaired").inc()
+    return repaired
@@ -0,0 +1,127 @@
+"""Keeping generation prompts within a token budget.
+
+The variable parts of a prompt (keywords, existing problems to avoid) grow with
+the roadmap. Each is fitted to its own budget here: keywords are deduplicated
+and cut off, and existing problems are ranked by how close they are to the
+concept being generated, listed in full while they fit, then by title only,
+then counted. Sizes are reported in llm_prompt_tokens.
+"""
+import math
+import re
+from typing import Iterable
+
+from app.metrics import LLM_PROMPT_TOKENS, LLM_PROMPT_ITEMS_DROPPED
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text: exact with tiktoken installed, otherwise a close estimate.
+
+    The estimate counts a token per punctuation mark and per four characters
+    of each word, which is how BPE vocabularies split English and code.
+    """
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text))
+    return sum(math.ceil(len(token) / 4) for token in WORD_PATTERN.findall(text))
+
+
+def words(text: str) -> set[str]:
+    return {word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) > 2}
+
+
+def interleave(lists: Iterable[list[str]]) -> list[str]:
+    """Round-robin over several lists, so cutting the result short keeps some of each"""
+    lists = [list(items) for items in lists]
+    return [items[i] for i in range(max(map(len, lists), default=0)) for items in lists if i < len(items)]
+
+
+class PromptBuilder:
+    """Fits the variable sections of one prompt to their budgets and reports the sizes"""
+
+    def __init__(self, kind: str):
+        self.kind = kind
+
+    def dropped(self, section: str, count: int):
+        if count:
+            LLM_PROMPT_ITEMS_DROPPED.labels(self.kind, section).inc(count)
+
+    def keywords(self, keywords: list[str], budget: int, default: str) -> str:
+        """Comma-separated keywords without duplicates (ignoring case), cut off at the budget"""
+        by_name = {}
+        for keyword in keywords:
+            by_name.setdefault(keyword.strip().lower(), keyword.strip())
+        unique = [keyword for keyword in by_name.values() if keyword]
+        kept, used = [], 0
+        for keyword in unique:
+            cost = count_tokens(keyword) + 1
+            if used + cost > budget:
+                break
+            kept.append(keyword)
+            used += cost
+        self.dropped("keywords", len(unique) - len(kept))
+        text = ", ".join(kept) if kept else default
+        LLM_PROMPT_TOKENS.labels(self.kind, "keywords").observe(count_tokens(text))
+        return text
+
+    def existing_problems(self, problems: list[dict], topic: str, budget: int) -> str:
+        """The section listing problems to avoid, most similar to topic first"""
+        if not problems:
+            return ""
+
+        topic_words = words(topic)
+
+        def relevance(problem: dict) -> float:
+            problem_words = words(f"{problem['title']} {problem['condensed_description']}")
+            return len(problem_words & topic_words) / math.sqrt(len(problem_words) or 1)
+
+        ranked = sorted(problems, key=relevance, reverse=True)
+        lines, used = [], 0
+        for problem in ranked:
+            line = f"- {problem['title']}: {problem['condensed_description']}"
+            cost = count_tokens(line)
+            if used + cost > budget:
+                break
+            lines.append(line)
+            used += cost
+
+        # Titles alone still steer the model away from the rest
+        titles = []
+        for problem in ranked[len(lines):]:
+            cost = count_tokens(problem["title"]) + 1
+            if used + cost > budget:
+                break
+            titles.append(problem["title"])
+            used += cost
+        remaining = len(ranked) - len(lines) - len(titles)
+        if titles:
+            lines.append(f"- Also covered: {'; '.join(titles)}")
+        if remaining:
+            lines.append(f"- ...and {remaining} more")
+        self.dropped("existing_problems", remaining)
+        problems_list = "\n".join(lines)
+
+        section = f"""
+IMPORTANT - These problems already exist for this concept. Generate something DIFFERENT:
+{problems_list}
+
+Do NOT repeat or closely resemble any of the above problems. Create a unique exercise.
+"""
+        LLM_PROMPT_TOKENS.labels(self.kind, "existing_problems").observe(count_tokens(section))
+        return section
+
+    def messages(self, system_prompt: str, prompt: str) -> list[dict]:
+        LLM_PROMPT_TOKENS.labels(self.kind, "total").observe(count_tokens(system_prompt) + count_tokens(prompt))
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable
+
+from app.config import get_settings
+from app.schemas.exercise import ExerciseSubmitResponse
+from app.services.single_flight import SingleFlight
+from app.services.worker_pool import UNKNOWN_VERSION
+
+settings = get_settings()
+
+# Per-test error a worker reports when a run hits its time limit
+TIMEOUT_ERROR = "Execution timed out"
+
+
+def result_cache_key(language: str, worker_version: str, payload: dict[str, Any]) -> str:
+    """Hash everything that determines a run's outcome: language, worker build, code, tests and mode"""
+    material = json.dumps(
+        {"language": language, "worker_version": worker_version, "payload": payload},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+def is_cacheable(response: ExerciseSubmitResponse, worker_version: str) -> bool:
+    """Only keep verdicts the worker actually reached, from a known worker build.
+
+    Infrastructure failures (unreachable worker, request timeout) and test
+    timeouts, which depend on load as much as on the code, are retried next time.
+    Until a health probe has reported the build, the key cannot tell one build's
+    results from the next, so nothing is kept.
+    """
+    if worker_version == UNKNOWN_VERSION:
+        return False
+    if response.runtime_error:
+        return False
+    if not response.results and not response.compile_error:
+        return False
+    return not any(result.error == TIMEOUT_ERROR for result in response.results)
+
+
+class ResultCache:
+    """LRU cache of run results with a TTL, coalescing identical runs in flight.
+
+    While a run for a key is executing, other callers with the same key await
+    its result instead of sending their own run to a worker. A run that ends
+    without a result (it failed or its caller went away) is taken over by one
+    of them.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, ExerciseSubmitResponse]] = OrderedDict()
+        self._in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> ExerciseSubmitResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key: str, response: ExerciseSubmitResponse, worker_version: str):
+        if not self.enabled or not is_cacheable(response, worker_version):
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @contextmanager
+    def running(self, key: str, worker_version: str):
+        """Register a run for key so identical callers wait on it; the yielded function publishes its response"""
+        if not self.enabled:
+            yield lambda response: None
+            return
+        with self._in_flight.lead(key) as future:
+            def publish(response: ExerciseSubmitResponse):
+                self.put(key, response, worker_version)
+                future.set_result(response)
+
+            yield publish
+
+    async def lookup(self, key: str) -> ExerciseSubmitResponse | None:
+        """Return a cached or in-flight result for key, counting the hit or miss"""
+        if not self.enabled:
+            return None
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        found, response = await self._in_flight.wait(key)
+        if found:
+            self.coalesced += 1
+            return response
+        self.misses += 1
+        return None
+
+    async def get_or_run(
+        self, key: str, worker_version: str, run: Callable[[], Awaitable[ExerciseSubmitResponse]]
+    ) -> ExerciseSubmitResponse:
+        found = await self.lookup(key)
+        if found is not None:
+            return found
+        with self.running(key, worker_version) as publish:
+            response = await run()
+            publish(response)
+        return response
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+RESULT_CACHE = ResultCache(settings.result_cache_max_entries, settings.result_cache_ttl_seconds)
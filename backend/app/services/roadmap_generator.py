@@ -1,12 +1,13 @@
-import json
 import hashlib
-from openai import AsyncOpenAI
 from typing import List
 
 from app.config import get_settings
+from app.services.generation_cache import GENERATION_CACHE
+from app.services.llm import completion_request
+from app.services.llm_output import complete_generation
+from app.services.prompt_budget import PromptBuilder
 
 settings = get_settings()
-client = AsyncOpenAI(api_key=settings.openai_api_key)
 
 
 SYSTEM_PROMPT = """You are an expert Python instructor who creates practical coding exercises.
@@ -14,6 +15,8 @@ Focus on REAL-WORLD backend development, not algorithmic puzzles or leetcode-sty
 Your exercises should teach Python language features as they're used in production code.
 Always respond with valid JSON only, no markdown formatting."""
 
+REQUIRED_FIELDS = ["title", "description", "template_code", "solution_code", "test_cases", "condensed_description"]
+
 USER_PROMPT_TEMPLATE = """Generate a Python practice exercise for:
 Concept: {concept_name}
 Related Keywords: {keywords}
@@ -69,6 +72,13 @@ Make sure:
 - Solution passes all test cases
 - Test cases cover normal usage and edge cases
 - Entry point matches the main function students should implement
+- For advanced level, where speed matters (data structures, concurrency, algorithms over large data),
+  you may add 1-2 tests with "kind": "benchmark"; they are also graded on runtime against the solution.
+  Give them a large input through a generator instead of "input", and leave "expected_output" empty:
+  "generator": {{"script": "def generate(rng, n):\\n    return [[rng.randint(0, 10**6) for _ in range(n)]]", "seed": 1, "params": {{"n": 200000}}}}
+- If several outputs are correct, set "checker" on the config (or a single test) instead of exact matching:
+  {{"type": "float", "abs_tol": 1e-6}} for floating point results, {{"type": "unordered"}} when order does not matter,
+  {{"type": "json"}} for dicts and nested data
 """
 
 
@@ -77,22 +87,15 @@ def generate_hash(condensed_description: str) -> str:
     return hashlib.sha256(condensed_description.encode()).hexdigest()
 
 
-def build_existing_problems_section(existing_problems: List[dict]) -> str:
-    """Build the prompt section that lists existing problems to avoid."""
-    if not existing_problems:
-        return ""
-
-    problems_list = "\n".join(
-        f"- {p['title']}: {p['condensed_description']}"
-        for p in existing_problems
-    )
+async def complete_problem(kind: str, completion: dict) -> dict:
+    """Ask the model for a problem, validate it and add its description_hash"""
+    problem_data = await complete_generation(kind, completion, REQUIRED_FIELDS)
 
-    return f"""
-IMPORTANT - These problems already exist for this concept. Generate something DIFFERENT:
-{problems_list}
+    # Generate hash for record keeping
+    condensed = problem_data["condensed_description"]
+    problem_data["description_hash"] = generate_hash(condensed)
 
-Do NOT repeat or closely resemble any of the above problems. Create a unique exercise.
-"""
+    return problem_data
 
 
 async def generate_roadmap_problem(
@@ -114,8 +117,11 @@ async def generate_roadmap_problem(
     Returns:
         dict with problem data including description_hash
     """
-    keywords_str = ", ".join(keywords) if keywords else "general usage"
-    existing_section = build_existing_problems_section(existing_problems)
+    builder = PromptBuilder("roadmap_problem")
+    keywords_str = builder.keywords(keywords, settings.prompt_keywords_budget_tokens, default="general usage")
+    existing_section = builder.existing_problems(
+        existing_problems, f"{concept_name} {keywords_str}", settings.prompt_existing_problems_budget_tokens
+    )
 
     prompt = USER_PROMPT_TEMPLATE.format(
         concept_name=concept_name,
@@ -125,41 +131,15 @@ async def generate_roadmap_problem(
         existing_problems_section=existing_section,
     )
 
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt}
-        ],
+    completion = completion_request(
+        "roadmap_problem",
+        messages=builder.messages(SYSTEM_PROMPT, prompt),
         temperature=0.8,
         max_tokens=2500
     )
-
-    content = response.choices[0].message.content
-
-    # Clean up potential markdown formatting
-    if content.startswith("```"):
-        lines = content.split("\n")
-        # Remove first and last lines if they're markdown markers
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        content = "\n".join(lines)
-
-    problem_data = json.loads(content)
-
-    # Validate required fields
-    required_fields = ["title", "description", "template_code", "solution_code", "test_cases", "condensed_description"]
-    for field in required_fields:
-        if field not in problem_data:
-            raise ValueError(f"Missing required field: {field}")
-
-    # Generate hash for record keeping
-    condensed = problem_data["condensed_description"]
-    problem_data["description_hash"] = generate_hash(condensed)
-
-    return problem_data
+    return await GENERATION_CACHE.get_or_generate(
+        "roadmap_problem", completion, lambda: complete_problem("roadmap_problem", completion)
+    )
 
 
 MODULE_TEST_PROMPT_TEMPLATE = """Generate a comprehensive MODULE TEST for Python {module_name}.
@@ -216,14 +196,18 @@ async def generate_module_test_problem(
 
     Args:
         module_name: The module topic (e.g., "fundamentals", "oop")
-        keywords: All keywords from all concept nodes in the module
+        keywords: All keywords from all concept nodes in the module, interleaved by node so
+            the ones dropped to fit the prompt budget are spread across concepts
         existing_problems: List of existing problems with 'title' and 'condensed_description'
 
     Returns:
         dict with problem data including description_hash
     """
-    keywords_str = ", ".join(keywords) if keywords else "general concepts"
-    existing_section = build_existing_problems_section(existing_problems)
+    builder = PromptBuilder("module_test")
+    keywords_str = builder.keywords(keywords, settings.prompt_keywords_budget_tokens, default="general concepts")
+    existing_section = builder.existing_problems(
+        existing_problems, f"{module_name} {keywords_str}", settings.prompt_existing_problems_budget_tokens
+    )
 
     prompt = MODULE_TEST_PROMPT_TEMPLATE.format(
         module_name=module_name,
@@ -231,37 +215,12 @@ async def generate_module_test_problem(
         existing_problems_section=existing_section,
     )
 
-    response = await client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": prompt}
-        ],
+    completion = completion_request(
+        "module_test",
+        messages=builder.messages(SYSTEM_PROMPT, prompt),
         temperature=0.8,
         max_tokens=2500
     )
-
-    content = response.choices[0].message.content
-
-    # Clean up potential markdown formatting
-    if content.startswith("```"):
-        lines = content.split("\n")
-        if lines[0].startswith("```"):
-            lines = lines[1:]
-        if lines and lines[-1].strip() == "```":
-            lines = lines[:-1]
-        content = "\n".join(lines)
-
-    problem_data = json.loads(content)
-
-    # Validate required fields
-    required_fields = ["title", "description", "template_code", "solution_code", "test_cases", "condensed_description"]
-    for field in required_fields:
-        if field not in problem_data:
-            raise ValueError(f"Missing required field: {field}")
-
-    # Generate hash for record keeping
-    condensed = problem_data["condensed_description"]
-    problem_data["description_hash"] = generate_hash(condensed)
-
-    return problem_data
+    return await GENERATION_CACHE.get_or_generate(
+        "module_test", completion, lambda: complete_problem("module_test", completion)
+    )
@@ -0,0 +1,54 @@
+import asyncio
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; callers arriving meanwhile share its outcome.
+
+    A call that raises fails every caller waiting on it. One that ends
+    without a result, because its caller was cancelled or went away, is
+    taken over by one of the waiters.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    async def wait(self, key: Hashable) -> tuple[bool, Any]:
+        """Wait for the call in flight for key: (True, its result), or (False, None) when there is none to wait for"""
+        while (pending := self._in_flight.get(key)) is not None:
+            try:
+                return True, await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The caller running it went away; take over
+        return False, None
+
+    @contextmanager
+    def lead(self, key: Hashable):
+        """Register the caller as running the call for key; it sets the yielded future's result when it has one"""
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            yield future
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+                # Mark retrieved so a call nobody else waited on does not log an unhandled error
+                future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._in_flight[key]
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Run call for key, or share the run already in flight; returns (result, whether it was shared)"""
+        found, result = await self.wait(key)
+        if found:
+            return result, True
+        with self.lead(key) as future:
+            result = await call()
+            future.set_result(result)
+        return result, False
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+
+from app.config import get_settings
+
+settings = get_settings()
+
+HEALTH_TIMEOUT_SECONDS = 2.0
+# Hedges that can be saved up while runs are fast
+HEDGE_BURST = 10.0
+# A pool's version until one of its workers has answered a health probe
+UNKNOWN_VERSION = "unknown"
+
+
+def parse_worker_urls(value: str) -> list[str]:
+    """Split a comma-separated worker URL setting into endpoint URLs"""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+class WorkerEndpoint:
+    """One worker replica plus the state the balancer keeps about it.
+
+    healthy is driven by /health probes. The circuit opens after
+    worker_failure_threshold consecutive request failures and stays open for
+    worker_circuit_cooldown_seconds; the next request after that is a trial,
+    and one more failure reopens it.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.healthy = True
+        self.version = None
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    @property
+    def circuit_open(self) -> bool:
+        return time.monotonic() < self.open_until
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and not self.circuit_open
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.worker_failure_threshold:
+            self.open_until = time.monotonic() + settings.worker_circuit_cooldown_seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "healthy": self.healthy,
+            "version": self.version,
+            "circuit_open": self.circuit_open,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class WorkerPool:
+    """Least-outstanding-requests balancer over the replicas of one language's worker.
+
+    Hedges are paid for from a token budget: every request earns
+    worker_hedge_budget_ratio of a hedge, so when the whole pool is slow the
+    extra load stays at that fraction instead of doubling.
+    """
+
+    def __init__(self, language: str, urls: list[str]):
+        self.language = language
+        self.endpoints = [WorkerEndpoint(url) for url in urls]
+        self.hedge_tokens = HEDGE_BURST
+
+    def record_request(self):
+        self.hedge_tokens = min(self.hedge_tokens + settings.worker_hedge_budget_ratio, HEDGE_BURST)
+
+    def take_hedge(self) -> bool:
+        """Spend a hedge from the budget; False when it is used up"""
+        if self.hedge_tokens < 1:
+            return False
+        self.hedge_tokens -= 1
+        return True
+
+    def pick(self, exclude: set = frozenset()) -> WorkerEndpoint | None:
+        """Return the available endpoint with the fewest requests in flight.
+
+        When every remaining endpoint is unhealthy or open, the least loaded one
+        is still returned so a request is attempted rather than failed outright.
+        """
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.url not in exclude]
+        if not candidates:
+            return None
+        available = [endpoint for endpoint in candidates if endpoint.available]
+        return min(available or candidates, key=lambda endpoint: endpoint.outstanding)
+
+    @property
+    def version(self) -> str:
+        """Worker build(s) behind this pool, as last reported by /health"""
+        versions = sorted({endpoint.version for endpoint in self.endpoints if endpoint.version})
+        return ",".join(versions) or UNKNOWN_VERSION
+
+    @asynccontextmanager
+    async def lease(self, endpoint: WorkerEndpoint):
+        """Count a request against the endpoint for as long as it is in flight"""
+        endpoint.outstanding += 1
+        try:
+            yield endpoint
+        finally:
+            endpoint.outstanding -= 1
+
+    async def probe(self, client: httpx.AsyncClient):
+        async def probe_one(endpoint: WorkerEndpoint):
+            try:
+                response = await client.get(f"{endpoint.url}/health", timeout=HEALTH_TIMEOUT_SECONDS)
+                endpoint.healthy = response.status_code == 200
+                if endpoint.healthy:
+                    endpoint.version = response.json().get("version")
+            except (httpx.HTTPError, ValueError):
+                endpoint.healthy = False
+
+        await asyncio.gather(*(probe_one(endpoint) for endpoint in self.endpoints))
+
+
+WORKER_POOLS = {
+    language: WorkerPool(language, parse_worker_urls(urls))
+    for language, urls in {
+        "python": settings.python_worker_url,
+        "javascript": settings.javascript_worker_url,
+        "cpp": settings.cpp_worker_url,
+        "react": settings.react_worker_url,
+    }.items()
+}
+
+_health_task: asyncio.Task | None = None
+
+
+async def probe_workers_forever():
+    async with httpx.AsyncClient() as client:
+        while True:
+            await asyncio.gather(*(pool.probe(client) for pool in WORKER_POOLS.values()))
+            await asyncio.sleep(settings.worker_health_interval_seconds)
+
+
+def start_health_checks():
+    global _health_task
+    if _health_task is None and settings.worker_health_interval_seconds > 0:
+        _health_task = asyncio.create_task(probe_workers_forever())
+
+
+async def stop_health_checks():
+    global _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        try:
+            await _health_task
+        except asyncio.CancelledError:
+            pass
+        _health_task = None
+
+
+def pool_status() -> dict:
+    return {
+        language: [endpoint.snapshot() for endpoint in pool.endpoints]
+        for language, pool in WORKER_POOLS.items()
+    }
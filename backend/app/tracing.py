@@ -0,0 +1,310 @@
+"""Distributed tracing with W3C trace context.
+
+With tracing_enabled, TracingMiddleware opens a span for each HTTP request,
+continuing the trace of an incoming traceparent header or starting one for
+trace_sample_rate of requests. Inside it, spans cover DB queries, worker
+calls and LLM calls, and the worker calls carry traceparent on to the
+workers, which add compile and per-test spans to the same trace.
+
+Finished spans are exported in the background: appended to trace_file as
+JSON lines and/or posted in OTLP/HTTP JSON to trace_collector_url.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import get_settings
+from app.metrics import route_template, statement_type, summarize_statement
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "backend"
+TRACEPARENT_HEADER = b"traceparent"
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 1.0
+
+
+class Span:
+    """One timed operation in a trace; recorded and exported only when the trace is sampled"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, sampled: bool, kind: int = INTERNAL,
+                 attributes: dict[str, Any] | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start_ns = time.time_ns()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self, error: str | None = None):
+        if error:
+            self.error = error
+        if self.sampled:
+            EXPORTER.export(self.record(time.time_ns()))
+
+    def record(self, end_ns: int) -> dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": SERVICE_NAME,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class NonRecordingSpan:
+    """Stands in for a span when there is no sampled trace, so callers never check for one"""
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error: str | None = None):
+        pass
+
+
+NON_RECORDING = NonRecordingSpan()
+
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def parse_traceparent(value: str) -> tuple[str, str, bool] | None:
+    """(trace_id, parent span_id, sampled) from a traceparent header, or None if it is invalid"""
+    match = TRACEPARENT_PATTERN.match(value.strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+def trace_headers(span: Span | NonRecordingSpan | None = None) -> dict[str, str]:
+    """traceparent for an outgoing request made under span, or else the current span"""
+    if not isinstance(span, Span):
+        span = current_span()
+    return {"traceparent": span.traceparent()} if span else {}
+
+
+def open_span(name: str, kind: int = INTERNAL, **attributes) -> Span | NonRecordingSpan:
+    """A child of the current span that the caller ends; it does not become the current span.
+
+    For async generators, which must not leave a context variable set across a yield.
+    """
+    parent = current_span()
+    if parent is None or not parent.sampled:
+        return NON_RECORDING
+    return Span(name, parent.trace_id, parent.span_id, True, kind, attributes)
+
+
+@contextmanager
+def start_span(name: str, kind: int = INTERNAL, **attributes) -> Iterator[Span | NonRecordingSpan]:
+    """Time the block as a child of the current span, if the current trace is sampled"""
+    span = open_span(name, kind, **attributes)
+    if span is NON_RECORDING:
+        yield span
+        return
+
+    token = _current_span.set(span)
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end(error)
+
+
+class TracingMiddleware:
+    """Open a server span per HTTP request; installed only when tracing is enabled.
+
+    An incoming traceparent decides sampling, so a trace started upstream is
+    either recorded end to end or not at all.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for name, value in scope["headers"]:
+            if name == TRACEPARENT_HEADER:
+                incoming = parse_traceparent(value.decode("latin-1"))
+                break
+        if incoming:
+            trace_id, parent_id, sampled = incoming
+        else:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = settings.trace_sample_rate > 0 and random.random() < settings.trace_sample_rate
+
+        span = Span(f"{scope['method']} {scope['path']}", trace_id, parent_id, sampled, SERVER, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        token = _current_span.set(span)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_status)
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            route = route_template(scope)
+            span.name = f"{scope['method']} {route}"
+            span.set(**{"http.route": route, "http.status_code": status})
+            span.end(error or (f"HTTP {status}" if status >= 500 else None))
+
+
+def trace_engine(engine: Engine):
+    """Record a span for every query the engine runs inside a sampled trace"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        parent = current_span()
+        span = NON_RECORDING
+        # Checked first so unsampled requests skip summarizing the statement
+        if parent is not None and parent.sampled:
+            span = open_span(f"db {statement_type(statement)}", CLIENT, **{
+                "db.system": engine.dialect.name,
+                "db.statement": summarize_statement(statement),
+            })
+        conn.info.setdefault("query_spans", []).append(span)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_spans"].pop().end()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        spans = context.connection.info.get("query_spans") if context.connection is not None else None
+        if spans:
+            error = context.original_exception
+            spans.pop().end(f"{type(error).__name__}: {error}")
+
+
+def otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(records: list[dict[str, Any]]) -> dict[str, Any]:
+    """Spans in the OTLP/HTTP JSON encoding a collector accepts at /v1/traces"""
+    spans = []
+    for record in records:
+        span = {
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "name": record["name"],
+            "kind": record["kind"],
+            "startTimeUnixNano": str(record["start_time_unix_nano"]),
+            "endTimeUnixNano": str(record["end_time_unix_nano"]),
+            "attributes": [{"key": k, "value": otlp_value(v)} for k, v in record["attributes"].items()],
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+        }
+        if record["parent_span_id"]:
+            span["parentSpanId"] = record["parent_span_id"]
+        spans.append(span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+    }]}
+
+
+class SpanExporter:
+    """Ships finished spans from a background thread so requests never wait on the file or collector"""
+
+    def __init__(self, trace_file: str, collector_url: str):
+        self.trace_file = trace_file
+        self.collector_url = collector_url
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def export(self, record: dict[str, Any]):
+        if not self.trace_file and not self.collector_url:
+            return
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="span-exporter", daemon=True)
+                    self.thread.start()
+        self.queue.put(record)
+
+    def run(self):
+        client = httpx.Client(timeout=5.0) if self.collector_url else None
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE and (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.flush(batch, client)
+
+    def flush(self, batch: list[dict[str, Any]], client: httpx.Client | None):
+        if self.trace_file:
+            try:
+                with open(self.trace_file, "a") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in batch)
+            except OSError as e:
+                logger.warning("Could not write %d spans to %s: %s", len(batch), self.trace_file, e)
+        if client is not None:
+            try:
+                client.post(self.collector_url, json=to_otlp(batch)).raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning("Could not export %d spans to %s: %s", len(batch), self.collector_url, e)
+
+
+EXPORTER = SpanExporter(settings.trace_file, settings.trace_collector_url)
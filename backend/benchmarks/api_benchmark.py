@@ -0,0 +1,522 @@
+"""End-to-end benchmark of the API.
+
+Runs the real FastAPI app under uvicorn on a freshly seeded database, with
+the code execution workers and the OpenAI API replaced by a local fake
+server, and drives a weighted mix of realistic requests at it: roadmap
+loads, module completion, node and problem views, submits and problem
+generation. Writes a JSON report with throughput, latency percentiles and
+DB queries per request for each scenario, so runs on different commits
+can be compared with --baseline.
+
+The backend, the fakes and the load driver run as separate processes. The
+database defaults to a throwaway SQLite file; --database-url points it at
+a scratch Postgres database instead, whose tables are dropped and
+recreated.
+
+Usage (from backend/):
+    python benchmarks/api_benchmark.py --requests 2000 --concurrency 32 --output report.json
+    python benchmarks/api_benchmark.py --baseline report.json --output report-new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scenario -> (weight in the default mix, route template its queries are reported under)
+SCENARIOS = {
+    "roadmap": (0.30, "/api/roadmap/languages/{language_id}/roadmap"),
+    "module_completion": (0.10, "/api/roadmap/languages/{language_id}/modules/completion"),
+    "node_problems": (0.20, "/api/roadmap/nodes/{node_id}/problems"),
+    "problem": (0.15, "/api/roadmap/problems/{problem_id}"),
+    "submit": (0.20, "/api/roadmap/problems/{problem_id}/submit"),
+    "generate": (0.05, "/api/roadmap/nodes/{node_id}/generate"),
+}
+
+JOB_POLL_INTERVAL_SECONDS = 0.05
+
+SOLUTION_CODE = "def solve(values):\n    return sorted(values)\n"
+TEST_CASES = {
+    "test_cases": [
+        {"name": f"case_{i}", "input": json.dumps([list(range(i, 0, -1))]),
+         "expected_output": str(list(range(1, i + 1))), "hidden": i >= 4}
+        for i in range(1, 7)
+    ],
+    "entry_point": "solve",
+    "timeout_ms": 5000,
+}
+DESCRIPTION = (
+    "Write a function `solve(values)` that returns the values in ascending order.\n\n"
+    + "Explain your approach and consider the edge cases carefully. " * 20
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# --- Fake workers and LLM ----------------------------------------------------
+
+def fake_problem(counter: int) -> dict:
+    return {
+        "title": f"Generated problem {counter}",
+        "description": DESCRIPTION,
+        "template_code": "def solve(values):\n    pass\n",
+        "solution_code": SOLUTION_CODE,
+        "test_cases": TEST_CASES,
+        "hints": ["Think about sorting", "Consider empty input", "Consider duplicates"],
+        "condensed_description": f"Sort a list of values ({counter}-{random.random()})",
+    }
+
+
+def serve_fakes(port: int, worker_latency_ms: float, llm_latency_ms: float):
+    """One server standing in for every worker (/execute, /execute/stream) and the OpenAI API"""
+    import uvicorn
+    from fastapi import FastAPI, Request
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI()
+    generated = 0
+
+    def results(payload: dict) -> list:
+        return [
+            {
+                "name": test.get("name", "test"),
+                "passed": True,
+                "expected": test.get("expected_output", ""),
+                "actual": test.get("expected_output", ""),
+                "error": None,
+                "resources": {
+                    "wall_time_ms": 20.0, "cpu_time_ms": 15.0, "max_rss_kb": 9000,
+                    "termination": "ok", "signal": None,
+                },
+            }
+            for test in payload.get("test_cases", [])
+        ]
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy", "version": "fake"}
+
+    @app.post("/execute")
+    async def execute(request: Request):
+        payload = await request.json()
+        await asyncio.sleep(worker_latency_ms / 1000)
+        return {"results": results(payload)}
+
+    @app.post("/execute/stream")
+    async def execute_stream(request: Request):
+        payload = await request.json()
+
+        async def events():
+            for result in results(payload):
+                await asyncio.sleep(worker_latency_ms / 1000 / max(1, len(payload.get("test_cases", []))))
+                yield json.dumps({"event": "result", "result": result}) + "\n"
+            yield json.dumps({"event": "done"}) + "\n"
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        nonlocal generated
+        body = await request.json()
+        await asyncio.sleep(llm_latency_ms / 1000)
+        generated += 1
+        return {
+            "id": f"chatcmpl-fake-{generated}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(fake_problem(generated))},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 800, "completion_tokens": 900, "total_tokens": 1700},
+        }
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# --- Backend on a seeded database --------------------------------------------
+
+def use_sqlite_types():
+    """Let the Postgres-only column types create on SQLite"""
+    from sqlalchemy.dialects.postgresql import JSONB, UUID
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(UUID, "sqlite")
+    def compile_uuid(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    @compiles(JSONB, "sqlite")
+    def compile_jsonb(type_, compiler, **kw):
+        return "JSON"
+
+
+def seed(modules: int, concepts_per_module: int, problems_per_node: int):
+    from app.database import SessionLocal, engine
+    from app.models import Base, Language, RoadmapNode, RoadmapProblem
+    from app.models.roadmap_problem import DifficultyEnum, LevelEnum, StatusEnum
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    rng = random.Random(0)
+    difficulties = list(DifficultyEnum)
+
+    db = SessionLocal()
+    language = Language(name="Python", slug="python")
+    db.add(language)
+    db.flush()
+    for module in range(modules):
+        nodes = [
+            RoadmapNode(
+                language_id=language.id, name=f"Concept {module}.{i}", slug=f"concept-{module}-{i}",
+                topic=f"module-{module}", node_type="concept", module_order=module, order_index=i,
+                concept_keywords=["lists", "sorting", "iteration"],
+            )
+            for i in range(concepts_per_module)
+        ]
+        nodes.append(RoadmapNode(
+            language_id=language.id, name=f"Module {module} test", slug=f"module-{module}-test",
+            topic=f"module-{module}", node_type="module_test", module_order=module,
+            order_index=concepts_per_module, concept_keywords=["lists", "sorting"],
+        ))
+        db.add_all(nodes)
+        db.flush()
+        for node in nodes:
+            for i in range(problems_per_node):
+                db.add(RoadmapProblem(
+                    node_id=node.id,
+                    difficulty=difficulties[i % len(difficulties)],
+                    level=LevelEnum.beginner,
+                    status=StatusEnum.solved if rng.random() < 0.3 else StatusEnum.unsolved,
+                    title=f"{node.name} problem {i}",
+                    description=DESCRIPTION,
+                    template_code="def solve(values):\n    pass\n",
+                    solution_code=SOLUTION_CODE,
+                    test_cases=TEST_CASES,
+                    hints=["Think about sorting", "Consider empty input"],
+                    description_hash=f"{node.slug}-{i}",
+                    condensed_description=f"Sort values ({node.slug} {i})",
+                ))
+    db.commit()
+    db.close()
+
+
+def serve_backend(port: int, args):
+    sys.path.insert(0, BACKEND_DIR)
+    if os.environ["DATABASE_URL"].startswith("sqlite"):
+        use_sqlite_types()
+    seed(args.modules, args.concepts_per_module, args.problems_per_node)
+
+    import uvicorn
+    from app.main import app
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# --- Load driver --------------------------------------------------------------
+
+def spawn(command: str, port: int, args, env: dict, log_path: str) -> subprocess.Popen:
+    # Server logs go to a file so query budget warnings do not drown the report
+    with open(log_path, "ab") as log:
+        return subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), command, "--port", str(port),
+             "--worker-latency-ms", str(args.worker_latency_ms), "--llm-latency-ms", str(args.llm_latency_ms),
+             "--modules", str(args.modules), "--concepts-per-module", str(args.concepts_per_module),
+             "--problems-per-node", str(args.problems_per_node)],
+            cwd=BACKEND_DIR,
+            env={**os.environ, **env},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server for {url} exited with status {process.returncode}, see its log")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+async def db_queries_per_route(client: httpx.AsyncClient, base_url: str) -> dict:
+    """Sum and count of the http_request_db_queries histogram per route, from /metrics"""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    text = (await client.get(f"{base_url}/metrics")).text
+    totals: dict[str, list[float]] = {}
+    for family in text_string_to_metric_families(text):
+        if family.name != "http_request_db_queries":
+            continue
+        for sample in family.samples:
+            if sample.name.endswith("_sum") or sample.name.endswith("_count"):
+                entry = totals.setdefault(sample.labels["route"], [0.0, 0.0])
+                entry[0 if sample.name.endswith("_sum") else 1] += sample.value
+    return totals
+
+
+class Targets:
+    """IDs discovered through the API, as a client would find them"""
+
+    def __init__(self, language_id: str, node_ids: list, problem_ids: list):
+        self.language_id = language_id
+        self.node_ids = node_ids
+        self.problem_ids = problem_ids
+
+    @classmethod
+    async def discover(cls, client: httpx.AsyncClient, base_url: str) -> "Targets":
+        language_id = (await client.get(f"{base_url}/api/languages")).json()[0]["id"]
+        nodes = (await client.get(f"{base_url}/api/roadmap/languages/{language_id}/roadmap")).json()
+        node_ids = [node["id"] for node in nodes if node.get("node_type", "concept") == "concept"]
+        problem_ids = []
+        for node_id in node_ids:
+            problems = (await client.get(f"{base_url}/api/roadmap/nodes/{node_id}/problems")).json()
+            problem_ids.extend(problem["id"] for problem in problems)
+        return cls(language_id, node_ids, problem_ids)
+
+
+def build_request(scenario: str, targets: Targets, rng: random.Random, repeat_code_ratio: float) -> tuple:
+    if scenario == "roadmap":
+        return "GET", f"/api/roadmap/languages/{targets.language_id}/roadmap", None
+    if scenario == "module_completion":
+        return "GET", f"/api/roadmap/languages/{targets.language_id}/modules/completion", None
+    if scenario == "node_problems":
+        return "GET", f"/api/roadmap/nodes/{rng.choice(targets.node_ids)}/problems", None
+    if scenario == "problem":
+        return "GET", f"/api/roadmap/problems/{rng.choice(targets.problem_ids)}", None
+    if scenario == "submit":
+        # Unique code misses the result cache; the rest repeat a submission it has seen
+        code = SOLUTION_CODE if rng.random() < repeat_code_ratio else f"{SOLUTION_CODE}# {rng.random()}\n"
+        return "POST", f"/api/roadmap/problems/{rng.choice(targets.problem_ids)}/submit", {"code": code}
+    if scenario == "generate":
+        return "POST", f"/api/roadmap/nodes/{rng.choice(targets.node_ids)}/generate", {"difficulty": "easy"}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def drive(base_url: str, targets: Targets, args, total: int, record: bool) -> tuple[dict, float]:
+    rng = random.Random(args.seed if record else args.seed + 1)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+    samples = {name: {"latencies": [], "errors": 0} for name in names}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0) as client:
+        async def one_request(scenario: str):
+            method, path, body = build_request(scenario, targets, rng, args.repeat_code_ratio)
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code == 200
+                    if response.status_code == 202:
+                        # Generation runs as a background job; time it until the job finishes
+                        ok = await wait_for_job(client, response.json())
+                except httpx.HTTPError:
+                    ok = False
+                samples[scenario]["latencies"].append(time.perf_counter() - started)
+                if not ok:
+                    samples[scenario]["errors"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(name) for name in rng.choices(names, weights, k=total)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+async def wait_for_job(client, job: dict) -> bool:
+    while job["status"] in ("queued", "running"):
+        await asyncio.sleep(JOB_POLL_INTERVAL_SECONDS)
+        response = await client.get(f"/api/jobs/{job['id']}")
+        if response.status_code != 200:
+            return False
+        job = response.json()
+    return job["status"] == "succeeded"
+
+
+def latency_summary(latencies: list) -> dict:
+    if not latencies:
+        return {}
+    return {
+        "mean": round(statistics.mean(latencies) * 1000, 2),
+        "p50": round(percentile(latencies, 50) * 1000, 2),
+        "p95": round(percentile(latencies, 95) * 1000, 2),
+        "p99": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def git_revision() -> dict:
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "."))}
+
+
+async def run_benchmark(args) -> dict:
+    fakes_port, backend_port = free_port(), free_port()
+    fakes_url = f"http://127.0.0.1:{fakes_port}"
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    work_dir = tempfile.mkdtemp(prefix="api-benchmark-")
+    database_url = args.database_url or f"sqlite:///{work_dir}/benchmark.db"
+    log_path = os.path.join(work_dir, "servers.log")
+    print(f"Server logs: {log_path}")
+
+    processes = [spawn("serve-fakes", fakes_port, args, {}, log_path)]
+    try:
+        await wait_until_up(f"{fakes_url}/health", processes[0])
+        processes.append(spawn("serve-backend", backend_port, args, {
+            "DATABASE_URL": database_url,
+            "PYTHON_WORKER_URL": fakes_url,
+            "JAVASCRIPT_WORKER_URL": fakes_url,
+            "CPP_WORKER_URL": fakes_url,
+            "REACT_WORKER_URL": fakes_url,
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": f"{fakes_url}/v1",
+        }, log_path))
+        await wait_until_up(f"{backend_url}/api/health", processes[1])
+
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            targets = await Targets.discover(client, backend_url)
+            await drive(backend_url, targets, args, args.warmup, record=False)
+            queries_before = await db_queries_per_route(client, backend_url)
+            samples, elapsed = await drive(backend_url, targets, args, args.requests, record=True)
+            queries_after = await db_queries_per_route(client, backend_url)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    scenarios = {}
+    for name, sample in samples.items():
+        route = SCENARIOS[name][1]
+        before = queries_before.get(route, [0.0, 0.0])
+        after = queries_after.get(route, [0.0, 0.0])
+        counted = after[1] - before[1]
+        scenarios[name] = {
+            "route": route,
+            "requests": len(sample["latencies"]),
+            "errors": sample["errors"],
+            "requests_per_s": round(len(sample["latencies"]) / elapsed, 2),
+            "latency_ms": latency_summary(sample["latencies"]),
+            "db_queries_per_request": round((after[0] - before[0]) / counted, 2) if counted else None,
+        }
+
+    all_latencies = [latency for sample in samples.values() for latency in sample["latencies"]]
+    return {
+        "meta": {
+            **git_revision(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": database_url.split(":", 1)[0],
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "worker_latency_ms": args.worker_latency_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+            "repeat_code_ratio": args.repeat_code_ratio,
+            "seed": args.seed,
+            "roadmap": {
+                "modules": args.modules,
+                "concepts_per_module": args.concepts_per_module,
+                "problems_per_node": args.problems_per_node,
+            },
+        },
+        "total": {
+            "requests": len(all_latencies),
+            "errors": sum(sample["errors"] for sample in samples.values()),
+            "elapsed_s": round(elapsed, 3),
+            "requests_per_s": round(len(all_latencies) / elapsed, 2),
+            "latency_ms": latency_summary(all_latencies),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def compare(report: dict, baseline: dict) -> str:
+    """Table of p50/p95 latency and queries per request against a baseline report"""
+    def change(new, old):
+        if new is None or old in (None, 0):
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    lines = [f"{'scenario':<18} {'p50 ms':>10} {'Δ':>8} {'p95 ms':>10} {'Δ':>8} {'queries':>8} {'Δ':>8}"]
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name, {})
+        p50, p95 = current["latency_ms"].get("p50"), current["latency_ms"].get("p95")
+        queries = current["db_queries_per_request"]
+        lines.append(
+            f"{name:<18} {p50 or 0:>10.2f} {change(p50, previous.get('latency_ms', {}).get('p50')):>8} "
+            f"{p95 or 0:>10.2f} {change(p95, previous.get('latency_ms', {}).get('p95')):>8} "
+            f"{queries if queries is not None else 0:>8.1f} {change(queries, previous.get('db_queries_per_request')):>8}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", default="run", choices=["run", "serve-fakes", "serve-backend"],
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--database-url", help="scratch database to use instead of a temporary SQLite file")
+    parser.add_argument("--worker-latency-ms", type=float, default=50.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=500.0)
+    parser.add_argument("--repeat-code-ratio", type=float, default=0.2,
+                        help="fraction of submits that resend code the result cache has seen")
+    parser.add_argument("--modules", type=int, default=6)
+    parser.add_argument("--concepts-per-module", type=int, default=5)
+    parser.add_argument("--problems-per-node", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="api-benchmark.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    if args.command == "serve-fakes":
+        serve_fakes(args.port, args.worker_latency_ms, args.llm_latency_ms)
+        return
+    if args.command == "serve-backend":
+        serve_backend(args.port, args)
+        return
+
+    report = asyncio.run(run_benchmark(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["total"], indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            print(compare(report, json.load(f)))
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import tempfile
+
+# Read once, when app.config is first imported: a throwaway SQLite database and
+# workers that refuse connections at once, so no test reaches a real service
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+for language in ("PYTHON", "JAVASCRIPT", "CPP", "REACT"):
+    os.environ[f"{language}_WORKER_URL"] = "http://127.0.0.1:9"
+
+import pytest
+
+SOLUTION_CODE = "def solve(values):\n    return sorted(values)\n"
+TEST_CASES = {
+    "test_cases": [
+        {"name": f"case_{i}", "input": f"[{list(range(i, 0, -1))}]",
+         "expected_output": str(list(range(1, i + 1))), "hidden": i >= 4}
+        for i in range(1, 7)
+    ],
+    "entry_point": "solve",
+    "timeout_ms": 5000,
+}
+
+
+def use_sqlite_types():
+    """Let the Postgres-only column types create on SQLite"""
+    from sqlalchemy.dialects.postgresql import JSONB, UUID
+    from sqlalchemy.ext.compiler import compiles
+
+    @compiles(UUID, "sqlite")
+    def compile_uuid(type_, compiler, **kw):
+        return "CHAR(32)"
+
+    @compiles(JSONB, "sqlite")
+    def compile_jsonb(type_, compiler, **kw):
+        return "JSON"
+
+
+def seed_roadmap(db, slug: str, modules: int, concepts_per_module: int, problems_per_node: int):
+    """Add a language whose roadmap has modules of concept nodes and a module test, with problems on every node"""
+    from app.models import Language, RoadmapNode, RoadmapProblem
+    from app.models.roadmap_problem import DifficultyEnum, LevelEnum, StatusEnum
+
+    difficulties = list(DifficultyEnum)
+    language = Language(name=slug.title(), slug=slug)
+    db.add(language)
+    db.flush()
+    for module in range(modules):
+        nodes = [
+            RoadmapNode(
+                language_id=language.id, name=f"Concept {module}.{i}", slug=f"{slug}-concept-{module}-{i}",
+                topic=f"module-{module}", node_type="concept", module_order=module, order_index=i,
+                concept_keywords=["lists", "sorting"],
+            )
+            for i in range(concepts_per_module)
+        ]
+        nodes.append(RoadmapNode(
+            language_id=language.id, name=f"Module {module} test", slug=f"{slug}-module-{module}-test",
+            topic=f"module-{module}", node_type="module_test", module_order=module,
+            order_index=concepts_per_module, concept_keywords=["lists", "sorting"],
+        ))
+        db.add_all(nodes)
+        db.flush()
+        for n, node in enumerate(nodes):
+            for i in range(problems_per_node):
+                db.add(RoadmapProblem(
+                    node_id=node.id,
+                    difficulty=difficulties[i % len(difficulties)],
+                    level=LevelEnum.beginner,
+                    status=StatusEnum.solved if (n + i) % 3 == 0 else StatusEnum.unsolved,
+                    title=f"{node.name} problem {i}",
+                    description="Write a function `solve(values)` that returns the values in ascending order.",
+                    template_code="def solve(values):\n    pass\n",
+                    solution_code=SOLUTION_CODE,
+                    test_cases=TEST_CASES,
+                    hints=["Think about sorting"],
+                    description_hash=f"{node.slug}-{i}",
+                    condensed_description=f"Sort values ({node.slug} {i})",
+                ))
+    db.flush()
+    return language
+
+
+class Seeded:
+    """IDs of the seeded rows the tests request"""
+
+    def __init__(self, language_id, large_language_id, node_id, module_test_id, problem_id, topic_id, exercise_id,
+                 job_id):
+        self.language_id = language_id
+        self.large_language_id = large_language_id
+        self.node_id = node_id
+        self.module_test_id = module_test_id
+        self.problem_id = problem_id
+        self.topic_id = topic_id
+        self.exercise_id = exercise_id
+        self.job_id = job_id
+
+
+@pytest.fixture(scope="session")
+def seeded() -> Seeded:
+    """A roadmap of 3 modules of 4 concepts with 3 problems a node, plus an exercise and a job.
+
+    A second language has a roadmap twice that size, so tests can check that
+    a query count does not grow with the number of nodes.
+    """
+    use_sqlite_types()
+
+    from app.database import SessionLocal, engine
+    from app.models import Base, Exercise, GenerationJob, RoadmapNode, RoadmapProblem, Topic
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        language = seed_roadmap(db, "python", modules=3, concepts_per_module=4, problems_per_node=3)
+        large_language = seed_roadmap(db, "cpp", modules=6, concepts_per_module=4, problems_per_node=3)
+        node = db.query(RoadmapNode).filter(
+            RoadmapNode.language_id == language.id, RoadmapNode.node_type == "concept"
+        ).order_by(RoadmapNode.slug).first()
+        module_test = db.query(RoadmapNode).filter(
+            RoadmapNode.language_id == language.id,
+            RoadmapNode.node_type == "module_test",
+            RoadmapNode.topic == node.topic,
+        ).one()
+        problem = db.query(RoadmapProblem).filter(RoadmapProblem.node_id == node.id).first()
+        topic = Topic(language_id=language.id, name="Basics", slug="basics", difficulty="easy")
+        db.add(topic)
+        db.flush()
+        exercise = Exercise(
+            topic_id=topic.id, title="Sort", description=problem.description,
+            template_code=problem.template_code, solution_code=problem.solution_code,
+            test_cases=problem.test_cases, hints=problem.hints,
+        )
+        job = GenerationJob(kind="roadmap_problem", node_id=node.id, params={"difficulty": "easy", "level": "beginner"})
+        db.add_all([exercise, job])
+        db.commit()
+        return Seeded(
+            language.id, large_language.id, node.id, module_test.id, problem.id, topic.id, exercise.id, job.id
+        )
+
+
+@pytest.fixture(scope="session")
+def client(seeded):
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    # Not entered as a context manager, so the lifespan (health checks, job runner) does not start
+    return TestClient(app)
+
+
+@pytest.fixture
+def query_count(client):
+    """Send a request and return the QueryLog of the DB queries it ran"""
+    from app.database import engine
+    from app.metrics import count_queries
+
+    def send(method: str, url: str, **kwargs):
+        with count_queries(engine) as queries:
+            response = client.request(method, url, **kwargs)
+        assert response.status_code < 400, response.text
+        return queries
+
+    return send
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from app.schemas.exercise import ExerciseSubmitResponse, TestCaseResult, TestResources
+from app.services import benchmarks
+from app.services.benchmarks import ensure_calibrated
+
+BENCHMARK_TESTS = {
+    "test_cases": [{"name": "big", "input": "[[3, 2, 1]]", "expected_output": "[1, 2, 3]", "kind": "benchmark"}],
+    "entry_point": "solve",
+}
+
+
+def resources(cpu_time_ms: float) -> TestResources:
+    return TestResources(wall_time_ms=cpu_time_ms, cpu_time_ms=cpu_time_ms, max_rss_kb=1, termination="ok")
+
+
+@pytest.fixture
+def problem(seeded):
+    """A fresh problem with an uncalibrated benchmark test, in its own session"""
+    from app.database import SessionLocal
+    from app.models import RoadmapProblem
+
+    with SessionLocal() as db:
+        template = db.get(RoadmapProblem, seeded.problem_id)
+        record = RoadmapProblem(
+            node_id=template.node_id, difficulty=template.difficulty, level=template.level,
+            status=template.status, title="Benchmark", description=template.description,
+            template_code=template.template_code, solution_code=template.solution_code,
+            test_cases=BENCHMARK_TESTS, description_hash=f"benchmark-{id(db)}", condensed_description="b",
+        )
+        db.add(record)
+        db.commit()
+        problem_id = record.id
+    yield problem_id
+    with SessionLocal() as db:
+        db.delete(db.get(RoadmapProblem, problem_id))
+        db.commit()
+
+
+def calibrate_concurrently(problem_id, sessions: int) -> list[dict]:
+    """ensure_calibrated from several sessions at once; returns each record's test_cases afterwards"""
+    from app.database import SessionLocal
+    from app.models import RoadmapProblem
+
+    async def one():
+        with SessionLocal() as db:
+            record = db.get(RoadmapProblem, problem_id)
+            await ensure_calibrated(db, record, "python")
+            return record.test_cases
+
+    async def run():
+        return await asyncio.gather(*(one() for _ in range(sessions)))
+
+    return asyncio.run(run())
+
+
+def test_infrastructure_failure_is_not_saved(problem, monkeypatch):
+    async def unavailable(pool, payload):
+        return ExerciseSubmitResponse(passed=False, results=[], runtime_error="Code execution timed out")
+
+    monkeypatch.setattr(benchmarks, "execute_on_worker", unavailable)
+    [test_cases] = calibrate_concurrently(problem, 1)
+    assert "calibrated_version" not in test_cases
+    assert "calibration_error" not in test_cases
+
+
+def test_reference_timeout_is_not_saved(problem, monkeypatch):
+    async def timing_out(pool, payload):
+        return ExerciseSubmitResponse(
+            passed=False,
+            results=[TestCaseResult(name="big", passed=False, error="Execution timed out", resources=resources(5000.0))],
+        )
+
+    monkeypatch.setattr(benchmarks, "execute_on_worker", timing_out)
+    [test_cases] = calibrate_concurrently(problem, 1)
+    assert "calibrated_version" not in test_cases
+    assert "calibration_error" not in test_cases
+
+
+def test_reference_failure_is_saved(problem, monkeypatch):
+    async def failing(pool, payload):
+        return ExerciseSubmitResponse(
+            passed=False,
+            results=[TestCaseResult(name="big", passed=False, actual="[3, 2, 1]", resources=resources(1.0))],
+        )
+
+    monkeypatch.setattr(benchmarks, "execute_on_worker", failing)
+    [test_cases] = calibrate_concurrently(problem, 1)
+    assert test_cases["calibration_error"] == "Reference solution failed big: [3, 2, 1]"
+    assert "calibrated_version" in test_cases
+
+
+def test_concurrent_requests_share_one_calibration(problem, monkeypatch):
+    monkeypatch.setattr(benchmarks.settings, "benchmark_calibration_runs", 1)
+    calls = []
+
+    async def slow(pool, payload):
+        calls.append(payload)
+        await asyncio.sleep(0.05)
+        return ExerciseSubmitResponse(
+            passed=True, results=[TestCaseResult(name="big", passed=True, resources=resources(12.0))]
+        )
+
+    monkeypatch.setattr(benchmarks, "execute_on_worker", slow)
+    results = calibrate_concurrently(problem, 4)
+    assert len(calls) == 1
+    for test_cases in results:
+        assert test_cases["calibration_error"] is None
+        assert test_cases["test_cases"][0]["reference_ms"] == 12.0
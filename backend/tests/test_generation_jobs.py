@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import GenerationJob, JobStatusEnum, RoadmapNode, RoadmapProblem
+from app.services.generation_jobs import GenerationJobRunner, save_generated_problem
+
+PARAMS = {"difficulty": "easy", "level": "beginner"}
+
+
+def runner() -> tuple[GenerationJobRunner, list]:
+    """A runner that records the jobs it would run instead of calling the model"""
+    job_runner = GenerationJobRunner(max_concurrency=1, max_pending=10, heartbeat_seconds=15, stale_seconds=60)
+    submitted = []
+    job_runner.submit = submitted.append
+    return job_runner, submitted
+
+
+@pytest.fixture
+def jobs(seeded):
+    """A job another live process is running and one whose process stopped heartbeating ten minutes ago"""
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        live = GenerationJob(kind="roadmap_problem", node_id=seeded.node_id, params=PARAMS,
+                             status=JobStatusEnum.running, owner="live", heartbeat_at=now)
+        stale = GenerationJob(kind="roadmap_problem", node_id=seeded.node_id, params=PARAMS,
+                              status=JobStatusEnum.running, owner="gone", heartbeat_at=now - timedelta(minutes=10))
+        db.add_all([live, stale])
+        db.commit()
+        ids = live.id, stale.id
+    yield ids
+    with SessionLocal() as db:
+        db.query(GenerationJob).filter(GenerationJob.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+
+
+def test_resume_takes_over_only_stale_jobs(jobs):
+    live_id, stale_id = jobs
+    first, first_submitted = runner()
+    second, second_submitted = runner()
+
+    first.resume()
+    second.resume()
+
+    assert stale_id in first_submitted and live_id not in first_submitted
+    # Claimed by the first runner, so the second one, looking right after, leaves it alone
+    assert stale_id not in second_submitted and live_id not in second_submitted
+    with SessionLocal() as db:
+        assert db.get(GenerationJob, stale_id).owner == first.owner
+        assert db.get(GenerationJob, live_id).owner == "live"
+
+
+def test_heartbeat_keeps_own_jobs_fresh(jobs):
+    _, stale_id = jobs
+    first, _ = runner()
+    first.resume()
+    with SessionLocal() as db:
+        db.get(GenerationJob, stale_id).heartbeat_at = datetime.now(timezone.utc) - timedelta(minutes=10)
+        db.commit()
+
+    first.heartbeat()
+    second, second_submitted = runner()
+    second.resume()
+
+    assert stale_id not in second_submitted
+
+
+def test_same_problem_is_deduplicated_only_within_a_node(seeded):
+    with SessionLocal() as db:
+        problem = db.get(RoadmapProblem, seeded.problem_id)
+        other_node = db.query(RoadmapNode).filter(RoadmapNode.id != problem.node_id).first()
+
+        def generated(node_id):
+            return RoadmapProblem(
+                node_id=node_id, difficulty=problem.difficulty, level=problem.level, title=problem.title,
+                description=problem.description, template_code=problem.template_code,
+                solution_code=problem.solution_code, test_cases=problem.test_cases,
+                description_hash=problem.description_hash, condensed_description=problem.condensed_description,
+            )
+
+        assert save_generated_problem(db, generated(problem.node_id)).id == problem.id
+        saved = save_generated_problem(db, generated(other_node.id))
+        assert saved.id != problem.id and saved.node_id == other_node.id
+        db.delete(saved)
+        db.commit()
@@ -0,0 +1,26 @@
+import pytest
+
+from app.database import SessionLocal
+from app.models import Exercise, RoadmapProblem
+from app.routers.exercises import PUBLIC_EXERCISE_COLUMNS
+from app.routers.roadmap import PUBLIC_PROBLEM_COLUMNS
+
+# (model, public columns, route, seeded id)
+VIEWS = [
+    (RoadmapProblem, PUBLIC_PROBLEM_COLUMNS, "/api/roadmap/problems/{}", "problem_id"),
+    (Exercise, PUBLIC_EXERCISE_COLUMNS, "/api/exercises/{}", "exercise_id"),
+]
+
+
+@pytest.mark.parametrize("model,columns,route,key", VIEWS, ids=["problem", "exercise"])
+def test_hidden_tests_are_not_loaded(client, seeded, model, columns, route, key):
+    with SessionLocal() as db:
+        stored = db.get(model, getattr(seeded, key)).test_cases
+        row = db.query(*columns).filter(model.id == getattr(seeded, key)).one()
+    visible = [t["name"] for t in stored["test_cases"] if not t.get("hidden")]
+    assert len(visible) < len(stored["test_cases"])
+    assert [t["name"] for t in row.test_cases["test_cases"]] == visible
+    assert {**row.test_cases, "test_cases": stored["test_cases"]} == stored
+
+    response = client.get(route.format(getattr(seeded, key)))
+    assert [t["name"] for t in response.json()["test_cases"]["test_cases"]] == visible
@@ -0,0 +1,51 @@
+"""DB queries per endpoint against the seeded roadmap, held to today's counts.
+
+A change that adds a query (or a query per row) to an endpoint fails here;
+lower a budget when an endpoint gets cheaper. Endpoints that list a whole
+roadmap are also run against one twice the size, and must not run more
+queries there.
+"""
+import pytest
+
+CODE = {"code": "def solve(values):\n    return sorted(values)\n"}
+
+# (method, route, request body, budget)
+ENDPOINTS = [
+    ("GET", "/api/languages", None, 1),
+    ("GET", "/api/languages/{language_id}", None, 1),
+    ("GET", "/api/languages/{language_id}/topics", None, 2),
+    ("GET", "/api/topics/{topic_id}", None, 2),
+    ("GET", "/api/exercises/{exercise_id}", None, 1),
+    ("GET", "/api/exercises/{exercise_id}/solution", None, 1),
+    ("POST", "/api/exercises/{exercise_id}/submit", CODE, 3),
+    ("POST", "/api/exercises/{exercise_id}/run", CODE, 3),
+    ("GET", "/api/roadmap/languages/{language_id}/roadmap", None, 3),
+    ("GET", "/api/roadmap/languages/{language_id}/modules/completion", None, 4),
+    ("GET", "/api/roadmap/nodes/{node_id}", None, 1),
+    ("GET", "/api/roadmap/nodes/{node_id}/problems", None, 2),
+    ("GET", "/api/roadmap/nodes/{node_id}/progress", None, 2),
+    ("GET", "/api/roadmap/problems/{problem_id}", None, 1),
+    ("GET", "/api/roadmap/problems/{problem_id}/solution", None, 1),
+    ("POST", "/api/roadmap/problems/{problem_id}/submit", CODE, 4),
+    ("POST", "/api/roadmap/problems/{problem_id}/run", CODE, 3),
+    ("GET", "/api/jobs/{job_id}", None, 1),
+]
+
+
+@pytest.mark.parametrize("method,route,body,budget", ENDPOINTS, ids=[f"{m} {r}" for m, r, _, _ in ENDPOINTS])
+def test_queries_within_budget(query_count, seeded, method, route, body, budget):
+    queries = query_count(method, route.format(**vars(seeded)), json=body)
+    assert queries.count <= budget, queries.statements.most_common()
+
+
+ROADMAP_ENDPOINTS = [
+    "/api/roadmap/languages/{language_id}/roadmap",
+    "/api/roadmap/languages/{language_id}/modules/completion",
+]
+
+
+@pytest.mark.parametrize("route", ROADMAP_ENDPOINTS)
+def test_queries_do_not_grow_with_roadmap_size(query_count, seeded, route):
+    small = query_count("GET", route.format(language_id=seeded.language_id))
+    large = query_count("GET", route.format(language_id=seeded.large_language_id))
+    assert large.count == small.count, large.statements.most_common()
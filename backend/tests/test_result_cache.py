@@ -0,0 +1,52 @@
+import asyncio
+
+from app.schemas.exercise import ExerciseSubmitResponse, TestCaseResult
+from app.services.result_cache import ResultCache, is_cacheable
+from app.services.worker_pool import UNKNOWN_VERSION
+
+PASSED = ExerciseSubmitResponse(passed=True, results=[TestCaseResult(name="t", passed=True)])
+
+
+def test_results_of_an_unknown_worker_build_are_not_cached():
+    assert is_cacheable(PASSED, "abc123")
+    assert not is_cacheable(PASSED, UNKNOWN_VERSION)
+
+    async def run_twice(version: str) -> int:
+        cache = ResultCache(max_entries=10, ttl_seconds=60)
+        calls = []
+
+        async def run():
+            calls.append(1)
+            return PASSED
+
+        for _ in range(2):
+            await cache.get_or_run("key", version, run)
+        return len(calls)
+
+    assert asyncio.run(run_twice("abc123")) == 1
+    assert asyncio.run(run_twice(UNKNOWN_VERSION)) == 2
+
+
+def test_identical_runs_in_flight_share_one_and_a_cancelled_one_is_taken_over():
+    async def scenario():
+        cache = ResultCache(max_entries=10, ttl_seconds=60)
+        calls = []
+
+        async def run():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return PASSED
+
+        first = asyncio.create_task(cache.get_or_run("key", UNKNOWN_VERSION, run))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_run("key", UNKNOWN_VERSION, run)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        first.cancel()
+        responses = await asyncio.gather(*waiters)
+        return len(calls), responses, cache.stats()
+
+    calls, responses, stats = asyncio.run(scenario())
+    # The first run was cancelled; one waiter ran it again and the other two shared that run
+    assert calls == 2
+    assert all(response is PASSED for response in responses)
+    assert stats["coalesced"] == 2
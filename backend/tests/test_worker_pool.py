@@ -0,0 +1,228 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services import code_runner, worker_pool
+from app.services.code_runner import (
+    EXTRA_RESULTS_ERROR, INCOMPLETE_STREAM_ERROR, WorkerUnavailable, hedged_post, stream_code, stream_from_worker,
+)
+from app.services.worker_pool import WorkerPool
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    """Worker settings as the tests expect them, whatever the environment says"""
+    settings = worker_pool.settings
+    monkeypatch.setattr(settings, "worker_failure_threshold", 3)
+    monkeypatch.setattr(settings, "worker_circuit_cooldown_seconds", 30.0)
+    monkeypatch.setattr(settings, "worker_hedge_delay_ms", 0)
+    monkeypatch.setattr(settings, "worker_hedge_budget_ratio", 0.05)
+    return settings
+
+
+def fake_workers(behaviour: dict):
+    """An httpx client whose replicas answer as behaviour[url] says: (delay seconds, status) or an exception"""
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        url = f"{request.url.scheme}://{request.url.host}"
+        calls.append(url)
+        outcome = behaviour[url]
+        if isinstance(outcome, Exception):
+            raise outcome
+        delay, status = outcome
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json={"replica": url})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+def post(pool: WorkerPool, behaviour: dict):
+    async def run():
+        client, calls = fake_workers(behaviour)
+        async with client:
+            response = await hedged_post(client, pool, {})
+        return response, calls
+
+    return asyncio.run(run())
+
+
+def test_pick_prefers_least_outstanding(settings):
+    pool = WorkerPool("python", URLS)
+    pool.endpoints[0].outstanding = 2
+    pool.endpoints[1].outstanding = 1
+    pool.endpoints[2].outstanding = 3
+    assert pool.pick().url == "http://b"
+    assert pool.pick(exclude={"http://b"}).url == "http://a"
+    assert pool.pick(exclude=set(URLS)) is None
+
+
+def test_pick_skips_unavailable_unless_nothing_else_is_left(settings):
+    pool = WorkerPool("python", URLS)
+    pool.endpoints[0].healthy = False
+    pool.endpoints[1].outstanding = 1
+    pool.endpoints[2].outstanding = 1
+    assert pool.pick().url == "http://b"
+
+    for endpoint in pool.endpoints:
+        endpoint.healthy = False
+    assert pool.pick().url == "http://a"
+
+
+def test_circuit_opens_after_threshold_and_half_opens_after_cooldown(settings, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(worker_pool.time, "monotonic", lambda: now[0])
+    endpoint = WorkerPool("python", URLS).endpoints[0]
+
+    endpoint.record_failure()
+    endpoint.record_failure()
+    assert endpoint.available
+    endpoint.record_failure()
+    assert endpoint.circuit_open and not endpoint.available
+
+    now[0] += 31
+    assert endpoint.available
+    # The trial request fails: the circuit reopens at once
+    endpoint.record_failure()
+    assert endpoint.circuit_open
+
+    now[0] += 31
+    endpoint.record_success()
+    assert endpoint.available and endpoint.consecutive_failures == 0
+
+
+def test_hedging_is_off_by_default(settings):
+    pool = WorkerPool("python", URLS[:2])
+    response, calls = post(pool, {"http://a": (0.2, 200), "http://b": (0, 200)})
+    assert response.json()["replica"] == "http://a"
+    assert calls == ["http://a"]
+
+
+def test_hedge_goes_to_second_replica_and_fastest_wins(settings):
+    settings.worker_hedge_delay_ms = 50
+    pool = WorkerPool("python", URLS[:2])
+    response, calls = post(pool, {"http://a": (1.0, 200), "http://b": (0, 200)})
+    assert response.json()["replica"] == "http://b"
+    assert calls == ["http://a", "http://b"]
+    assert pool.endpoints[0].outstanding == 0
+
+
+def test_hedge_is_skipped_when_budget_is_spent(settings):
+    settings.worker_hedge_delay_ms = 50
+    settings.worker_hedge_budget_ratio = 0.0
+    pool = WorkerPool("python", URLS[:2])
+    pool.hedge_tokens = 0.5
+    response, calls = post(pool, {"http://a": (0.2, 200), "http://b": (0, 200)})
+    assert response.json()["replica"] == "http://a"
+    assert calls == ["http://a"]
+
+
+def test_hedge_budget_refills_per_request(settings):
+    settings.worker_hedge_budget_ratio = 0.25
+    pool = WorkerPool("python", URLS)
+    pool.hedge_tokens = 0
+    for _ in range(4):
+        pool.record_request()
+    assert pool.take_hedge()
+    assert not pool.take_hedge()
+
+
+def test_failover_on_server_error_and_connect_error(settings):
+    pool = WorkerPool("python", URLS)
+    pool.endpoints[1].outstanding = 1
+    pool.endpoints[2].outstanding = 2
+    response, calls = post(pool, {
+        "http://a": (0, 503),
+        "http://b": httpx.ConnectError("refused"),
+        "http://c": (0, 200),
+    })
+    assert response.json()["replica"] == "http://c"
+    assert calls == URLS
+    assert pool.endpoints[0].consecutive_failures == 1
+    assert pool.endpoints[1].consecutive_failures == 1
+    assert pool.endpoints[2].consecutive_failures == 0
+
+
+def test_last_server_error_is_returned_when_every_replica_fails(settings):
+    pool = WorkerPool("python", URLS[:2])
+    response, calls = post(pool, {"http://a": (0, 503), "http://b": (0, 500)})
+    assert response.status_code in (500, 503)
+    assert sorted(calls) == URLS[:2]
+
+
+def test_unreachable_pool_raises(settings):
+    pool = WorkerPool("python", URLS[:2])
+    with pytest.raises(WorkerUnavailable):
+        post(pool, {"http://a": httpx.ConnectError("refused"), "http://b": httpx.ConnectError("refused")})
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """A streamed body that sends some lines and then fails as a dropped connection would"""
+
+    def __init__(self, lines: list[dict], error: Exception = None):
+        self.lines = lines
+        self.error = error
+
+    async def __aiter__(self):
+        for line in self.lines:
+            yield (json.dumps(line) + "\n").encode()
+        if self.error:
+            raise self.error
+
+
+def stream_workers(monkeypatch, stream: BrokenStream):
+    """Make every httpx client the code runner opens answer /execute/stream with stream"""
+    real_client = httpx.AsyncClient
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, stream=stream)
+
+    monkeypatch.setattr(
+        code_runner.httpx, "AsyncClient", lambda **kwargs: real_client(transport=httpx.MockTransport(handler))
+    )
+
+
+def collect(events) -> list[dict]:
+    async def run():
+        return [event async for event in events]
+
+    return asyncio.run(run())
+
+
+RESULT = {"event": "result", "result": {"name": "t", "passed": True}}
+
+
+def test_stream_broken_off_midway_counts_against_the_replica(settings, monkeypatch):
+    pool = WorkerPool("python", URLS[:1])
+    stream_workers(monkeypatch, BrokenStream([RESULT], httpx.RemoteProtocolError("peer closed connection")))
+
+    events = collect(stream_from_worker(pool, {}))
+
+    assert [event["event"] for event in events] == ["result", "done"]
+    assert events[-1]["response"].runtime_error.startswith(INCOMPLETE_STREAM_ERROR)
+    assert pool.endpoints[0].consecutive_failures == 1
+
+
+def test_stream_without_done_event_counts_against_the_replica(settings, monkeypatch):
+    pool = WorkerPool("python", URLS[:1])
+    stream_workers(monkeypatch, BrokenStream([RESULT]))
+
+    events = collect(stream_from_worker(pool, {}))
+
+    assert events[-1]["response"].runtime_error == INCOMPLETE_STREAM_ERROR
+    assert pool.endpoints[0].consecutive_failures == 1
+
+
+def test_more_results_than_tests_is_a_worker_error(settings, monkeypatch):
+    monkeypatch.setitem(code_runner.WORKER_POOLS, "python", WorkerPool("python", URLS[:1]))
+    stream_workers(monkeypatch, BrokenStream([RESULT, RESULT, {"event": "done"}]))
+    test_cases = {"test_cases": [{"name": "t", "input": "1", "expected_output": "1"}]}
+
+    events = collect(stream_code("python", "print(1)", test_cases))
+
+    assert [event["event"] for event in events] == ["result", "done"]
+    assert events[-1]["response"].runtime_error == EXTRA_RESULTS_ERROR
@@ -29,6 +29,8 @@ function PracticeContent() {
     setSubmitResults,
     showSolution,
     setShowSolution,
+    solution,
+    setSolution,
   } = usePracticeStore()
 
   useEffect(() => {
@@ -73,6 +75,20 @@ function PracticeContent() {
     }
   }
 
+  const handleToggleSolution = async () => {
+    if (!currentExercise) return
+
+    if (!showSolution && solution === null) {
+      try {
+        setSolution(await api.getExerciseSolution(currentExercise.id))
+      } catch (err) {
+        console.error('Failed to load solution:', err)
+        return
+      }
+    }
+    setShowSolution(!showSolution)
+  }
+
   const handleBackHome = () => {
     router.push('/')
   }
@@ -113,7 +129,7 @@ function PracticeContent() {
               </Button>
 
               <Button
-                onClick={() => setShowSolution(!showSolution)}
+                onClick={handleToggleSolution}
                 variant="secondary"
               >
                 {showSolution ? 'Hide Solution' : 'Show Solution'}
@@ -5,7 +5,7 @@ import { usePracticeStore } from '@/stores/practiceStore'
 import { clsx } from 'clsx'
 
 export function TaskPanel() {
-  const { currentExercise, submitResults, showSolution, isLoading } = usePracticeStore()
+  const { currentExercise, submitResults, showSolution, solution, isLoading } = usePracticeStore()
 
   if (!currentExercise) {
     return (
@@ -26,7 +26,7 @@ export function TaskPanel() {
     <div className="bg-blue-900/30 border border-blue-700 rounded-lg p-4">
       <h3 className="font-semibold text-blue-400 mb-3">Solution</h3>
       <pre className="bg-slate-800 text-slate-100 p-4 rounded-lg overflow-x-auto text-sm">
-        {currentExercise.solution_code}
+        {solution}
       </pre>
     </div>
   )
@@ -126,17 +126,38 @@ export function TaskPanel() {
             <div className="flex items-center gap-2 mb-1">
               <span>{result.passed ? '✓' : '✗'}</span>
               <span className="font-medium">{result.name}</span>
+              {result.resources && (
+                <span className="ml-auto text-xs text-gray-400">
+                  {result.resources.wall_time_ms} ms
+                  {result.resources.max_rss_kb !== null && ` · ${(result.resources.max_rss_kb / 1024).toFixed(1)} MB`}
+                  {result.benchmark && ` · ${result.benchmark.ratio}x reference`}
+                </span>
+              )}
             </div>
             {!result.passed && (
               <div className="text-xs mt-2 space-y-1">
-                <div>
-                  <span className="text-gray-400">Expected:</span>
-                  <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.expected}</pre>
-                </div>
-                <div>
-                  <span className="text-gray-400">Actual:</span>
-                  <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.actual}</pre>
-                </div>
+                {result.expected !== null && (
+                  <div>
+                    <span className="text-gray-400">Expected:</span>
+                    <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.expected}</pre>
+                  </div>
+                )}
+                {result.actual !== null && (
+                  <div>
+                    <span className="text-gray-400">Actual:</span>
+                    <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.actual}</pre>
+                  </div>
+                )}
+                {result.diff && (
+                  <div>
+                    <span className="text-gray-400">
+                      First difference at line {result.diff.line}, column {result.diff.column}:
+                    </span>
+                    <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">
+                      {`expected: ${result.diff.expected}\nactual:   ${result.diff.actual}`}
+                    </pre>
+                  </div>
+                )}
                 {result.error && (
                   <div>
                     <span className="text-gray-400">Error:</span>
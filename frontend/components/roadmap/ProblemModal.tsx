@@ -7,6 +7,7 @@ import { clsx } from 'clsx'
 import { useRoadmapStore } from '@/stores/roadmapStore'
 import { api } from '@/lib/api'
 import { Button } from '@/components/ui/Button'
+import { SubmitResult } from '@/types/roadmap'
 
 export function ProblemModal() {
   const editorRef = useRef<any>(null)
@@ -16,11 +17,13 @@ export function ProblemModal() {
     code,
     submitResult,
     showSolution,
+    solution,
     isSubmitting,
     isProblemModalOpen,
     setCode,
     setSubmitResult,
     setShowSolution,
+    setSolution,
     setSubmitting,
     closeProblem,
   } = useRoadmapStore()
@@ -37,8 +40,13 @@ export function ProblemModal() {
     if (!currentProblem) return
 
     setSubmitting(true)
+    setSubmitResult(null)
     try {
-      const result = await api.submitRoadmapProblem(currentProblem.id, code)
+      const streamed: SubmitResult = { passed: false, results: [], compile_error: null, runtime_error: null }
+      const result = await api.submitRoadmapProblemStream(currentProblem.id, code, (testResult) => {
+        streamed.results = [...streamed.results, testResult]
+        setSubmitResult({ ...streamed })
+      })
       setSubmitResult(result)
     } catch (err) {
       console.error('Failed to submit:', err)
@@ -47,6 +55,34 @@ export function ProblemModal() {
     }
   }
 
+  const handleRun = async () => {
+    if (!currentProblem) return
+
+    setSubmitting(true)
+    setSubmitResult(null)
+    try {
+      setSubmitResult(await api.runRoadmapProblem(currentProblem.id, code))
+    } catch (err) {
+      console.error('Failed to run:', err)
+    } finally {
+      setSubmitting(false)
+    }
+  }
+
+  const handleToggleSolution = async () => {
+    if (!currentProblem) return
+
+    if (!showSolution && solution === null) {
+      try {
+        setSolution(await api.getProblemSolution(currentProblem.id))
+      } catch (err) {
+        console.error('Failed to load solution:', err)
+        return
+      }
+    }
+    setShowSolution(!showSolution)
+  }
+
   const handleClose = useCallback(() => {
     closeProblem()
   }, [closeProblem])
@@ -109,11 +145,14 @@ export function ProblemModal() {
             </div>
           </div>
           <div className="flex items-center gap-3">
+            <Button onClick={handleRun} disabled={isSubmitting} variant="secondary">
+              Run
+            </Button>
             <Button onClick={handleSubmit} disabled={isSubmitting} variant="success">
               {isSubmitting ? 'Running...' : 'Submit'}
             </Button>
             <Button
-              onClick={() => setShowSolution(!showSolution)}
+              onClick={handleToggleSolution}
               variant="secondary"
             >
               {showSolution ? 'Hide Solution' : 'Show Solution'}
@@ -138,7 +177,7 @@ export function ProblemModal() {
               <div className="bg-blue-900/30 border border-blue-700 rounded-lg p-4">
                 <h3 className="font-semibold text-blue-400 mb-3">Solution</h3>
                 <pre className="bg-slate-800 text-slate-100 p-4 rounded-lg overflow-x-auto text-sm">
-                  {currentProblem.solution_code}
+                  {solution}
                 </pre>
               </div>
             )}
@@ -204,7 +243,9 @@ export function ProblemModal() {
                     submitResult.passed ? 'text-green-400' : 'text-red-400'
                   )}
                 >
-                  {submitResult.passed ? '✅ All Tests Passed!' : '❌ Some Tests Failed'}
+                  {isSubmitting
+                    ? `Running tests... (${submitResult.results.length} done)`
+                    : submitResult.passed ? '✅ All Tests Passed!' : '❌ Some Tests Failed'}
                 </h3>
 
                 {submitResult.compile_error && (
@@ -233,17 +274,38 @@ export function ProblemModal() {
                       <div className="flex items-center gap-2 mb-1">
                         <span>{result.passed ? '✓' : '✗'}</span>
                         <span className="font-medium">{result.name}</span>
+                        {result.resources && (
+                          <span className="ml-auto text-xs text-gray-400">
+                            {result.resources.wall_time_ms} ms
+                            {result.resources.max_rss_kb !== null && ` · ${(result.resources.max_rss_kb / 1024).toFixed(1)} MB`}
+                            {result.benchmark && ` · ${result.benchmark.ratio}x reference`}
+                          </span>
+                        )}
                       </div>
                       {!result.passed && (
                         <div className="text-xs mt-2 space-y-1">
-                          <div>
-                            <span className="text-gray-400">Expected:</span>
-                            <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.expected}</pre>
-                          </div>
-                          <div>
-                            <span className="text-gray-400">Actual:</span>
-                            <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.actual}</pre>
-                          </div>
+                          {result.expected !== null && (
+                            <div>
+                              <span className="text-gray-400">Expected:</span>
+                              <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.expected}</pre>
+                            </div>
+                          )}
+                          {result.actual !== null && (
+                            <div>
+                              <span className="text-gray-400">Actual:</span>
+                              <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">{result.actual}</pre>
+                            </div>
+                          )}
+                          {result.diff && (
+                            <div>
+                              <span className="text-gray-400">
+                                First difference at line {result.diff.line}, column {result.diff.column}:
+                              </span>
+                              <pre className="bg-gray-800 text-gray-300 p-1 rounded mt-0.5">
+                                {`expected: ${result.diff.expected}\nactual:   ${result.diff.actual}`}
+                              </pre>
+                            </div>
+                          )}
                           {result.error && (
                             <div>
                               <span className="text-gray-400">Error:</span>
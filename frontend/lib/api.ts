@@ -7,11 +7,17 @@ import {
   Difficulty,
   Level,
   NodeProgress,
+  GenerationJob,
   SubmitResult as RoadmapSubmitResult,
+  TestResult,
 } from '@/types/roadmap'
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api'
 
+// How often and how long generation jobs are polled
+const JOB_POLL_INTERVAL_MS = 1000
+const JOB_TIMEOUT_MS = 120000 // 2 minutes for AI generation
+
 const client = axios.create({
   baseURL: API_URL,
   headers: {
@@ -55,6 +61,11 @@ export const api = {
     return response.data
   },
 
+  async getExerciseSolution(exerciseId: string): Promise<string> {
+    const response = await client.get(`/exercises/${exerciseId}/solution`)
+    return response.data.solution_code
+  },
+
   async submitCode(exerciseId: string, code: string): Promise<SubmitResult> {
     const response = await client.post(`/exercises/${exerciseId}/submit`, {
       code,
@@ -78,21 +89,38 @@ export const api = {
     return response.data
   },
 
+  // Generation runs as a background job; wait for it and return the problem it produced
+  async waitForGeneratedProblem(job: GenerationJob): Promise<RoadmapProblem> {
+    const deadline = Date.now() + JOB_TIMEOUT_MS
+    while (job.status === 'queued' || job.status === 'running') {
+      if (Date.now() > deadline) {
+        throw new Error('Problem generation timed out')
+      }
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+      job = await api.getJob(job.id)
+    }
+    if (job.status === 'failed' || !job.problem_id) {
+      throw new Error(job.error || 'Problem generation failed')
+    }
+    return api.getProblem(job.problem_id)
+  },
+
+  async getJob(jobId: string): Promise<GenerationJob> {
+    const response = await client.get(`/jobs/${jobId}`)
+    return response.data
+  },
+
   async generateProblem(nodeId: string, difficulty: Difficulty, level: Level): Promise<RoadmapProblem> {
     const response = await client.post(`/roadmap/nodes/${nodeId}/generate`, {
       difficulty,
       level,
-    }, {
-      timeout: 120000, // 2 minutes for AI generation
     })
-    return response.data
+    return api.waitForGeneratedProblem(response.data)
   },
 
   async generateModuleTest(nodeId: string): Promise<RoadmapProblem> {
-    const response = await client.post(`/roadmap/nodes/${nodeId}/generate-module-test`, {}, {
-      timeout: 120000, // 2 minutes for AI generation
-    })
-    return response.data
+    const response = await client.post(`/roadmap/nodes/${nodeId}/generate-module-test`, {})
+    return api.waitForGeneratedProblem(response.data)
   },
 
   async getProblem(problemId: string): Promise<RoadmapProblem> {
@@ -100,6 +128,11 @@ export const api = {
     return response.data
   },
 
+  async getProblemSolution(problemId: string): Promise<string> {
+    const response = await client.get(`/roadmap/problems/${problemId}/solution`)
+    return response.data.solution_code
+  },
+
   async deleteProblem(problemId: string): Promise<void> {
     await client.delete(`/roadmap/problems/${problemId}`)
   },
@@ -111,6 +144,62 @@ export const api = {
     return response.data
   },
 
+  // Runs visible tests only; does not grade the problem
+  async runRoadmapProblem(problemId: string, code: string): Promise<RoadmapSubmitResult> {
+    const response = await client.post(`/roadmap/problems/${problemId}/run`, {
+      code,
+    })
+    return response.data
+  },
+
+  // Streams test results over server-sent events; onResult fires as each test finishes
+  async submitRoadmapProblemStream(
+    problemId: string,
+    code: string,
+    onResult: (result: TestResult) => void,
+  ): Promise<RoadmapSubmitResult> {
+    const response = await fetch(`${API_URL}/roadmap/problems/${problemId}/submit/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ code }),
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`Submit failed with status ${response.status}`)
+    }
+
+    const results: TestResult[] = []
+    const final: RoadmapSubmitResult = { passed: false, results, compile_error: null, runtime_error: null }
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+      const { done, value } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let boundary
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const chunk = buffer.slice(0, boundary)
+        buffer = buffer.slice(boundary + 2)
+
+        const event = chunk.match(/^event: (.*)$/m)?.[1]
+        const data = chunk.match(/^data: (.*)$/m)?.[1]
+        if (!event || !data) continue
+
+        if (event === 'result') {
+          const result: TestResult = JSON.parse(data)
+          results.push(result)
+          onResult(result)
+        } else if (event === 'done') {
+          Object.assign(final, JSON.parse(data))
+        }
+      }
+    }
+
+    return final
+  },
+
   async getNodeProgress(nodeId: string): Promise<NodeProgress> {
     const response = await client.get(`/roadmap/nodes/${nodeId}/progress`)
     return response.data
@@ -9,6 +9,7 @@ interface PracticeState {
   isLoading: boolean
   submitResults: SubmitResult | null
   showSolution: boolean
+  solution: string | null
 
   setSelectedLanguage: (language: Language | null) => void
   setSelectedTopic: (topic: Topic | null) => void
@@ -17,6 +18,7 @@ interface PracticeState {
   setLoading: (loading: boolean) => void
   setSubmitResults: (results: SubmitResult | null) => void
   setShowSolution: (show: boolean) => void
+  setSolution: (solution: string | null) => void
   reset: () => void
 }
 
@@ -28,6 +30,7 @@ const initialState = {
   isLoading: false,
   submitResults: null,
   showSolution: false,
+  solution: null,
 }
 
 export const usePracticeStore = create<PracticeState>((set) => ({
@@ -45,6 +48,7 @@ export const usePracticeStore = create<PracticeState>((set) => ({
       code: exercise?.template_code || '',
       submitResults: null,
       showSolution: false,
+      solution: null,
     }),
 
   setCode: (code) => set({ code }),
@@ -55,5 +59,7 @@ export const usePracticeStore = create<PracticeState>((set) => ({
 
   setShowSolution: (showSolution) => set({ showSolution }),
 
+  setSolution: (solution) => set({ solution }),
+
   reset: () => set(initialState),
 }))
@@ -23,6 +23,7 @@ interface RoadmapState {
   code: string
   submitResult: SubmitResult | null
   showSolution: boolean
+  solution: string | null
 
   // Loading states
   isLoadingNodes: boolean
@@ -43,6 +44,7 @@ interface RoadmapState {
   setCode: (code: string) => void
   setSubmitResult: (result: SubmitResult | null) => void
   setShowSolution: (show: boolean) => void
+  setSolution: (solution: string | null) => void
   setLoadingNodes: (loading: boolean) => void
   setLoadingProblems: (loading: boolean) => void
   setGenerating: (generating: boolean) => void
@@ -65,6 +67,7 @@ const initialState = {
   code: '',
   submitResult: null,
   showSolution: false,
+  solution: null,
   isLoadingNodes: false,
   isLoadingProblems: false,
   isGenerating: false,
@@ -86,6 +89,7 @@ export const useRoadmapStore = create<RoadmapState>((set, get) => ({
     code: problem?.template_code || '',
     submitResult: null,
     showSolution: false,
+    solution: null,
   }),
 
   setSelectedDifficulty: (difficulty) => set({ selectedDifficulty: difficulty }),
@@ -98,6 +102,8 @@ export const useRoadmapStore = create<RoadmapState>((set, get) => ({
 
   setShowSolution: (show) => set({ showSolution: show }),
 
+  setSolution: (solution) => set({ solution }),
+
   setLoadingNodes: (loading) => set({ isLoadingNodes: loading }),
 
   setLoadingProblems: (loading) => set({ isLoadingProblems: loading }),
@@ -113,6 +119,7 @@ export const useRoadmapStore = create<RoadmapState>((set, get) => ({
     code: problem.template_code,
     submitResult: null,
     showSolution: false,
+    solution: null,
     isProblemModalOpen: true,
   }),
 
@@ -121,6 +128,7 @@ export const useRoadmapStore = create<RoadmapState>((set, get) => ({
     code: '',
     submitResult: null,
     showSolution: false,
+    solution: null,
     isProblemModalOpen: false,
   }),
 
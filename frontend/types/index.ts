@@ -16,17 +16,37 @@ export interface Topic {
   created_at: string
 }
 
+export interface InputGenerator {
+  script: string
+  seed: number
+  params: Record<string, unknown>
+}
+
+export interface OutputChecker {
+  type: 'exact' | 'tokens' | 'float' | 'json' | 'unordered' | 'custom'
+  abs_tol: number
+  rel_tol: number
+  script: string | null
+}
+
 export interface TestCase {
   name: string
   input: string
   expected_output: string
   hidden: boolean
+  kind?: 'correctness' | 'benchmark'
+  reference_ms?: number | null
+  time_factor?: number | null
+  generator?: InputGenerator | null
+  expected_hash?: string | null
+  checker?: OutputChecker | null
 }
 
 export interface TestCasesConfig {
   test_cases: TestCase[]
   entry_point: string | null
   timeout_ms: number
+  checker?: OutputChecker | null
 }
 
 export interface Exercise {
@@ -35,23 +55,70 @@ export interface Exercise {
   title: string
   description: string
   template_code: string
-  solution_code: string
   test_cases: TestCasesConfig
   hints: string[] | null
   created_at: string
 }
 
+export interface TestResources {
+  wall_time_ms: number
+  cpu_time_ms: number
+  max_rss_kb: number | null
+  termination: 'ok' | 'runtime_error' | 'time_limit' | 'memory_limit' | 'output_limit' | 'wrong_output' | 'signal'
+  signal: string | null
+}
+
+export interface BenchmarkResult {
+  reference_ms: number
+  budget_ms: number
+  cpu_time_ms: number
+  ratio: number
+  within_budget: boolean
+}
+
+export interface OutputDiff {
+  offset: number
+  line: number
+  column: number
+  expected: string
+  actual: string
+}
+
 export interface TestCaseResult {
   name: string
   passed: boolean
   expected: string | null
   actual: string | null
   error: string | null
+  resources?: TestResources | null
+  benchmark?: BenchmarkResult | null
+  output_hash?: string | null
+  diff?: OutputDiff | null
+}
+
+export interface CompileErrorDetails {
+  type: string
+  message: string
+  line: number | null
+  column: number | null
+  text: string | null
+}
+
+export interface PerfSummary {
+  tests_measured: number
+  total_wall_time_ms: number
+  max_wall_time_ms: number
+  total_cpu_time_ms: number
+  max_cpu_time_ms: number
+  peak_rss_kb: number | null
+  terminations: Record<string, number>
 }
 
 export interface SubmitResult {
   passed: boolean
   results: TestCaseResult[]
   compile_error: string | null
+  compile_error_details?: CompileErrorDetails | null
   runtime_error: string | null
+  perf?: PerfSummary | null
 }
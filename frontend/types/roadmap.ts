@@ -65,23 +65,34 @@ export interface RoadmapProblem {
   title: string
   description: string
   template_code: string
-  solution_code: string
   test_cases: {
     test_cases: Array<{
       name: string
       input: string
       expected_output: string
       hidden: boolean
+      kind?: 'correctness' | 'benchmark'
+      reference_ms?: number | null
+      time_factor?: number | null
+      generator?: { script: string; seed: number; params: Record<string, unknown> } | null
+      expected_hash?: string | null
+      checker?: OutputChecker | null
     }>
     entry_point: string | null
     timeout_ms: number
+    checker?: OutputChecker | null
   }
   hints: string[] | null
-  description_hash: string
-  condensed_description: string
   created_at: string
 }
 
+export interface OutputChecker {
+  type: 'exact' | 'tokens' | 'float' | 'json' | 'unordered' | 'custom'
+  abs_tol: number
+  rel_tol: number
+  script: string | null
+}
+
 export interface RoadmapProblemSummary {
   id: string
   title: string
@@ -91,6 +102,21 @@ export interface RoadmapProblemSummary {
   created_at: string
 }
 
+export type JobStatus = 'queued' | 'running' | 'succeeded' | 'failed'
+
+// A problem generation running in the background; problem_id is set once it succeeds
+export interface GenerationJob {
+  id: string
+  kind: string
+  node_id: string
+  status: JobStatus
+  problem_id: string | null
+  error: string | null
+  created_at: string
+  started_at: string | null
+  finished_at: string | null
+}
+
 export interface NodeProgress {
   easy_total: number
   easy_solved: number
@@ -100,15 +126,65 @@ export interface NodeProgress {
   hard_solved: number
 }
 
+export interface TestResources {
+  wall_time_ms: number
+  cpu_time_ms: number
+  max_rss_kb: number | null
+  termination: 'ok' | 'runtime_error' | 'time_limit' | 'memory_limit' | 'output_limit' | 'wrong_output' | 'signal'
+  signal: string | null
+}
+
+export interface BenchmarkResult {
+  reference_ms: number
+  budget_ms: number
+  cpu_time_ms: number
+  ratio: number
+  within_budget: boolean
+}
+
+export interface OutputDiff {
+  offset: number
+  line: number
+  column: number
+  expected: string
+  actual: string
+}
+
+export interface TestResult {
+  name: string
+  passed: boolean
+  expected: string | null
+  actual: string | null
+  error: string | null
+  resources?: TestResources | null
+  benchmark?: BenchmarkResult | null
+  output_hash?: string | null
+  diff?: OutputDiff | null
+}
+
+export interface CompileErrorDetails {
+  type: string
+  message: string
+  line: number | null
+  column: number | null
+  text: string | null
+}
+
+export interface PerfSummary {
+  tests_measured: number
+  total_wall_time_ms: number
+  max_wall_time_ms: number
+  total_cpu_time_ms: number
+  max_cpu_time_ms: number
+  peak_rss_kb: number | null
+  terminations: Record<string, number>
+}
+
 export interface SubmitResult {
   passed: boolean
-  results: Array<{
-    name: string
-    passed: boolean
-    expected: string | null
-    actual: string | null
-    error: string | null
-  }>
+  results: TestResult[]
   compile_error: string | null
+  compile_error_details?: CompileErrorDetails | null
   runtime_error: string | null
+  perf?: PerfSummary | null
 }
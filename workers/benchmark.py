@@ -0,0 +1,474 @@
+"""Microbenchmark of the Python and C++ workers' execution path.
+
+Imports a worker's main.py and calls execute_python_code / execute_cpp_code
+directly, without HTTP, on a corpus of representative submissions: trivial,
+CPU-heavy, output-heavy, failing, timing out and not compiling. Each is
+modelled on a node of the seed roadmap; --database-url adds the stored
+problems generated for those nodes, run against their reference solutions.
+
+The corpus is run at each --concurrency level in turn and the report gives
+throughput plus where the time went, per submission:
+    compile  syntax check and bytecode (Python) or g++ (C++)
+    queue    waiting for a sandbox slot
+    spawn    starting the sandbox process
+    run      the sandboxed process, from spawn to exit
+    compare  checking output against the expected output
+Phase times are summed over a submission's tests, which run concurrently,
+so they can add up to more than its latency.
+
+Usage:
+    python benchmark.py --worker python --concurrency 1,4,16 --rounds 3
+    python benchmark.py --worker cpp --output cpp-baseline.json
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+WORKERS_DIR = Path(__file__).resolve().parent
+PHASES = ("compile", "queue", "spawn", "run", "compare")
+
+# Python submissions are called through an entry point with a JSON list of arguments
+PYTHON_CORPUS = [
+    {
+        "name": "trivial",
+        "node": "basic-syntax",
+        "code": (
+            "def fizzbuzz(n):\n"
+            "    if n % 15 == 0:\n        return 'FizzBuzz'\n"
+            "    if n % 3 == 0:\n        return 'Fizz'\n"
+            "    if n % 5 == 0:\n        return 'Buzz'\n"
+            "    return str(n)\n"
+        ),
+        "entry_point": "fizzbuzz",
+        "test_cases": [
+            {"name": f"fizzbuzz_{n}", "input": [n], "expected_output": expected}
+            for n, expected in [(1, "1"), (3, "Fizz"), (5, "Buzz"), (15, "FizzBuzz"), (98, "98")]
+        ],
+    },
+    {
+        "name": "cpu_heavy",
+        "node": "gil",
+        "code": (
+            "def count_primes(limit):\n"
+            "    return sum(1 for n in range(2, limit) if all(n % d for d in range(2, int(n ** 0.5) + 1)))\n"
+        ),
+        "entry_point": "count_primes",
+        "test_cases": [
+            {"name": f"primes_below_{limit}", "input": [limit], "expected_output": expected}
+            for limit, expected in [(20000, "2262"), (50000, "5133"), (80000, "7837")]
+        ],
+    },
+    {
+        "name": "output_heavy",
+        "node": "string-manipulation",
+        "code": "def numbered_lines(n):\n    return '\\n'.join(f'line {i}' for i in range(n))\n",
+        "entry_point": "numbered_lines",
+        "test_cases": [
+            {"name": f"lines_{n}", "input": [n], "expected_output": "\n".join(f"line {i}" for i in range(n))}
+            for n in (10000, 100000)
+        ],
+    },
+    {
+        "name": "failing",
+        "node": "error-handling",
+        "code": (
+            "def safe_divide(a, b):\n"
+            "    if b == 0:\n        raise ValueError('division by zero')\n"
+            "    return a // b + 1\n"
+        ),
+        "entry_point": "safe_divide",
+        "test_cases": [
+            {"name": "divide_exact", "input": [10, 2], "expected_output": "5"},
+            {"name": "divide_floor", "input": [7, 2], "expected_output": "3"},
+            {"name": "divide_by_zero", "input": [1, 0], "expected_output": "None"},
+        ],
+    },
+    {
+        "name": "timing_out",
+        "node": "generators",
+        "code": (
+            "def naturals():\n    n = 0\n    while True:\n        yield n\n        n += 1\n\n"
+            "def count_naturals():\n    count = 0\n    for _ in naturals():\n        count += 1\n    return count\n"
+        ),
+        "entry_point": "count_naturals",
+        "test_cases": [{"name": "never_ends", "input": [], "expected_output": "0"}],
+        "timeout_ms": 1000,
+    },
+    {
+        "name": "compile_error",
+        "node": "functions-advanced",
+        "code": "def apply(f, *args)\n    return f(*args)\n",
+        "entry_point": "apply",
+        "test_cases": [{"name": "apply_abs", "input": [-1], "expected_output": "1"}],
+    },
+]
+
+# C++ submissions read their test's input from stdin
+CPP_CORPUS = [
+    {
+        "name": "trivial",
+        "node": "types-syntax",
+        "code": "#include <iostream>\nint main() { long a, b; std::cin >> a >> b; std::cout << a + b; }\n",
+        "test_cases": [
+            {"name": f"add_{i}", "input": f"{i} {i * 3}", "expected_output": str(i * 4)}
+            for i in range(5)
+        ],
+    },
+    {
+        "name": "cpu_heavy",
+        "node": "algorithms",
+        "code": (
+            "#include <iostream>\n"
+            "int main() {\n"
+            "    int limit; std::cin >> limit;\n"
+            "    int count = 0;\n"
+            "    for (int n = 2; n < limit; ++n) {\n"
+            "        bool prime = true;\n"
+            "        for (int d = 2; d < n && prime; ++d) prime = n % d != 0;\n"
+            "        count += prime;\n"
+            "    }\n"
+            "    std::cout << count;\n"
+            "}\n"
+        ),
+        "test_cases": [
+            {"name": f"primes_below_{limit}", "input": str(limit), "expected_output": expected}
+            for limit, expected in [(20000, "2262"), (50000, "5133"), (80000, "7837")]
+        ],
+    },
+    {
+        "name": "output_heavy",
+        "node": "containers",
+        "code": (
+            "#include <iostream>\n#include <vector>\n"
+            "int main() {\n"
+            "    int n; std::cin >> n;\n"
+            "    std::vector<int> values(n);\n"
+            "    for (int i = 0; i < n; ++i) values[i] = i;\n"
+            "    for (int v : values) std::cout << \"line \" << v << '\\n';\n"
+            "}\n"
+        ),
+        "test_cases": [
+            {"name": f"lines_{n}", "input": str(n), "expected_output": "\n".join(f"line {i}" for i in range(n))}
+            for n in (10000, 100000)
+        ],
+    },
+    {
+        "name": "failing",
+        "node": "pointers",
+        "code": (
+            "#include <iostream>\n"
+            "int main() {\n"
+            "    int a, b; std::cin >> a >> b;\n"
+            "    int* result = b == 0 ? nullptr : new int(a / b + 1);\n"
+            "    std::cout << *result;\n"
+            "}\n"
+        ),
+        "test_cases": [
+            {"name": "divide_exact", "input": "10 2", "expected_output": "5"},
+            {"name": "divide_floor", "input": "7 2", "expected_output": "3"},
+            {"name": "divide_by_zero", "input": "1 0", "expected_output": "0"},
+        ],
+    },
+    {
+        "name": "timing_out",
+        "node": "iterators",
+        "code": (
+            "#include <iostream>\n"
+            "int main() { volatile unsigned long n = 0; while (true) ++n; }\n"
+        ),
+        "test_cases": [{"name": "never_ends", "input": "", "expected_output": "0"}],
+        "timeout_ms": 1000,
+    },
+    {
+        "name": "compile_error",
+        "node": "function-templates",
+        "code": "template <typename T> T twice(T x) { return x * 2 }\nint main() { return twice(1); }\n",
+        "test_cases": [{"name": "twice", "input": "", "expected_output": ""}],
+    },
+]
+
+WORKERS = {
+    "python": {"directory": "python-worker", "execute": "execute_python_code", "corpus": PYTHON_CORPUS},
+    "cpp": {"directory": "cpp-worker", "execute": "execute_cpp_code", "corpus": CPP_CORPUS},
+}
+
+# Phase totals of the submission being executed; the worker's test tasks inherit it
+_phases: ContextVar[dict | None] = ContextVar("phases", default=None)
+# Spawn time of the sandbox run in progress in this task
+_spawned: ContextVar[list | None] = ContextVar("spawned", default=None)
+
+
+def record(phase: str, elapsed: float):
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] += elapsed
+
+
+def load_worker(language: str):
+    path = WORKERS_DIR / WORKERS[language]["directory"] / "main.py"
+    spec = importlib.util.spec_from_file_location(f"{language}_worker", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def timed_spawn(spawn_sandbox):
+    """Wrap the worker's spawn_sandbox, timing each sandbox start"""
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        spawned_sandbox = spawn_sandbox(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        spawned = _spawned.get()
+        if spawned is not None:
+            spawned[0] += elapsed
+        record("spawn", elapsed)
+        return spawned_sandbox
+    return wrapper
+
+
+def timed(function, phase: str):
+    if asyncio.iscoroutinefunction(function):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                record(phase, time.perf_counter() - started)
+    else:
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(phase, time.perf_counter() - started)
+    return wrapper
+
+
+def instrument(worker):
+    """Wrap the worker's phase boundaries so each submission's time is split by phase"""
+    # The sandbox, checkers and test runner live in the shared module the worker imports
+    core = sys.modules["worker_core"]
+    core.spawn_sandbox = timed_spawn(core.spawn_sandbox)
+    if hasattr(worker, "check_syntax"):
+        worker.check_syntax = timed(worker.check_syntax, "compile")
+    if hasattr(worker, "compile_cpp"):
+        worker.compile_cpp = timed(worker.compile_cpp, "compile")
+    core.check_output = timed(core.check_output, "compare")
+
+    comparator = core.OutputComparator
+
+    class TimedComparator(comparator):
+        feed = timed(comparator.feed, "compare")
+        finish = timed(comparator.finish, "compare")
+
+    core.OutputComparator = TimedComparator
+
+    run_sandbox = core.run_sandbox
+
+    async def timed_run_sandbox(*args, **kwargs):
+        token = _spawned.set([0.0])
+        started = time.perf_counter()
+        try:
+            run = await run_sandbox(*args, **kwargs)
+            wall_time = run["resources"]["wall_time_ms"] / 1000
+            record("queue", max(0.0, time.perf_counter() - started - wall_time))
+            record("run", max(0.0, wall_time - _spawned.get()[0]))
+            return run
+        finally:
+            _spawned.reset(token)
+
+    core.run_sandbox = timed_run_sandbox
+
+
+def stored_problems(database_url: str, language: str, limit: int) -> list:
+    """Reference solutions of problems generated for the seed roadmap's nodes"""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT n.slug, p.solution_code, p.test_cases FROM roadmap_problems p "
+            "JOIN roadmap_nodes n ON n.id = p.node_id JOIN languages l ON l.id = n.language_id "
+            "WHERE l.slug = :language ORDER BY p.created_at LIMIT :limit"
+        ), {"language": language, "limit": limit}).all()
+    engine.dispose()
+
+    problems = []
+    for slug, solution_code, test_cases in rows:
+        if isinstance(test_cases, str):
+            test_cases = json.loads(test_cases)
+        problems.append({
+            "name": "stored_problem",
+            "node": slug,
+            "code": solution_code,
+            "entry_point": test_cases.get("entry_point"),
+            "test_cases": test_cases.get("test_cases", []),
+            "timeout_ms": test_cases.get("timeout_ms", 5000),
+        })
+    return problems
+
+
+async def run_submission(execute, submission: dict) -> dict:
+    phases = dict.fromkeys(PHASES, 0.0)
+    _phases.set(phases)
+    started = time.perf_counter()
+    response = await execute(
+        submission["code"],
+        submission["test_cases"],
+        submission.get("entry_point"),
+        submission.get("timeout_ms", 5000),
+    )
+    latency = time.perf_counter() - started
+
+    terminations: dict[str, int] = {}
+    for result in response["results"]:
+        termination = (result.get("resources") or {}).get("termination", "none")
+        terminations[termination] = terminations.get(termination, 0) + 1
+    return {
+        "name": submission["name"],
+        "latency": latency,
+        "phases": phases,
+        "tests": len(response["results"]),
+        "passed": sum(1 for result in response["results"] if result["passed"]),
+        "compile_error": bool(response.get("compile_error")),
+        "terminations": terminations,
+    }
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def summarize(samples: list) -> dict:
+    latencies = [sample["latency"] for sample in samples]
+    return {
+        "submissions": len(samples),
+        "latency_ms": {
+            "mean": milliseconds(statistics.mean(latencies)),
+            "p50": milliseconds(percentile(latencies, 50)),
+            "p95": milliseconds(percentile(latencies, 95)),
+            "p99": milliseconds(percentile(latencies, 99)),
+        },
+        "phase_ms": {
+            phase: milliseconds(statistics.mean(sample["phases"][phase] for sample in samples))
+            for phase in PHASES
+        },
+    }
+
+
+async def run_level(execute, corpus: list, concurrency: int, rounds: int, rng: random.Random) -> dict:
+    submissions = [submission for _ in range(rounds) for submission in corpus]
+    rng.shuffle(submissions)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(submission):
+        async with semaphore:
+            return await run_submission(execute, submission)
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(bounded(submission) for submission in submissions))
+    elapsed = time.perf_counter() - started
+
+    by_name: dict[str, list] = {}
+    for sample in samples:
+        by_name.setdefault(sample["name"], []).append(sample)
+    categories = {}
+    for name, group in by_name.items():
+        terminations: dict[str, int] = {}
+        for sample in group:
+            for termination, n in sample["terminations"].items():
+                terminations[termination] = terminations.get(termination, 0) + n
+        categories[name] = {
+            **summarize(group),
+            "tests_passed": sum(sample["passed"] for sample in group),
+            "tests_run": sum(sample["tests"] for sample in group),
+            "compile_errors": sum(sample["compile_error"] for sample in group),
+            "terminations": terminations,
+        }
+
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "submissions_per_s": round(len(samples) / elapsed, 2),
+        "tests_per_s": round(sum(sample["tests"] for sample in samples) / elapsed, 2),
+        **summarize(samples),
+        "categories": categories,
+    }
+
+
+async def run_benchmark(worker, language: str, corpus: list, levels: list, rounds: int, seed: int) -> list:
+    execute = getattr(worker, WORKERS[language]["execute"])
+    rng = random.Random(seed)
+    # One untimed pass so imports, the compiler and the page cache are warm
+    await asyncio.gather(*(run_submission(execute, submission) for submission in corpus))
+    return [await run_level(execute, corpus, concurrency, rounds, rng) for concurrency in levels]
+
+
+def print_table(levels: list):
+    header = f"{'concurrency':>11} {'subs/s':>8} {'tests/s':>8} {'p50 ms':>9} {'p95 ms':>9}"
+    header += "".join(f" {phase + ' ms':>11}" for phase in PHASES)
+    print(header)
+    for level in levels:
+        line = (
+            f"{level['concurrency']:>11} {level['submissions_per_s']:>8} {level['tests_per_s']:>8} "
+            f"{level['latency_ms']['p50']:>9} {level['latency_ms']['p95']:>9}"
+        )
+        line += "".join(f" {level['phase_ms'][phase]:>11}" for phase in PHASES)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", choices=sorted(WORKERS), default="python")
+    parser.add_argument("--concurrency", default="1,2,4,8,16",
+                        help="comma-separated numbers of submissions in flight, run in turn")
+    parser.add_argument("--rounds", type=int, default=3, help="times each corpus entry runs per level")
+    parser.add_argument("--database-url", help="also run stored problems' reference solutions from this database")
+    parser.add_argument("--stored-problems", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    corpus = list(WORKERS[args.worker]["corpus"])
+    if args.database_url:
+        corpus += stored_problems(args.database_url, args.worker, args.stored_problems)
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    worker = load_worker(args.worker)
+    instrument(worker)
+    results = asyncio.run(run_benchmark(worker, args.worker, corpus, levels, args.rounds, args.seed))
+
+    report = {
+        "worker": args.worker,
+        "worker_version": worker.WORKER_VERSION,
+        "max_parallel_tests": sys.modules["worker_core"].MAX_PARALLEL_TESTS,
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "corpus": [{"name": submission["name"], "node": submission["node"]} for submission in corpus],
+        "rounds": args.rounds,
+        "levels": results,
+    }
+    print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
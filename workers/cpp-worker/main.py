@@ -1,147 +1,139 @@
-import subprocess
+import asyncio
 import tempfile
 import os
+import sys
 import json
-import resource
-from flask import Flask, request, jsonify
+from contextlib import aclosing
 
-app = Flask(__name__)
+import uvicorn
+from fastapi import FastAPI, Header
+from fastapi.responses import StreamingResponse
 
-MAX_MEMORY_MB = 128
-MAX_TIME_SECONDS = 10
+# The image copies worker_core.py next to this file; in the repository it is in workers/shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+from worker_core import (
+    DRAIN_TIMEOUT_SECONDS, KEEP_ALIVE_SECONDS, SPAN_SERVER, DrainingServer, ExecuteRequest, admitted, collect_results,
+    configure, health_response, reject, run_test, run_tests, start_span, worker_version,
+)
 
+app = FastAPI(title="C++ Worker")
 
-def set_limits():
-    """Set resource limits for subprocess"""
-    resource.setrlimit(resource.RLIMIT_AS, (MAX_MEMORY_MB * 1024 * 1024, MAX_MEMORY_MB * 1024 * 1024))
-    resource.setrlimit(resource.RLIMIT_CPU, (MAX_TIME_SECONDS, MAX_TIME_SECONDS))
+COMPILE_TIMEOUT_SECONDS = 30
 
+configure("cpp-worker", memory_error_markers=("std::bad_alloc",))
+WORKER_VERSION = worker_version(__file__)
+
+# Directory for compiled binaries; point it at a tmpfs mounted with exec to keep runs off disk
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR") or None
+
+
+async def compile_cpp(code: str, executable: str, temp_dir: str):
+    """Compile the submission, feeding the source through stdin so it is never written out.
+
+    -pipe and TMPDIR keep the intermediate files in scratch as well.
+    Returns the compiler's stderr on failure, None on success.
+    """
+    process = await asyncio.create_subprocess_exec(
+        'g++', '-std=c++17', '-O2', '-pipe', '-x', 'c++', '-o', executable, '-',
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+        env={**os.environ, "TMPDIR": temp_dir}
+    )
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(code.encode()), COMPILE_TIMEOUT_SECONDS)
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        raise
+
+    return stderr.decode(errors="replace") if process.returncode != 0 else None
 
-def execute_cpp_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000) -> dict:
-    """Compile and execute C++ code"""
-    results = []
-    compile_error = None
-    runtime_error = None
 
+async def stream_cpp_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000,
+                          mode: str = "full"):
+    """Compile once, then run test cases concurrently, yielding result events in test order.
+
+    Emits {"event": "result", "result": {...}} per test and a final
+    {"event": "done", "compile_error": ..., "runtime_error": ...}.
+    """
     timeout_seconds = timeout_ms / 1000
 
-    # Create temp directory for compilation
-    with tempfile.TemporaryDirectory() as temp_dir:
-        source_file = os.path.join(temp_dir, "solution.cpp")
+    # Create scratch directory for the binary
+    with tempfile.TemporaryDirectory(dir=SCRATCH_DIR) as temp_dir:
         executable = os.path.join(temp_dir, "solution")
 
-        # Write source code
-        with open(source_file, 'w') as f:
-            f.write(code)
-
-        # Compile
         try:
-            compile_result = subprocess.run(
-                ['g++', '-std=c++17', '-O2', '-o', executable, source_file],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-
-            if compile_result.returncode != 0:
-                return {
-                    "results": [],
-                    "compile_error": compile_result.stderr,
-                    "runtime_error": None
-                }
-
-        except subprocess.TimeoutExpired:
-            return {
-                "results": [],
-                "compile_error": "Compilation timed out",
-                "runtime_error": None
-            }
+            with start_span("compile") as span:
+                compile_error = await compile_cpp(code, executable, temp_dir)
+                span.set(ok=compile_error is None)
+
+            if compile_error is not None:
+                yield {"event": "done", "compile_error": compile_error, "runtime_error": None}
+                return
+
+        except asyncio.TimeoutError:
+            yield {"event": "done", "compile_error": "Compilation timed out", "runtime_error": None}
+            return
         except Exception as e:
-            return {
-                "results": [],
-                "compile_error": str(e),
-                "runtime_error": None
-            }
-
-        # Run test cases
-        for test in test_cases:
-            test_name = test.get("name", "test")
-            test_input = test.get("input", "")
-            expected_output = test.get("expected_output", "")
-
-            try:
-                process = subprocess.run(
-                    [executable],
-                    input=test_input,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout_seconds,
-                    preexec_fn=set_limits
-                )
-
-                actual_output = process.stdout.strip()
-                stderr = process.stderr.strip()
-
-                if process.returncode != 0:
-                    results.append({
-                        "name": test_name,
-                        "passed": False,
-                        "expected": expected_output,
-                        "actual": actual_output,
-                        "error": stderr or f"Exit code: {process.returncode}"
-                    })
-                else:
-                    passed = actual_output == expected_output.strip()
-                    results.append({
-                        "name": test_name,
-                        "passed": passed,
-                        "expected": expected_output,
-                        "actual": actual_output,
-                        "error": None
-                    })
-
-            except subprocess.TimeoutExpired:
-                results.append({
-                    "name": test_name,
-                    "passed": False,
-                    "expected": expected_output,
-                    "actual": None,
-                    "error": "Execution timed out"
-                })
-
-            except Exception as e:
-                results.append({
-                    "name": test_name,
-                    "passed": False,
-                    "expected": expected_output,
-                    "actual": None,
-                    "error": str(e)
-                })
-
-    return {
-        "results": results,
-        "compile_error": compile_error,
-        "runtime_error": runtime_error
-    }
-
-
-@app.route('/execute', methods=['POST'])
-def execute():
-    data = request.json
-
-    code = data.get('code', '')
-    test_cases = data.get('test_cases', [])
-    entry_point = data.get('entry_point')
-    timeout_ms = data.get('timeout_ms', 5000)
-
-    result = execute_cpp_code(code, test_cases, entry_point, timeout_ms)
-    return jsonify(result)
-
-
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({"status": "healthy", "language": "cpp"})
+            yield {"event": "done", "compile_error": str(e), "runtime_error": None}
+            return
+
+        def run(test: dict):
+            return run_test(test, lambda input_path: [executable], timeout_seconds)
+
+        # Closed before the binary is removed, so no test outlives it
+        async with aclosing(run_tests(test_cases, mode, run)) as events:
+            async for event in events:
+                yield event
+
+
+async def execute_cpp_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000,
+                           mode: str = "full") -> dict:
+    """Compile and execute C++ code"""
+    return await collect_results(stream_cpp_code(code, test_cases, entry_point, timeout_ms, mode))
+
+
+@app.post('/execute')
+async def execute(data: ExecuteRequest, traceparent: str | None = Header(default=None)):
+    rejection = reject(data)
+    if rejection:
+        return rejection
+
+    with start_span("POST /execute", traceparent, SPAN_SERVER, tests=len(data.test_cases)):
+        async with admitted():
+            return await execute_cpp_code(data.code, data.test_cases, data.entry_point, data.timeout_ms, data.mode)
+
+
+@app.post('/execute/stream')
+async def execute_stream(data: ExecuteRequest, traceparent: str | None = Header(default=None)):
+    """Same as /execute, but emits one NDJSON event per test as it completes"""
+    rejection = reject(data)
+    if rejection:
+        return rejection
+
+    async def events():
+        with start_span("POST /execute/stream", traceparent, SPAN_SERVER, tests=len(data.test_cases)):
+            async with admitted():
+                async for event in stream_cpp_code(
+                    data.code, data.test_cases, data.entry_point, data.timeout_ms, data.mode
+                ):
+                    yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type='application/x-ndjson')
+
+
+@app.get('/health')
+async def health():
+    return health_response("cpp", WORKER_VERSION)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    DrainingServer(uvicorn.Config(
+        app,
+        host='0.0.0.0',
+        port=int(os.environ.get("PORT", 5000)),
+        timeout_keep_alive=KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT_SECONDS
+    )).run()
@@ -3,13 +3,27 @@ const { spawn } = require('child_process');
 const fs = require('fs');
 const path = require('path');
 const os = require('os');
+const crypto = require('crypto');
 
 const app = express();
 app.use(express.json());
 
 const MAX_TIME_MS = 10000;
 
-function executeJavaScript(code, testCases, entryPoint, timeoutMs) {
+// Changes whenever this file does, so the backend never reuses results cached from an older build
+const WORKER_VERSION = process.env.WORKER_VERSION ||
+  crypto.createHash('sha256').update(fs.readFileSync(__filename)).digest('hex').slice(0, 12);
+
+// full: run every test; fail_fast: stop at the first failure; visible_only: skip hidden tests
+const EXECUTION_MODES = ['full', 'fail_fast', 'visible_only'];
+
+function selectTestCases(testCases, mode) {
+  return mode === 'visible_only' ? testCases.filter((test) => !test.hidden) : testCases;
+}
+
+function executeJavaScript(code, testCases, entryPoint, timeoutMs, mode = 'full') {
+  testCases = selectTestCases(testCases, mode);
+
   return new Promise((resolve) => {
     const results = [];
     let compileError = null;
@@ -18,7 +32,8 @@ function executeJavaScript(code, testCases, entryPoint, timeoutMs) {
     const timeout = Math.min(timeoutMs || 5000, MAX_TIME_MS);
 
     const runTest = async (index) => {
-      if (index >= testCases.length) {
+      const failed = mode === 'fail_fast' && results.some((r) => !r.passed);
+      if (index >= testCases.length || failed) {
         resolve({ results, compile_error: compileError, runtime_error: runtimeError });
         return;
       }
@@ -159,14 +174,19 @@ console.log(typeof result === 'object' ? JSON.stringify(result) : result);
 }
 
 app.post('/execute', async (req, res) => {
-  const { code, test_cases, entry_point, timeout_ms } = req.body;
+  const { code, test_cases, entry_point, timeout_ms, mode = 'full' } = req.body;
+
+  if (!EXECUTION_MODES.includes(mode)) {
+    return res.status(400).json({ error: `Unknown execution mode: ${mode}` });
+  }
 
   try {
     const result = await executeJavaScript(
       code || '',
       test_cases || [],
       entry_point,
-      timeout_ms || 5000
+      timeout_ms || 5000,
+      mode
     );
     res.json(result);
   } catch (err) {
@@ -179,7 +199,7 @@ app.post('/execute', async (req, res) => {
 });
 
 app.get('/health', (req, res) => {
-  res.json({ status: 'healthy', language: 'javascript' });
+  res.json({ status: 'healthy', language: 'javascript', version: WORKER_VERSION });
 });
 
 const PORT = process.env.PORT || 5000;
@@ -0,0 +1,99 @@
+"""Load test for a code execution worker.
+
+Fires a fixed number of /execute requests at a worker with bounded concurrency
+and reports throughput and latency percentiles.
+
+Usage:
+    python loadtest.py --url http://localhost:5001 --language python --requests 200 --concurrency 16
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+PAYLOADS = {
+    "python": {
+        "code": "def add(a, b):\n    return a + b\n",
+        "entry_point": "add",
+        "test_cases": [
+            {"name": f"add_{i}", "input": [i, i], "expected_output": str(2 * i)}
+            for i in range(5)
+        ],
+        "timeout_ms": 5000,
+    },
+    "cpp": {
+        "code": (
+            "#include <iostream>\n"
+            "int main() { long a, b; std::cin >> a >> b; std::cout << a + b; }\n"
+        ),
+        "entry_point": None,
+        "test_cases": [
+            {"name": f"add_{i}", "input": f"{i} {i}", "expected_output": str(2 * i)}
+            for i in range(5)
+        ],
+        "timeout_ms": 5000,
+    },
+}
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(url: str, payload: dict, total: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=120.0) as client:
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(f"{url}/execute", json=payload)
+                    data = response.json()
+                    if response.status_code != 200 or not all(r["passed"] for r in data["results"]):
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--language", choices=sorted(PAYLOADS), default="python")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    report = asyncio.run(run_load(args.url, PAYLOADS[args.language], args.requests, args.concurrency))
+    print(json.dumps({"url": args.url, "language": args.language, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Run several replicas of a worker locally so the backend can balance across them.
+
+Each replica listens on its own port starting at --base-port. The script
+prints the worker URL setting to export for the backend and keeps the
+replicas running until interrupted. Stopping a replica by hand (or sending it
+SIGTERM) exercises the backend's health probing, circuit breaking and
+failover.
+
+Usage:
+    python local_pool.py --worker python --replicas 3 --base-port 5101
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+WORKERS_DIR = Path(__file__).resolve().parent
+
+COMMANDS = {
+    "python": [sys.executable, "main.py"],
+    "cpp": [sys.executable, "main.py"],
+    "javascript": ["node", "main.js"],
+    "react": ["node", "main.js"],
+}
+
+
+def start_replicas(worker: str, replicas: int, base_port: int) -> list:
+    processes = []
+    for port in range(base_port, base_port + replicas):
+        processes.append(subprocess.Popen(
+            COMMANDS[worker],
+            cwd=WORKERS_DIR / f"{worker}-worker",
+            env={**os.environ, "PORT": str(port)}
+        ))
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker", choices=sorted(COMMANDS), default="python")
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=5101)
+    args = parser.parse_args()
+
+    processes = start_replicas(args.worker, args.replicas, args.base_port)
+    urls = ",".join(f"http://127.0.0.1:{port}" for port in range(args.base_port, args.base_port + args.replicas))
+    print(f"{args.worker.upper()}_WORKER_URL={urls}", flush=True)
+
+    try:
+        while any(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,138 +1,183 @@
-import subprocess
-import tempfile
 import os
+import sys
 import json
-import resource
-from flask import Flask, request, jsonify
+import marshal
+from contextlib import aclosing, contextmanager
+
+import uvicorn
+from fastapi import FastAPI, Header
+from fastapi.responses import StreamingResponse
+
+# The image copies worker_core.py next to this file; in the repository it is in workers/shared
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "shared"))
+from worker_core import (
+    DRAIN_TIMEOUT_SECONDS, KEEP_ALIVE_SECONDS, SPAN_SERVER, DrainingServer, ExecuteRequest, admitted, collect_results,
+    configure, health_response, reject, run_test, run_tests, scratch_file, start_span, worker_version,
+)
+
+app = FastAPI(title="Python Worker")
+
+configure("python-worker", memory_error_markers=("MemoryError",))
+WORKER_VERSION = worker_version(__file__)
+
+# Filename reported in tracebacks and syntax errors for the submitted code
+SUBMISSION_FILENAME = "solution.py"
+# Submissions are compiled in the worker process, so their size is capped before that
+MAX_SOURCE_BYTES = int(os.environ.get("MAX_SOURCE_KB", 256)) * 1024
+
+RUNNER_TEMPLATE = '''import marshal
+namespace = {{"__name__": "__main__", "__builtins__": __builtins__}}
+with open({bytecode_path!r}, "rb") as f:
+    exec(marshal.load(f), namespace)
+'''
 
-app = Flask(__name__)
+ENTRY_POINT_TEMPLATE = '''
+import json
+with open({input_path!r}) as f:
+    args = json.load(f)
+entry_point = eval({entry_point!r}, namespace)
+result = entry_point(*args) if isinstance(args, list) else entry_point(args)
+print(result)
+'''
 
-MAX_MEMORY_MB = 128
-MAX_TIME_SECONDS = 10
 
+def check_syntax(code: str):
+    """Compile the submission in-process so syntax errors never reach a sandbox.
+
+    Returns (code_object, None) on success or (None, details) where details
+    holds the error type, message, line, column and offending source line.
+    """
+    if len(code.encode()) > MAX_SOURCE_BYTES:
+        return None, {
+            "type": "SourceTooLarge",
+            "message": f"Submission exceeds {MAX_SOURCE_BYTES // 1024} KB",
+            "line": None,
+            "column": None,
+            "text": None,
+        }
+    try:
+        return compile(code, SUBMISSION_FILENAME, "exec"), None
+    except SyntaxError as e:
+        return None, {
+            "type": type(e).__name__,
+            "message": e.msg,
+            "line": e.lineno,
+            "column": e.offset,
+            "text": e.text.rstrip("\n") if e.text else None,
+        }
+    except (ValueError, RecursionError, MemoryError) as e:
+        # e.g. source containing null bytes, or legal but deeply nested or huge expressions
+        # the compiler cannot handle; never a worker error, which would count against the replica
+        message = str(e) or "Expression too large or deeply nested to compile"
+        return None, {"type": type(e).__name__, "message": message, "line": None, "column": None, "text": None}
+
+
+def format_compile_error(details: dict) -> str:
+    location = f" (line {details['line']}, column {details['column']})" if details["line"] else ""
+    return f"{details['type']}: {details['message']}{location}"
+
+
+@contextmanager
+def scratch_bytecode(code_object):
+    """Store marshalled bytecode for the run and yield (path, fds the sandbox must inherit)"""
+    with scratch_file("solution.bin") as (bytecode_path, pass_fds):
+        with open(bytecode_path, "wb") as f:
+            marshal.dump(code_object, f)
+        yield bytecode_path, pass_fds
+
+
+def build_runner(bytecode_path: str, input_path: str, entry_point: str = None) -> str:
+    """Build the program a sandbox runs: load the precompiled submission, then call the entry point"""
+    runner = RUNNER_TEMPLATE.format(bytecode_path=bytecode_path)
+    if entry_point:
+        # Function-based test; stdin-based tests just run the module
+        runner += ENTRY_POINT_TEMPLATE.format(input_path=input_path, entry_point=entry_point)
+    return runner
+
+
+
+async def stream_python_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000,
+                             mode: str = "full"):
+    """Run test cases concurrently, yielding result events in test order.
+
+    Emits {"event": "result", "result": {...}} per test and a final
+    {"event": "done", "compile_error": ..., "runtime_error": ...}. The submission
+    is compiled once up front; a syntax error ends the run before any sandbox
+    is spawned and is reported with its location in compile_error_details.
+    """
+    timeout_seconds = timeout_ms / 1000
 
-def set_limits():
-    """Set resource limits for subprocess"""
-    resource.setrlimit(resource.RLIMIT_AS, (MAX_MEMORY_MB * 1024 * 1024, MAX_MEMORY_MB * 1024 * 1024))
-    resource.setrlimit(resource.RLIMIT_CPU, (MAX_TIME_SECONDS, MAX_TIME_SECONDS))
+    with start_span("compile") as span:
+        code_object, syntax_error = check_syntax(code)
+        span.set(ok=syntax_error is None)
+    if syntax_error:
+        yield {
+            "event": "done",
+            "compile_error": format_compile_error(syntax_error),
+            "compile_error_details": syntax_error,
+            "runtime_error": None,
+        }
+        return
+
+    # Every test in the run loads the same bytecode instead of re-parsing the source
+    with scratch_bytecode(code_object) as (bytecode_path, pass_fds):
+        def command(input_path: str) -> list:
+            return [sys.executable, '-c', build_runner(bytecode_path, input_path, entry_point)]
+
+        def run(test: dict):
+            return run_test(test, command, timeout_seconds, pass_fds, as_json=bool(entry_point))
+
+        # Closed before the bytecode goes away, so no test outlives it
+        async with aclosing(run_tests(test_cases, mode, run)) as events:
+            async for event in events:
+                yield event
+
+
+async def execute_python_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000,
+                              mode: str = "full") -> dict:
+    """Execute Python code and run test cases"""
+    return await collect_results(stream_python_code(code, test_cases, entry_point, timeout_ms, mode))
 
 
-def execute_python_code(code: str, test_cases: list, entry_point: str = None, timeout_ms: int = 5000) -> dict:
-    """Execute Python code and run test cases"""
-    results = []
-    compile_error = None
-    runtime_error = None
+@app.post('/execute')
+async def execute(data: ExecuteRequest, traceparent: str | None = Header(default=None)):
+    rejection = reject(data)
+    if rejection:
+        return rejection
 
-    timeout_seconds = timeout_ms / 1000
+    with start_span("POST /execute", traceparent, SPAN_SERVER, tests=len(data.test_cases)):
+        async with admitted():
+            return await execute_python_code(data.code, data.test_cases, data.entry_point, data.timeout_ms, data.mode)
 
-    for test in test_cases:
-        test_name = test.get("name", "test")
-        test_input = test.get("input", "")
-        expected_output = test.get("expected_output", "")
 
-        # Build test code
-        if entry_point:
-            # Function-based test
-            test_code = f'''{code}
+@app.post('/execute/stream')
+async def execute_stream(data: ExecuteRequest, traceparent: str | None = Header(default=None)):
+    """Same as /execute, but emits one NDJSON event per test as it completes"""
+    rejection = reject(data)
+    if rejection:
+        return rejection
 
-# Test execution
-import json
-args = json.loads('{json.dumps(test_input)}')
-if isinstance(args, list):
-    result = {entry_point}(*args)
-else:
-    result = {entry_point}(args)
-print(result)
-'''
-        else:
-            # stdin-based test
-            test_code = code
-
-        try:
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(test_code)
-                temp_file = f.name
-
-            try:
-                process = subprocess.run(
-                    ['python', temp_file],
-                    input=test_input if not entry_point else None,
-                    capture_output=True,
-                    text=True,
-                    timeout=timeout_seconds,
-                    preexec_fn=set_limits
-                )
-
-                actual_output = process.stdout.strip()
-                stderr = process.stderr.strip()
-
-                if process.returncode != 0:
-                    results.append({
-                        "name": test_name,
-                        "passed": False,
-                        "expected": expected_output,
-                        "actual": actual_output,
-                        "error": stderr or f"Exit code: {process.returncode}"
-                    })
-                else:
-                    passed = actual_output == expected_output.strip()
-                    results.append({
-                        "name": test_name,
-                        "passed": passed,
-                        "expected": expected_output,
-                        "actual": actual_output,
-                        "error": None
-                    })
-
-            except subprocess.TimeoutExpired:
-                results.append({
-                    "name": test_name,
-                    "passed": False,
-                    "expected": expected_output,
-                    "actual": None,
-                    "error": "Execution timed out"
-                })
-
-            finally:
-                os.unlink(temp_file)
-
-        except SyntaxError as e:
-            compile_error = str(e)
-            break
-        except Exception as e:
-            runtime_error = str(e)
-            results.append({
-                "name": test_name,
-                "passed": False,
-                "expected": expected_output,
-                "actual": None,
-                "error": str(e)
-            })
-
-    return {
-        "results": results,
-        "compile_error": compile_error,
-        "runtime_error": runtime_error
-    }
-
-
-@app.route('/execute', methods=['POST'])
-def execute():
-    data = request.json
-
-    code = data.get('code', '')
-    test_cases = data.get('test_cases', [])
-    entry_point = data.get('entry_point')
-    timeout_ms = data.get('timeout_ms', 5000)
-
-    result = execute_python_code(code, test_cases, entry_point, timeout_ms)
-    return jsonify(result)
-
-
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({"status": "healthy", "language": "python"})
+    async def events():
+        with start_span("POST /execute/stream", traceparent, SPAN_SERVER, tests=len(data.test_cases)):
+            async with admitted():
+                async for event in stream_python_code(
+                    data.code, data.test_cases, data.entry_point, data.timeout_ms, data.mode
+                ):
+                    yield json.dumps(event) + "\n"
+
+    return StreamingResponse(events(), media_type='application/x-ndjson')
+
+
+@app.get('/health')
+async def health():
+    return health_response("python", WORKER_VERSION)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000)
+    DrainingServer(uvicorn.Config(
+        app,
+        host='0.0.0.0',
+        port=int(os.environ.get("PORT", 5000)),
+        timeout_keep_alive=KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=DRAIN_TIMEOUT_SECONDS
+    )).run()
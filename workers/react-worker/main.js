@@ -3,12 +3,20 @@ const { spawn } = require('child_process');
 const fs = require('fs');
 const path = require('path');
 const os = require('os');
+const crypto = require('crypto');
 
 const app = express();
 app.use(express.json());
 
 const MAX_TIME_MS = 15000;
 
+// Changes whenever this file does, so the backend never reuses results cached from an older build
+const WORKER_VERSION = process.env.WORKER_VERSION ||
+  crypto.createHash('sha256').update(fs.readFileSync(__filename)).digest('hex').slice(0, 12);
+
+// Tests share one process here, so fail_fast behaves like full
+const EXECUTION_MODES = ['full', 'fail_fast', 'visible_only'];
+
 // Create a test runner template
 const createTestRunner = (code, testCases, entryPoint) => {
   const testCode = testCases.map((test, idx) => `
@@ -62,7 +70,11 @@ console.log(JSON.stringify({ results, compile_error: null, runtime_error: null }
 `;
 };
 
-function executeReactCode(code, testCases, entryPoint, timeoutMs) {
+function executeReactCode(code, testCases, entryPoint, timeoutMs, mode = 'full') {
+  if (mode === 'visible_only') {
+    testCases = testCases.filter((test) => !test.hidden);
+  }
+
   return new Promise((resolve) => {
     const timeout = Math.min(timeoutMs || 10000, MAX_TIME_MS);
 
@@ -162,14 +174,19 @@ function executeReactCode(code, testCases, entryPoint, timeoutMs) {
 }
 
 app.post('/execute', async (req, res) => {
-  const { code, test_cases, entry_point, timeout_ms } = req.body;
+  const { code, test_cases, entry_point, timeout_ms, mode = 'full' } = req.body;
+
+  if (!EXECUTION_MODES.includes(mode)) {
+    return res.status(400).json({ error: `Unknown execution mode: ${mode}` });
+  }
 
   try {
     const result = await executeReactCode(
       code || '',
       test_cases || [],
       entry_point,
-      timeout_ms || 10000
+      timeout_ms || 10000,
+      mode
     );
     res.json(result);
   } catch (err) {
@@ -182,7 +199,7 @@ app.post('/execute', async (req, res) => {
 });
 
 app.get('/health', (req, res) => {
-  res.json({ status: 'healthy', language: 'react' });
+  res.json({ status: 'healthy', language: 'react', version: WORKER_VERSION });
 });
 
 const PORT = process.env.PORT || 5000;
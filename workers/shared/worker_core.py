@@ -0,0 +1,1209 @@
+"""Code shared by the Python and C++ workers.
+
+Each worker image copies this module next to its main.py; run from the
+repository, main.py finds it in workers/shared. A worker's main module
+keeps only what differs between languages: compiling the submission and
+the sandbox command that runs it on a test's input.
+"""
+import asyncio
+import ast
+import ctypes
+import hashlib
+import json
+import math
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+import uvicorn
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+MAX_MEMORY_MB = 128
+MAX_TIME_SECONDS = 10
+
+# Requests executing at once; later ones wait in the queue
+MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", 32))
+# How long in-flight requests get to finish after SIGTERM
+DRAIN_TIMEOUT_SECONDS = int(os.environ.get("DRAIN_TIMEOUT_SECONDS", 30))
+KEEP_ALIVE_SECONDS = int(os.environ.get("KEEP_ALIVE_SECONDS", 5))
+
+# full: run every test; fail_fast: stop at the first failure; visible_only: skip hidden tests
+EXECUTION_MODES = ("full", "fail_fast", "visible_only")
+
+# Runs arriving with a sampled traceparent get spans, appended to TRACE_FILE as JSON lines and/or
+# posted as OTLP/HTTP JSON to TRACE_COLLECTOR_URL; with neither set, traceparent is ignored
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_COLLECTOR_URL = os.environ.get("TRACE_COLLECTOR_URL", "")
+TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# OTLP span kinds
+SPAN_INTERNAL, SPAN_SERVER = 1, 2
+SPAN_EXPORT_BATCH_SIZE = 256
+SPAN_EXPORT_INTERVAL_SECONDS = 1.0
+SPAN_QUEUE = queue.SimpleQueue()
+
+# Set by the worker through configure(): its name in spans, and the sandbox
+# stderr that means a run hit the address space limit
+SERVICE_NAME = "worker"
+MEMORY_ERROR_MARKERS = ()
+
+# stdout or stderr past this kills the sandbox; only previews are kept and returned
+MAX_OUTPUT_BYTES = int(os.environ.get("MAX_OUTPUT_KB", 8192)) * 1024
+OUTPUT_PREVIEW_BYTES = int(os.environ.get("OUTPUT_PREVIEW_KB", 8)) * 1024
+# Characters of expected and actual output shown around the first difference
+DIFF_CONTEXT_BYTES = 200
+READ_CHUNK_BYTES = 64 * 1024
+
+# Where a run's scratch files (test inputs, checker files, compiled Python) live: "memfd" keeps
+# each in an anonymous in-memory file, "tmpfs" writes them under SCRATCH_DIR, "disk" uses the default temp dir
+SCRATCH_BACKEND = os.environ.get("SCRATCH_BACKEND", "memfd")
+SCRATCH_DIR = os.environ.get("SCRATCH_DIR", "/dev/shm")
+
+# prctl option that makes orphaned descendants children of this process (linux/prctl.h)
+PR_SET_CHILD_SUBREAPER = 36
+# Runs in the sandbox's own process before exec'ing into the command: tells the worker its pid on stderr
+LAUNCHER_SCRIPT = 'echo $$ >&2; exec "$@"'
+
+TERMINATION_MESSAGES = {
+    "time_limit": "CPU time limit exceeded",
+    "memory_limit": "Memory limit exceeded",
+    "output_limit": "Output size limit exceeded",
+    "signal": "Killed by {signal}",
+}
+
+# Limits for expanding a generated test input
+GENERATOR_TIMEOUT_SECONDS = 10
+MAX_INPUT_MB = int(os.environ.get("MAX_INPUT_MB", 64))
+
+# Expands a test's generator: generate(rng, **params) returns the input, or yields it in chunks
+GENERATOR_TEMPLATE = '''import json, random, sys
+namespace = {{"__name__": "generator"}}
+exec(compile({script!r}, "generator.py", "exec"), namespace)
+data = namespace["generate"](random.Random({seed!r}), **{params!r})
+if {as_json!r}:
+    json.dump(data, sys.stdout)
+elif isinstance(data, str):
+    sys.stdout.write(data)
+else:
+    for chunk in data:
+        sys.stdout.write(str(chunk))
+'''
+
+# Output the json and unordered checkers will try as a Python literal; anything longer must be JSON
+MAX_LITERAL_BYTES = int(os.environ.get("MAX_LITERAL_KB", 64)) * 1024
+
+# Runs a test's custom checker: check(input, output, expected) returns a bool or (bool, message)
+CHECKER_TEMPLATE = '''import json, sys
+namespace = {{"__name__": "checker"}}
+exec(compile({script!r}, "checker.py", "exec"), namespace)
+texts = []
+for path in ({input_path!r}, {output_path!r}, {expected_path!r}):
+    with open(path, errors="replace") as f:
+        texts.append(f.read())
+verdict = namespace["check"](*texts)
+passed, message = verdict if isinstance(verdict, tuple) else (verdict, None)
+print(json.dumps({{"passed": bool(passed), "message": None if message is None else str(message)}}))
+'''
+CHECKER_TIMEOUT_SECONDS = 10
+# Default abs_tol and rel_tol of the float and json checkers
+DEFAULT_TOLERANCE = 1e-6
+
+
+def configure(service_name: str, memory_error_markers: tuple):
+    """Name the worker in its spans and give the stderr markers of its language's out-of-memory errors"""
+    global SERVICE_NAME, MEMORY_ERROR_MARKERS
+    SERVICE_NAME = service_name
+    MEMORY_ERROR_MARKERS = memory_error_markers
+    # Sandboxes are reparented to the worker when their launcher exits; see spawn_sandbox
+    if ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0) != 0:
+        raise OSError(ctypes.get_errno(), "prctl(PR_SET_CHILD_SUBREAPER) failed")
+
+
+def worker_version(main_file: str) -> str:
+    """WORKER_VERSION, or a hash of the worker's main module and this one.
+
+    Changes whenever either file does, so the backend never reuses results
+    cached from an older build.
+    """
+    if os.environ.get("WORKER_VERSION"):
+        return os.environ["WORKER_VERSION"]
+    digest = hashlib.sha256()
+    for path in (main_file, __file__):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+REQUEST_SLOTS = asyncio.Semaphore(MAX_IN_FLIGHT)
+
+# Gauges reported by /health
+STATE = {"in_flight": 0, "queued": 0, "draining": False}
+
+
+@asynccontextmanager
+async def admitted():
+    """Hold one of the MAX_IN_FLIGHT request slots, counting the wait in the queue gauge"""
+    STATE["queued"] += 1
+    try:
+        await REQUEST_SLOTS.acquire()
+    finally:
+        STATE["queued"] -= 1
+
+    STATE["in_flight"] += 1
+    try:
+        yield
+    finally:
+        STATE["in_flight"] -= 1
+        REQUEST_SLOTS.release()
+
+
+class ExecuteRequest(BaseModel):
+    code: str = ""
+    test_cases: list = []
+    entry_point: str | None = None
+    timeout_ms: int = 5000
+    mode: str = "full"
+
+
+def reject(data: ExecuteRequest) -> JSONResponse | None:
+    """Return an error response if the request cannot be accepted"""
+    if STATE["draining"]:
+        return JSONResponse({"error": "Worker is shutting down"}, status_code=503)
+    if data.mode not in EXECUTION_MODES:
+        return JSONResponse({"error": f"Unknown execution mode: {data.mode}"}, status_code=400)
+    return None
+
+
+class DrainingServer(uvicorn.Server):
+    """Marks the worker as draining on SIGTERM/SIGINT, then lets uvicorn finish in-flight requests"""
+
+    def handle_exit(self, sig, frame):
+        STATE["draining"] = True
+        super().handle_exit(sig, frame)
+
+
+def health_response(language: str, version: str) -> JSONResponse:
+    """Body of GET /health: 503 while draining, so balancers stop sending runs"""
+    return JSONResponse(
+        {
+            "status": "draining" if STATE["draining"] else "healthy",
+            "language": language,
+            "version": version,
+            "in_flight": STATE["in_flight"],
+            "queued": STATE["queued"],
+            "max_in_flight": MAX_IN_FLIGHT,
+        },
+        status_code=503 if STATE["draining"] else 200
+    )
+
+
+def select_test_cases(test_cases: list, mode: str) -> list:
+    """Return the test cases to run for the given execution mode"""
+    if mode == "visible_only":
+        return [test for test in test_cases if not test.get("hidden")]
+    return test_cases
+
+
+def with_limits(command: list, max_file_bytes: int = None) -> list:
+    """Wrap a sandbox command so it starts under the memory and CPU rlimits.
+
+    prlimit applies the limits instead of a preexec_fn, so sandboxes can be
+    spawned without running Python code in the forked child. max_file_bytes
+    caps what the sandbox may write to files, including a redirected stdout.
+    """
+    memory_bytes = MAX_MEMORY_MB * 1024 * 1024
+    limits = [f'--as={memory_bytes}', f'--cpu={MAX_TIME_SECONDS}']
+    if max_file_bytes:
+        limits.append(f'--fsize={max_file_bytes}')
+    return ['prlimit', *limits, '--', *command]
+
+
+def available_memory_bytes() -> int:
+    """Memory available to the container: the cgroup limit if set, otherwise physical RAM"""
+    for limit_file in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(limit_file) as f:
+                value = f.read().strip()
+            if value.isdigit():
+                return int(value)
+        except OSError:
+            continue
+    return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+def default_parallelism() -> int:
+    """One sandbox per available core, capped so every sandbox can reach its memory limit"""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    memory_slots = available_memory_bytes() // (MAX_MEMORY_MB * 1024 * 1024)
+    return max(1, min(cores, memory_slots))
+
+
+# Sandboxes running at once across all requests in this process
+MAX_PARALLEL_TESTS = int(os.environ.get("MAX_PARALLEL_TESTS", 0)) or default_parallelism()
+SANDBOX_SLOTS = asyncio.Semaphore(MAX_PARALLEL_TESTS)
+
+
+class Span:
+    """One timed operation in the trace the backend started, exported when it ends"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: str, kind: int = SPAN_INTERNAL, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: str = None):
+        end_ns = time.time_ns()
+        SPAN_QUEUE.put({
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": SERVICE_NAME,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": end_ns,
+            "duration_ms": round((end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "error": error,
+        })
+
+
+class NonRecordingSpan:
+    """Stands in for a span outside a sampled trace, so callers never check for one"""
+
+    def set(self, **attributes):
+        pass
+
+
+NON_RECORDING = NonRecordingSpan()
+CURRENT_SPAN = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: str):
+    """(trace_id, parent span_id) from a sampled W3C traceparent header, otherwise None"""
+    match = TRACEPARENT_PATTERN.match((value or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return (match.group(1), match.group(2)) if int(match.group(3), 16) & 1 else None
+
+
+@contextmanager
+def start_span(name: str, traceparent: str = None, kind: int = SPAN_INTERNAL, **attributes):
+    """Time the block as a child of the current span, or of traceparent when given.
+
+    Yields a non-recording span when the request is not part of a sampled
+    trace or spans have nowhere to go.
+    """
+    parent = CURRENT_SPAN.get()
+    if traceparent is not None:
+        context = parse_traceparent(traceparent) if TRACE_FILE or TRACE_COLLECTOR_URL else None
+    else:
+        context = (parent.trace_id, parent.span_id) if parent else None
+    if context is None:
+        yield NON_RECORDING
+        return
+
+    span = Span(name, *context, kind, attributes)
+    token = CURRENT_SPAN.set(span)
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        try:
+            CURRENT_SPAN.reset(token)
+        except ValueError:
+            # A streamed response's generator can be closed from another context after a disconnect
+            pass
+        span.end(error)
+
+
+def otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(records: list) -> dict:
+    """Spans in the OTLP/HTTP JSON encoding a collector accepts at /v1/traces"""
+    spans = []
+    for record in records:
+        spans.append({
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "parentSpanId": record["parent_span_id"],
+            "name": record["name"],
+            "kind": record["kind"],
+            "startTimeUnixNano": str(record["start_time_unix_nano"]),
+            "endTimeUnixNano": str(record["end_time_unix_nano"]),
+            "attributes": [{"key": k, "value": otlp_value(v)} for k, v in record["attributes"].items()],
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+    }]}
+
+
+def export_spans():
+    """Background thread: append finished spans to TRACE_FILE and post them to TRACE_COLLECTOR_URL"""
+    while True:
+        batch = [SPAN_QUEUE.get()]
+        deadline = time.monotonic() + SPAN_EXPORT_INTERVAL_SECONDS
+        while len(batch) < SPAN_EXPORT_BATCH_SIZE and (remaining := deadline - time.monotonic()) > 0:
+            try:
+                batch.append(SPAN_QUEUE.get(timeout=remaining))
+            except queue.Empty:
+                break
+        if TRACE_FILE:
+            try:
+                with open(TRACE_FILE, "a") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in batch)
+            except OSError as e:
+                print(f"Could not write {len(batch)} spans to {TRACE_FILE}: {e}", file=sys.stderr)
+        if TRACE_COLLECTOR_URL:
+            request = urllib.request.Request(
+                TRACE_COLLECTOR_URL,
+                data=json.dumps(to_otlp(batch)).encode(),
+                headers={"Content-Type": "application/json"}
+            )
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+            except OSError as e:
+                print(f"Could not export {len(batch)} spans to {TRACE_COLLECTOR_URL}: {e}", file=sys.stderr)
+
+
+if TRACE_FILE or TRACE_COLLECTOR_URL:
+    threading.Thread(target=export_spans, name="span-exporter", daemon=True).start()
+
+
+async def traced_test(test: dict, run) -> dict:
+    """Await a test's run inside a span recording how it went"""
+    with start_span(f"test {test.get('name', 'test')}") as span:
+        result = await run
+        resources = result.get("resources") or {}
+        span.set(passed=result["passed"], **{
+            f"sandbox.{key}": resources[key]
+            for key in ("wall_time_ms", "cpu_time_ms", "max_rss_kb", "termination") if resources.get(key) is not None
+        })
+        return result
+
+
+async def pipe_chunks(pipe):
+    """Yield what a sandbox writes to a pipe, chunk by chunk, as it arrives"""
+    reader = asyncio.StreamReader()
+    transport, _ = await asyncio.get_running_loop().connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    try:
+        while chunk := await reader.read(READ_CHUNK_BYTES):
+            yield chunk
+    finally:
+        transport.close()
+
+
+def clip(text: bytes, limit: int) -> str:
+    decoded = text[:limit].decode(errors="replace")
+    if len(text) > limit:
+        decoded += f"\n... [truncated, {len(text)} bytes in total]"
+    return decoded
+
+
+def clip_around(line: bytes, column: int) -> str:
+    """Up to DIFF_CONTEXT_BYTES of a line, centred on the given 0-based column"""
+    start = max(0, column - DIFF_CONTEXT_BYTES // 2)
+    end = start + DIFF_CONTEXT_BYTES
+    snippet = line[start:end].decode(errors="replace")
+    return ("..." if start > 0 else "") + snippet + ("..." if end < len(line) else "")
+
+
+class OutputDigest:
+    """Streaming SHA-256 of output with surrounding whitespace stripped.
+
+    Matches hashing output.strip() for ASCII whitespace in constant memory:
+    the hash state is snapshotted after each non-whitespace byte, so trailing
+    whitespace never has to be held back. The first OUTPUT_PREVIEW_BYTES are
+    kept for display, and all of it when keep is set.
+    """
+
+    def __init__(self, keep: bool = False):
+        self.output = bytearray() if keep else None
+        self.hash = hashlib.sha256()
+        self.committed = hashlib.sha256()
+        self.preview = bytearray()
+        self.size = 0
+        self.started = False
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.output is not None:
+            self.output += chunk
+        if len(self.preview) < OUTPUT_PREVIEW_BYTES:
+            self.preview += chunk[:OUTPUT_PREVIEW_BYTES - len(self.preview)]
+
+        if not self.started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return
+            self.started = True
+
+        content = chunk.rstrip()
+        if content:
+            self.hash.update(content)
+            self.committed = self.hash.copy()
+            self.hash.update(chunk[len(content):])
+        else:
+            self.hash.update(chunk)
+
+    def hexdigest(self) -> str:
+        return self.committed.hexdigest()
+
+    def preview_text(self) -> str:
+        text = self.preview.decode(errors="replace").strip()
+        if self.size > OUTPUT_PREVIEW_BYTES:
+            text += f"\n... [truncated, {self.size} bytes in total]"
+        return text
+
+
+class OutputComparator:
+    """Compare output against the expected output as it streams in.
+
+    Follows the same whitespace rules as OutputDigest. At the first
+    difference, diff records where it is (byte offset, line and column of
+    the stripped output) with the expected and actual text around it.
+    """
+
+    def __init__(self, expected: bytes):
+        self.expected = expected
+        self.position = 0
+        self.started = False
+        self.diff = None
+
+    def feed(self, chunk: bytes) -> bool:
+        """Consume a chunk; False once the output can no longer match"""
+        if self.diff:
+            return False
+        if not self.started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return True
+            self.started = True
+
+        remaining = len(self.expected) - self.position
+        if remaining > 0:
+            compared = chunk[:remaining]
+            if compared != self.expected[self.position:self.position + len(compared)]:
+                index = next(i for i, byte in enumerate(compared) if byte != self.expected[self.position + i])
+                self.diverge(self.position + index, chunk[index:])
+                return False
+            self.position += len(compared)
+            chunk = chunk[len(compared):]
+
+        # Past the end of the expected output only whitespace may follow
+        extra = chunk.lstrip()
+        if extra:
+            self.diverge(self.position, extra)
+            return False
+        return True
+
+    def finish(self):
+        if self.diff is None and self.position < len(self.expected):
+            self.diverge(self.position, b"")
+
+    def diverge(self, offset: int, actual_rest: bytes):
+        line_start = self.expected.rfind(b"\n", 0, offset) + 1
+        line_end = self.expected.find(b"\n", offset)
+        if line_end == -1:
+            line_end = len(self.expected)
+        column = offset - line_start
+        # Output matched up to offset, so the actual line starts like the expected one
+        actual_line = self.expected[line_start:offset] + actual_rest.split(b"\n", 1)[0]
+        self.diff = {
+            "offset": offset,
+            "line": self.expected.count(b"\n", 0, offset) + 1,
+            "column": column + 1,
+            "expected": clip_around(self.expected[line_start:line_end], column),
+            "actual": clip_around(actual_line, column),
+        }
+
+
+def expected_digest(test: dict) -> str | None:
+    """SHA-256 the output must match: expected_hash, or the stripped expected_output.
+
+    None for a generated test whose expected output has not been recorded yet.
+    """
+    if test.get("expected_hash"):
+        return test["expected_hash"]
+    expected_output = test.get("expected_output", "")
+    if test.get("generator") and not expected_output:
+        return None
+    return hashlib.sha256(expected_output.strip().encode()).hexdigest()
+
+
+def expected_bytes(test: dict) -> bytes | None:
+    """Stripped expected output to compare against as the output streams, when the test has one"""
+    if test.get("expected_hash") or (test.get("generator") and not test.get("expected_output")):
+        return None
+    return test.get("expected_output", "").strip().encode()
+
+
+def expected_display(test: dict) -> str:
+    if test.get("expected_output") or not test.get("expected_hash"):
+        return clip(test.get("expected_output", "").encode(), OUTPUT_PREVIEW_BYTES)
+    return f"sha256:{test['expected_hash']}"
+
+
+async def read_output(pipe, digest: OutputDigest, comparator: OutputComparator = None) -> str | None:
+    """Hash (and compare) stdout as it arrives.
+
+    Returns a reason to stop the sandbox early: output_limit once it passes
+    MAX_OUTPUT_BYTES, wrong_output at the first difference from the
+    expected output.
+    """
+    async for chunk in pipe_chunks(pipe):
+        if digest.size + len(chunk) > MAX_OUTPUT_BYTES:
+            digest.feed(chunk[:MAX_OUTPUT_BYTES - digest.size])
+            return "output_limit"
+        digest.feed(chunk)
+        if comparator and not comparator.feed(chunk):
+            return "wrong_output"
+    if comparator:
+        comparator.finish()
+    return None
+
+
+async def read_stderr(pipe, kept: bytearray) -> str | None:
+    """Keep the start of stderr in kept; output_limit once it passes MAX_OUTPUT_BYTES"""
+    size = 0
+    async for chunk in pipe_chunks(pipe):
+        size += len(chunk)
+        if len(kept) < OUTPUT_PREVIEW_BYTES:
+            kept += chunk[:OUTPUT_PREVIEW_BYTES - len(kept)]
+        if size > MAX_OUTPUT_BYTES:
+            return "output_limit"
+    return None
+
+
+def spawn_sandbox(command: list, max_file_bytes: int, stdin, stdout, pass_fds: tuple) -> tuple:
+    """Start a sandbox under the rlimits and return (launcher, pid).
+
+    A forked child starts out with its parent's resident pages as its peak,
+    and exec carries that peak into ru_maxrss, so a sandbox spawned straight
+    from the worker would report at least the worker's own RSS. setsid
+    forks the sandbox from its own small process instead and exits, and the
+    sandbox is reparented to the worker, a child subreaper, whose wait4 then
+    sees only the sandbox's peak. The launcher's pipes are the sandbox's;
+    its stderr carries the sandbox's pid first.
+    """
+    launcher = subprocess.Popen(
+        ["setsid", "--fork", "sh", "-c", LAUNCHER_SCRIPT, "sh", *with_limits(command, max_file_bytes)],
+        stdin=stdin,
+        stdout=stdout,
+        stderr=subprocess.PIPE,
+        pass_fds=pass_fds
+    )
+    # setsid exits as soon as it has forked, after which the sandbox is ours to reap
+    launcher.wait()
+    pid = b""
+    while not pid.endswith(b"\n"):
+        byte = os.read(launcher.stderr.fileno(), 1)
+        if not byte:
+            for pipe in (launcher.stdout, launcher.stderr):
+                if pipe:
+                    pipe.close()
+            raise RuntimeError("Sandbox launcher exited without starting the sandbox")
+        pid += byte
+    return launcher, int(pid)
+
+
+async def wait_for_exit(pid: int):
+    """Wait for a sandbox to exit without blocking the loop, then reap it with wait4.
+
+    asyncio's own child watcher reaps with waitpid, which discards the
+    resource usage, so sandboxes are spawned with Popen and reaped here.
+    """
+    loop = asyncio.get_running_loop()
+    pidfd = os.pidfd_open(pid)
+    exited = loop.create_future()
+    loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+    try:
+        await exited
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    _, status, rusage = os.wait4(pid, 0)
+    return status, rusage
+
+
+def kill_sandbox(pid: int):
+    """SIGKILL a sandbox that wait_for_exit has not reaped yet, with anything it forked.
+
+    The sandbox leads its own process group (setsid). Until wait4 runs its
+    pid stays a zombie of ours, so the group cannot belong to another
+    process.
+    """
+    os.killpg(pid, signal.SIGKILL)
+
+
+def classify_termination(status: int, timed_out: bool, stderr: str):
+    """Return (termination, signal name) for a finished sandbox"""
+    if timed_out:
+        return "time_limit", None
+    if os.WIFSIGNALED(status):
+        signum = os.WTERMSIG(status)
+        if signum == signal.SIGXCPU:
+            return "time_limit", signal.Signals(signum).name
+        if signum == signal.SIGXFSZ:
+            return "output_limit", signal.Signals(signum).name
+        if any(marker in stderr for marker in MEMORY_ERROR_MARKERS):
+            return "memory_limit", signal.Signals(signum).name
+        return "signal", signal.Signals(signum).name
+    if any(marker in stderr for marker in MEMORY_ERROR_MARKERS):
+        return "memory_limit", None
+    return ("ok" if os.waitstatus_to_exitcode(status) == 0 else "runtime_error"), None
+
+
+async def run_sandbox(command: list, timeout_seconds: float, stdin_path: str = None, stdout_fd: int = None,
+                      pass_fds: tuple = (), max_file_bytes: int = None, expected: bytes = None,
+                      keep_output: bool = False) -> dict:
+    """Run a command under the rlimits once a sandbox slot is free.
+
+    stdin is read from stdin_path, if given. stdout goes to stdout_fd, if
+    given; otherwise it is hashed as it streams in (stdout_hash), compared
+    against expected when that is given, and only a preview is kept
+    (stdout), unless keep_output asks for all of it (output). The sandbox is killed as soon as stdout or stderr passes
+    MAX_OUTPUT_BYTES or stdout differs from expected, so worker memory stays
+    bounded whatever the submission prints.
+
+    Also returns returncode, stderr, the first difference from expected
+    (diff) and the resources the run used: wall and CPU time, peak RSS and
+    how it terminated (ok, runtime_error, time_limit, memory_limit,
+    output_limit, wrong_output or signal). A run over timeout_seconds is
+    killed and reported with timed_out set; the process is also killed on
+    cancellation.
+    """
+    async with SANDBOX_SLOTS:
+        started = time.perf_counter()
+        stdin = open(stdin_path, "rb") if stdin_path else subprocess.DEVNULL
+        try:
+            launcher, pid = spawn_sandbox(
+                command, max_file_bytes, stdin,
+                stdout_fd if stdout_fd is not None else subprocess.PIPE, pass_fds
+            )
+        finally:
+            if stdin_path:
+                stdin.close()
+        digest = OutputDigest(keep_output)
+        comparator = OutputComparator(expected) if expected is not None else None
+        stderr = bytearray()
+        stop_reasons = []
+        reaped = {}
+
+        async def watch(read):
+            reason = await read
+            if reason and not stop_reasons:
+                stop_reasons.append(reason)
+                kill_sandbox(pid)
+
+        # Tasks rather than bare coroutines, so a cancel before they start still closes them
+        reads = [asyncio.create_task(watch(read_stderr(launcher.stderr, stderr)))]
+        if launcher.stdout:
+            reads.append(asyncio.create_task(watch(read_output(launcher.stdout, digest, comparator))))
+
+        async def communicate():
+            await asyncio.gather(*reads)
+            reaped["status"], reaped["rusage"] = await wait_for_exit(pid)
+
+        timed_out = False
+        try:
+            await asyncio.wait_for(communicate(), timeout_seconds)
+        except BaseException as e:
+            if "status" not in reaped:
+                kill_sandbox(pid)
+                reaped["status"], reaped["rusage"] = await wait_for_exit(pid)
+            if not isinstance(e, asyncio.TimeoutError):
+                raise
+            timed_out = True
+        finally:
+            for read in reads:
+                read.cancel()
+            await asyncio.gather(*reads, return_exceptions=True)
+            for pipe in (launcher.stdout, launcher.stderr):
+                if pipe:
+                    pipe.close()
+        wall_time = time.perf_counter() - started
+
+    stderr = stderr.decode(errors="replace")
+    rusage = reaped["rusage"]
+    termination, signal_name = classify_termination(reaped["status"], timed_out, stderr)
+    if stop_reasons and not timed_out:
+        termination, signal_name = stop_reasons[0], None
+    return {
+        "returncode": os.waitstatus_to_exitcode(reaped["status"]),
+        "stdout": digest.preview_text(),
+        "stdout_hash": digest.hexdigest(),
+        "output": bytes(digest.output) if keep_output else None,
+        "stderr": stderr,
+        "diff": comparator.diff if comparator else None,
+        "timed_out": timed_out,
+        "resources": {
+            "wall_time_ms": round(wall_time * 1000, 1),
+            "cpu_time_ms": round((rusage.ru_utime + rusage.ru_stime) * 1000, 1),
+            "max_rss_kb": rusage.ru_maxrss,
+            "termination": termination,
+            "signal": signal_name,
+        },
+    }
+
+
+def sandbox_error(run: dict) -> str:
+    """Error text for a failed run: why it was stopped, stderr, or how it exited"""
+    resources = run["resources"]
+    if resources["termination"] == "output_limit":
+        return TERMINATION_MESSAGES["output_limit"]
+    return run["stderr"].strip() or TERMINATION_MESSAGES.get(resources["termination"], "").format(
+        signal=resources["signal"]
+    ) or f"Exit code: {run['returncode']}"
+
+
+@contextmanager
+def scratch_file(name: str):
+    """Yield (path, fds the sandbox must inherit) for an empty scratch file on SCRATCH_BACKEND"""
+    if SCRATCH_BACKEND == "memfd" and hasattr(os, "memfd_create"):
+        fd = os.memfd_create(name)
+        try:
+            # Each open of the /proc path gets its own description, so offsets are never shared
+            yield f"/proc/self/fd/{fd}", (fd,)
+        finally:
+            os.close(fd)
+        return
+
+    scratch_dir = SCRATCH_DIR if SCRATCH_BACKEND == "tmpfs" else None
+    with tempfile.TemporaryDirectory(dir=scratch_dir) as run_dir:
+        path = os.path.join(run_dir, name)
+        open(path, "wb").close()
+        yield path, ()
+
+
+async def write_test_input(test: dict, input_path: str, as_json: bool) -> str | None:
+    """Fill a test's input file from its literal input or by running its generator.
+
+    Function tests get their arguments as JSON; stdin tests get raw text.
+    Generators run in their own sandbox with stdout going straight to the
+    file, so large inputs never pass through the worker's memory. Returns an
+    error message if the generator fails.
+    """
+    generator = test.get("generator")
+    if not generator:
+        test_input = test.get("input", "")
+        with open(input_path, "w") as f:
+            f.write(json.dumps(test_input) if as_json else test_input)
+        return None
+
+    runner = GENERATOR_TEMPLATE.format(
+        script=generator.get("script", ""),
+        seed=generator.get("seed", 0),
+        params=generator.get("params") or {},
+        as_json=as_json
+    )
+    with open(input_path, "wb") as f:
+        run = await run_sandbox(
+            [sys.executable, '-c', runner],
+            GENERATOR_TIMEOUT_SECONDS,
+            stdout_fd=f.fileno(),
+            max_file_bytes=MAX_INPUT_MB * 1024 * 1024
+        )
+    if run["timed_out"]:
+        return "Input generator timed out"
+    if run["returncode"] != 0:
+        return f"Input generator failed: {sandbox_error(run)}"
+    return None
+
+
+def checker_of(test: dict) -> dict:
+    return test.get("checker") or {"type": "exact"}
+
+
+def tolerance(checker: dict) -> dict:
+    return {
+        "abs_tol": checker.get("abs_tol", DEFAULT_TOLERANCE),
+        "rel_tol": checker.get("rel_tol", DEFAULT_TOLERANCE),
+    }
+
+
+def snippet(value) -> str:
+    text = value.decode(errors="replace") if isinstance(value, bytes) else json.dumps(value, default=repr)
+    return text if len(text) <= 80 else text[:77] + "..."
+
+
+def numbers_close(actual, expected, checker: dict) -> bool:
+    try:
+        return math.isclose(float(actual), float(expected), **tolerance(checker))
+    except (TypeError, ValueError):
+        return False
+
+
+def compare_tokens(actual: bytes, expected: bytes, checker: dict) -> str | None:
+    """Whitespace-separated tokens must match; with the float checker numbers may differ within tolerance"""
+    actual_tokens, expected_tokens = actual.split(), expected.split()
+    if actual_tokens == expected_tokens:
+        return None
+    numeric = checker.get("type") == "float"
+    for index, (got, wanted) in enumerate(zip(actual_tokens, expected_tokens), 1):
+        if got != wanted and not (numeric and numbers_close(got, wanted, checker)):
+            return f"Token {index}: expected {snippet(wanted)}, got {snippet(got)}"
+    if len(actual_tokens) == len(expected_tokens):
+        return None
+    return f"Expected {len(expected_tokens)} tokens, got {len(actual_tokens)}"
+
+
+def parse_structured(text: bytes):
+    """Parse output as JSON, or as a Python literal since entry points print repr().
+
+    Raises ValueError saying why it could not be parsed. literal_eval holds the
+    GIL and builds a large AST, so only small outputs are tried as literals.
+    """
+    try:
+        return json.loads(text)
+    except (ValueError, RecursionError):
+        pass
+    if len(text) > MAX_LITERAL_BYTES:
+        raise ValueError(f"is not JSON, and is over {MAX_LITERAL_BYTES // 1024} KB to read as a Python literal")
+    try:
+        return ast.literal_eval(text.decode(errors="replace").strip())
+    except (ValueError, SyntaxError, RecursionError, MemoryError):
+        raise ValueError("is not JSON or a Python literal") from None
+
+
+def structure_mismatch(actual, expected, checker: dict, path: str = "$") -> str | None:
+    """Where two parsed values differ: dict key order never matters, numbers match within tolerance"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        if actual.keys() != expected.keys():
+            return f"{path}: expected keys {snippet(sorted(map(str, expected)))}, got {snippet(sorted(map(str, actual)))}"
+        for key in expected:
+            mismatch = structure_mismatch(actual[key], expected[key], checker, f"{path}.{key}")
+            if mismatch:
+                return mismatch
+        return None
+    if isinstance(expected, (list, tuple)) and isinstance(actual, (list, tuple)):
+        if len(actual) != len(expected):
+            return f"{path}: expected {len(expected)} items, got {len(actual)}"
+        for index, (got, wanted) in enumerate(zip(actual, expected)):
+            mismatch = structure_mismatch(got, wanted, checker, f"{path}[{index}]")
+            if mismatch:
+                return mismatch
+        return None
+    numbers = (int, float)
+    if isinstance(expected, numbers) and isinstance(actual, numbers) and not isinstance(expected, bool) \
+            and not isinstance(actual, bool):
+        if actual == expected or numbers_close(actual, expected, checker):
+            return None
+    elif actual == expected:
+        return None
+    return f"{path}: expected {snippet(expected)}, got {snippet(actual)}"
+
+
+def compare_json(actual: bytes, expected: bytes, checker: dict) -> str | None:
+    try:
+        expected_value = parse_structured(expected)
+    except ValueError as e:
+        return f"Expected output {e}"
+    try:
+        actual_value = parse_structured(actual)
+    except ValueError as e:
+        return f"Output {e}"
+    try:
+        return structure_mismatch(actual_value, expected_value, checker)
+    except RecursionError:
+        return "Output is nested too deeply to compare"
+
+
+def canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, default=repr)
+
+
+def as_bytes(item) -> bytes:
+    return item.encode() if isinstance(item, str) else item
+
+
+def compare_unordered(actual: bytes, expected: bytes, checker: dict) -> str | None:
+    """Same items in any order: the elements of a top-level list, otherwise the non-blank lines"""
+    try:
+        actual_value, expected_value = parse_structured(actual), parse_structured(expected)
+    except ValueError:
+        actual_value = expected_value = None
+    if isinstance(actual_value, (list, tuple)) and isinstance(expected_value, (list, tuple)):
+        try:
+            actual_items = Counter(map(canonical, actual_value))
+            expected_items = Counter(map(canonical, expected_value))
+        except RecursionError:
+            return "Output is nested too deeply to compare"
+    else:
+        actual_items = Counter(line.strip() for line in actual.splitlines() if line.strip())
+        expected_items = Counter(line.strip() for line in expected.splitlines() if line.strip())
+    if actual_items == expected_items:
+        return None
+    missing = expected_items - actual_items
+    if missing:
+        return f"Missing {snippet(as_bytes(next(iter(missing))))}"
+    return f"Unexpected {snippet(as_bytes(next(iter(actual_items - expected_items))))}"
+
+
+BUILTIN_CHECKERS = {
+    "tokens": compare_tokens,
+    "float": compare_tokens,
+    "json": compare_json,
+    "unordered": compare_unordered,
+}
+
+
+def checker_verdict(run: dict) -> str | None:
+    if run["timed_out"]:
+        return "Checker timed out"
+    if run["returncode"] != 0:
+        return f"Checker failed: {sandbox_error(run)}"
+    try:
+        verdict = json.loads(run["stdout"].splitlines()[-1])
+    except (IndexError, ValueError):
+        return "Checker failed: no verdict printed"
+    if verdict["passed"]:
+        return None
+    return verdict["message"] or "Rejected by the checker"
+
+
+async def run_custom_checker(script: str, input_path: str, pass_fds: tuple, output: bytes,
+                             expected: bytes) -> str | None:
+    """Run a test's checker script in its own sandbox; returns why it rejected the output, or None"""
+    with scratch_file("output") as (output_path, output_fds), scratch_file("expected") as (expected_path, expected_fds):
+        for path, data in ((output_path, output), (expected_path, expected)):
+            with open(path, "wb") as f:
+                f.write(data)
+        runner = CHECKER_TEMPLATE.format(
+            script=script, input_path=input_path, output_path=output_path, expected_path=expected_path
+        )
+        run = await run_sandbox(
+            [sys.executable, '-c', runner],
+            CHECKER_TIMEOUT_SECONDS,
+            pass_fds=pass_fds + output_fds + expected_fds
+        )
+    return checker_verdict(run)
+
+
+async def check_output(test: dict, run: dict, input_path: str, pass_fds: tuple) -> tuple[bool, str | None]:
+    """Grade a clean run's output with the test's checker: (passed, why it was rejected).
+
+    exact compares the stripped output by hash, as it streamed. The other
+    checkers get the whole output, which run_sandbox kept for them, and
+    run off the event loop.
+    """
+    checker = checker_of(test)
+    kind = checker.get("type", "exact")
+    if kind == "exact":
+        return run["stdout_hash"] == expected_digest(test), None
+
+    expected = expected_bytes(test)
+    if kind == "custom":
+        if not checker.get("script"):
+            return False, "Custom checker has no script"
+        rejection = await run_custom_checker(checker["script"], input_path, pass_fds, run["output"], expected or b"")
+        return rejection is None, rejection
+    if kind not in BUILTIN_CHECKERS:
+        return False, f"Unknown checker: {kind}"
+    if expected is None:
+        return False, f"The {kind} checker needs the test's expected_output"
+    rejection = await asyncio.to_thread(BUILTIN_CHECKERS[kind], run["output"], expected, checker)
+    return rejection is None, rejection
+
+
+def grade_benchmark(test: dict, result: dict) -> dict:
+    """Grade a benchmark test on speed as well: correct output over budget_ms of CPU time fails"""
+    budget_ms = test.get("budget_ms")
+    reference_ms = test.get("reference_ms")
+    resources = result.get("resources")
+    if not budget_ms or not reference_ms or not resources:
+        return result
+
+    cpu_time_ms = resources["cpu_time_ms"]
+    ratio = round(cpu_time_ms / reference_ms, 2)
+    within_budget = cpu_time_ms <= budget_ms
+    result["benchmark"] = {
+        "reference_ms": reference_ms,
+        "budget_ms": budget_ms,
+        "cpu_time_ms": cpu_time_ms,
+        "ratio": ratio,
+        "within_budget": within_budget,
+    }
+    if result["passed"] and not within_budget:
+        result["passed"] = False
+        result["error"] = (
+            f"Too slow: {cpu_time_ms} ms CPU time against a budget of {budget_ms} ms "
+            f"({ratio}x the reference solution)"
+        )
+    return result
+
+
+async def run_test(test: dict, command, timeout_seconds: float, pass_fds: tuple = (), as_json: bool = False) -> dict:
+    """Run a single test case in its own sandbox.
+
+    command(input_path) is the sandbox command running the submission on
+    the test's input file. Function tests (as_json) read their JSON
+    arguments from that file themselves; other tests get it as stdin.
+
+    With the exact checker the output is hashed, and compared with
+    expected_output when the test has one, as it streams; the run stops at
+    the first difference, which is returned as diff, and only a preview of
+    the output is ever held. Other checkers grade the whole output once the
+    run ends; a rejection is reported as the error.
+    """
+    test_name = test.get("name", "test")
+    expected = expected_display(test)
+    # Other checkers need the whole output, so the run cannot stop at the first difference
+    exact = checker_of(test).get("type", "exact") == "exact"
+
+    with scratch_file("input") as (input_path, input_fds):
+        generator_error = await write_test_input(test, input_path, as_json)
+        if generator_error:
+            return {
+                "name": test_name,
+                "passed": False,
+                "expected": expected,
+                "actual": None,
+                "error": generator_error
+            }
+
+        run = await run_sandbox(
+            command(input_path),
+            timeout_seconds,
+            stdin_path=None if as_json else input_path,
+            pass_fds=pass_fds + input_fds,
+            expected=expected_bytes(test) if exact else None,
+            keep_output=not exact
+        )
+        if run["returncode"] == 0:
+            passed, rejection = await check_output(test, run, input_path, pass_fds + input_fds)
+
+    if run["timed_out"]:
+        return {
+            "name": test_name,
+            "passed": False,
+            "expected": expected,
+            "actual": None,
+            "error": "Execution timed out",
+            "resources": run["resources"]
+        }
+
+    if run["resources"]["termination"] == "wrong_output":
+        # Stopped at the first difference; a wrong answer rather than an error
+        return {
+            "name": test_name,
+            "passed": False,
+            "expected": expected,
+            "actual": run["stdout"],
+            "error": None,
+            "resources": run["resources"],
+            "output_hash": run["stdout_hash"],
+            "diff": run["diff"]
+        }
+
+    if run["returncode"] != 0:
+        return {
+            "name": test_name,
+            "passed": False,
+            "expected": expected,
+            "actual": run["stdout"],
+            "error": sandbox_error(run),
+            "resources": run["resources"],
+            "output_hash": run["stdout_hash"]
+        }
+
+    return {
+        "name": test_name,
+        "passed": passed,
+        "expected": expected,
+        "actual": run["stdout"],
+        "error": rejection,
+        "resources": run["resources"],
+        "output_hash": run["stdout_hash"],
+        "diff": run["diff"]
+    }
+
+
+async def run_tests(test_cases: list, mode: str, run):
+    """Run the tests the mode selects concurrently, yielding result events in test order.
+
+    run(test) returns the coroutine that runs one test. Emits
+    {"event": "result", "result": {...}} per test and a final
+    {"event": "done", "compile_error": None, "runtime_error": ...}. Tests still
+    queued or running when the generator is closed are killed, so callers
+    close it (aclosing) before removing the scratch data the tests use.
+    """
+    runtime_error = None
+    tests = select_test_cases(test_cases, mode)
+    tasks = [asyncio.create_task(traced_test(test, run(test))) for test in tests]
+
+    try:
+        for test, task in zip(tests, tasks):
+            try:
+                result = grade_benchmark(test, await task)
+            except Exception as e:
+                runtime_error = str(e)
+                result = {
+                    "name": test.get("name", "test"),
+                    "passed": False,
+                    "expected": test.get("expected_output", ""),
+                    "actual": None,
+                    "error": str(e)
+                }
+
+            yield {"event": "result", "result": result}
+
+            if mode == "fail_fast" and not result["passed"]:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield {"event": "done", "compile_error": None, "runtime_error": runtime_error}
+
+
+async def collect_results(events) -> dict:
+    """Gather a worker's result events into the response of POST /execute"""
+    results = []
+    summary = {}
+
+    async for event in events:
+        if event["event"] == "result":
+            results.append(event["result"])
+        else:
+            summary = event
+
+    return {
+        "results": results,
+        "compile_error": summary.get("compile_error"),
+        "compile_error_details": summary.get("compile_error_details"),
+        "runtime_error": summary.get("runtime_error")
+    }